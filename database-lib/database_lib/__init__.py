@@ -1,9 +1,31 @@
-from database_lib.main import AbstractCacheBackend, SQLiteCacheBackend, PostgreSQLCacheBackend, migrate_to_postgres, execute_migrate_to_postgres_in_thread
+from database_lib.main import (
+    AbstractAsyncCacheBackend,
+    AbstractCacheBackend,
+    AsyncPostgreSQLCacheBackend,
+    SQLiteCacheBackend,
+    PostgreSQLCacheBackend,
+    migrate_to_postgres,
+    execute_migrate_to_postgres_in_thread,
+    compress_cache,
+    execute_compress_cache_in_thread,
+    backfill_metadata,
+    execute_backfill_metadata_in_thread,
+)
+from database_lib.metadata import PostMetadata
+from database_lib.write_behind import WriteBehindCache
 
 __all__ = [
     "AbstractCacheBackend",
+    "AbstractAsyncCacheBackend",
     "SQLiteCacheBackend",
     "PostgreSQLCacheBackend",
+    "AsyncPostgreSQLCacheBackend",
+    "WriteBehindCache",
     "migrate_to_postgres",
     "execute_migrate_to_postgres_in_thread",
+    "compress_cache",
+    "execute_compress_cache_in_thread",
+    "backfill_metadata",
+    "execute_backfill_metadata_in_thread",
+    "PostMetadata",
 ]
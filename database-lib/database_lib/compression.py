@@ -0,0 +1,73 @@
+import struct
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# First byte of every compressed value, so the storage format can change without rewriting old rows
+FORMAT_ZSTD = 1  # <format><zstd frame>
+FORMAT_ZSTD_DICTIONARY = 2  # <format><dictionary id, uint32 big-endian><zstd frame>
+
+DICTIONARY_ID = struct.Struct(">I")
+
+
+class UnknownDictionary(Exception):
+    def __init__(self, dictionary_id: int):
+        super().__init__(f"Compression dictionary is not loaded: {dictionary_id}")
+        self.dictionary_id = dictionary_id
+
+
+class CacheCodec:
+    """Compresses cached post JSON with zstd, optionally with a dictionary trained on cached posts.
+
+    Post JSON documents share most of their keys and structure, so a trained dictionary shrinks small
+    posts far better than plain zstd. Dictionaries are stored in the database and referenced by ID from
+    every value, so a new dictionary can be trained without recompressing old rows.
+    """
+
+    __slots__ = ("level", "dictionaries", "active_dictionary_id")
+
+    def __init__(self, level: int = 9):
+        if zstandard is None:
+            raise ValueError("zstandard library not found.")
+
+        self.level = level
+        self.dictionaries: dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self.active_dictionary_id: Optional[int] = None
+
+    def add_dictionary(self, dictionary_id: int, data: bytes, active: bool = False):
+        dictionary = zstandard.ZstdCompressionDict(bytes(data))
+        dictionary.precompute_compress(level=self.level)
+        self.dictionaries[dictionary_id] = dictionary
+        if active:
+            self.active_dictionary_id = dictionary_id
+
+    def encode(self, value: str) -> bytes:
+        data = value.encode("utf-8")
+        if self.active_dictionary_id is None:
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            return bytes((FORMAT_ZSTD,)) + compressor.compress(data)
+
+        dictionary = self.dictionaries[self.active_dictionary_id]
+        compressor = zstandard.ZstdCompressor(dict_data=dictionary)
+        return bytes((FORMAT_ZSTD_DICTIONARY,)) + DICTIONARY_ID.pack(self.active_dictionary_id) + compressor.compress(data)
+
+    def decode(self, blob: bytes) -> str:
+        blob = bytes(blob)
+        value_format = blob[0]
+        if value_format == FORMAT_ZSTD:
+            return zstandard.ZstdDecompressor().decompress(blob[1:]).decode("utf-8")
+        if value_format == FORMAT_ZSTD_DICTIONARY:
+            (dictionary_id,) = DICTIONARY_ID.unpack_from(blob, 1)
+            dictionary = self.dictionaries.get(dictionary_id)
+            if dictionary is None:
+                raise UnknownDictionary(dictionary_id)
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            return decompressor.decompress(blob[1 + DICTIONARY_ID.size :]).decode("utf-8")
+        raise ValueError(f"Unknown compressed value format: {value_format}")
+
+
+def train_dictionary(samples: list[str], size: int = 112640) -> bytes:
+    return zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples]).as_bytes()
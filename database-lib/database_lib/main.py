@@ -1,5 +1,8 @@
+import asyncio
 import codecs
+import functools
 import json as py_json
+import random
 import sqlite3
 import threading
 import time
@@ -11,13 +14,80 @@ from typing import Optional, Union
 import orjson as json
 import psycopg2
 from loguru import logger
-from psycopg2.extras import execute_batch
+from psycopg2.extras import execute_batch, execute_values
 
 try:
     import sqlite_zstd
 except ImportError:
     sqlite_zstd = None
 
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+from database_lib.compression import CacheCodec, UnknownDictionary, train_dictionary
+from database_lib.metadata import (
+    METADATA_COLUMNS,
+    METADATA_TABLE_SQL,
+    PostMetadata,
+    extract_post_metadata,
+    metadata_upsert_sql,
+)
+
+METADATA_UPSERT_VALUES_SQL = metadata_upsert_sql("%s")
+METADATA_UPSERT_ASYNC_SQL = metadata_upsert_sql(
+    "(" + ", ".join(f"${i}" for i in range(1, len(METADATA_COLUMNS) + 1)) + ")"
+)
+
+# Patched HTML of embedded iframes (gists, embeds), looked up by the Medium media ID. Not in `cache`,
+# which only holds posts
+IFRAME_TABLE_SQL = "CREATE TABLE IF NOT EXISTS iframe_cache (id TEXT PRIMARY KEY, content TEXT NOT NULL)"
+IFRAME_UPSERT_SQL = "INSERT INTO iframe_cache (id, content) VALUES ({}) ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content"
+
+
+def dump_value(value: Union[str, dict]) -> str:
+    if isinstance(value, dict):
+        try:
+            return py_json.dumps(value)
+        except TypeError as e:
+            raise ValueError(f"Unable to serialize value to JSON: {e}")
+    elif not isinstance(value, str):
+        raise ValueError(
+            f"value argument should be a string or dict, not {type(value).__name__}"
+        )
+    return value
+
+
+# ORDER BY RANDOM() reads and sorts the whole table. On a big table a block sample a few times larger
+# than needed is shuffled instead; on small or never analyzed tables (reltuples < 0) the full shuffle is cheap
+RANDOM_SAMPLE_OVERSAMPLING = 4
+RANDOM_SAMPLE_MIN_ROWS = 10_000
+
+
+def random_sample_percent(estimated_rows: float, size: int) -> Optional[float]:
+    if estimated_rows < RANDOM_SAMPLE_MIN_ROWS:
+        return None
+    return min(100.0, size * RANDOM_SAMPLE_OVERSAMPLING * 100 / estimated_rows)
+
+
+# Dictionaries trained by another worker are picked up for new values after at most this many seconds
+DICTIONARY_RELOAD_INTERVAL = 5 * 60
+
+# pg_advisory_lock keys, so only one worker runs each migration at a time
+COMPRESS_CACHE_LOCK_ID = 0x46524301
+BACKFILL_METADATA_LOCK_ID = 0x46524302
+
+
+def synchronized(method):
+    # Sync backends share one connection and cursor, callers may come from several threads
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class CacheData:
     __slots__ = ("data",)
@@ -85,6 +155,12 @@ class AbstractCacheBackend(ABC):
     def random(self, size: int) -> list[CacheResponse]:
         pass
 
+    def random_metadata(self, size: int) -> list[PostMetadata]:
+        """Homepage fields of random posts. Only the Postgres backends keep a cache_metadata table,
+        the others read and parse full posts here"""
+        rows = (extract_post_metadata(cache.key, cache.json()) for cache in self.random(size))
+        return [PostMetadata(*row) for row in rows if row]
+
     @abstractmethod
     def pull(self, key: str) -> Union[CacheResponse, None]:
         pass
@@ -93,15 +169,73 @@ class AbstractCacheBackend(ABC):
     def push(self, key: str, value: Union[str, dict]) -> None:
         pass
 
+    def push_many(self, items: list[tuple[str, str]]) -> None:
+        for key, value in items:
+            self.push(key, value)
+
     @abstractmethod
     def delete(self, key: str) -> None:
         pass
 
+    def pull_iframe(self, iframe_id: str) -> Optional[str]:
+        """Patched HTML of an embedded iframe, kept apart from posts. Backends without a table for it never have one"""
+        return None
+
+    def push_iframe(self, iframe_id: str, content: str) -> None:
+        pass
+
     @abstractmethod
     def close(self):
         pass
 
 
+class AbstractAsyncCacheBackend(ABC):
+    @abstractmethod
+    async def init_db(self):
+        pass
+
+    @abstractmethod
+    async def all_length(self) -> int:
+        pass
+
+    @abstractmethod
+    async def random(self, size: int) -> list[CacheResponse]:
+        pass
+
+    async def random_metadata(self, size: int) -> list[PostMetadata]:
+        """Homepage fields of random posts. Only the Postgres backends keep a cache_metadata table,
+        the others read and parse full posts here"""
+        rows = (extract_post_metadata(cache.key, cache.json()) for cache in await self.random(size))
+        return [PostMetadata(*row) for row in rows if row]
+
+    @abstractmethod
+    async def pull(self, key: str) -> Union[CacheResponse, None]:
+        pass
+
+    @abstractmethod
+    async def push(self, key: str, value: Union[str, dict]) -> None:
+        pass
+
+    async def push_many(self, items: list[tuple[str, str]]) -> None:
+        for key, value in items:
+            await self.push(key, value)
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    async def pull_iframe(self, iframe_id: str) -> Optional[str]:
+        """Patched HTML of an embedded iframe, kept apart from posts. Backends without a table for it never have one"""
+        return None
+
+    async def push_iframe(self, iframe_id: str, content: str) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
+
+
 class SQLiteCacheBackend(AbstractCacheBackend):
     __slots__ = ("connection", "cursor", "database", "lock", "zstd_enabled")
 
@@ -109,13 +243,12 @@ class SQLiteCacheBackend(AbstractCacheBackend):
         self.database = database
         self.connection = None
         self.cursor = None
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()
         self.zstd_enabled = zstd_enabled
         self.connect()
 
     def connect(self):
-        self.connection = sqlite3.connect(self.database, timeout=10.0)
-        self.connection.enable_load_extension(True)
+        self.connection = sqlite3.connect(self.database, timeout=10.0, check_same_thread=False)
         self.connection.execute("PRAGMA foreign_keys = ON;")
         self.connection.execute("PRAGMA journal_mode=WAL;")
         self.connection.execute("PRAGMA auto_vacuum=full;")
@@ -125,6 +258,8 @@ class SQLiteCacheBackend(AbstractCacheBackend):
             if sqlite_zstd is None:
                 raise ValueError("sqlite_zstd library not found.")
 
+            # Only needed for the extension, not every sqlite3 build supports it
+            self.connection.enable_load_extension(True)
             sqlite_zstd.load(self.connection)
             self.enable_zstd()
 
@@ -132,23 +267,48 @@ class SQLiteCacheBackend(AbstractCacheBackend):
         if self.connection is None or self.cursor is None:
             self.connect()
 
+    @synchronized
     def all(self):
         self.ensure_connection()
         with self.connection:
             return self.cursor.execute("SELECT * FROM cache").fetchall()
 
+    @synchronized
     def all_length(self) -> int:
         self.ensure_connection()
         with self.connection:
             return self.cursor.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
 
+    @synchronized
     def random(self, size: int) -> list[CacheResponse]:
+        # Random rowids instead of ORDER BY RANDOM(): one primary key lookup per row. The next existing
+        # rowid is taken, so rows after a gap are picked a bit more often
         self.ensure_connection()
         with self.connection:
-            self.cursor.execute(
-                "SELECT key, value FROM cache ORDER BY RANDOM() LIMIT ?", (size,)
-            )
-            return [CacheResponse(key, value) for key, value in self.cursor]
+            try:
+                max_rowid = self.cursor.execute("SELECT MAX(rowid) FROM cache").fetchone()[0]
+            except sqlite3.OperationalError:
+                max_rowid = None
+
+            if max_rowid is None or max_rowid <= size:
+                # With sqlite_zstd `cache` is a view, which has no rowid (NULL or an error, depending on the
+                # SQLite version). Such a table, an empty one or one with at most `size` rows is shuffled whole
+                rows = self.cursor.execute(
+                    "SELECT key, value FROM cache ORDER BY RANDOM() LIMIT ?", (size,)
+                ).fetchall()
+                return [CacheResponse(key, value) for key, value in rows]
+
+            rows: dict[str, str] = {}
+            for _ in range(size * 3):
+                if len(rows) >= size:
+                    break
+                row = self.cursor.execute(
+                    "SELECT key, value FROM cache WHERE rowid >= ? ORDER BY rowid LIMIT 1",
+                    (random.randint(1, max_rowid),),
+                ).fetchone()
+                if row:
+                    rows[row[0]] = row[1]
+            return [CacheResponse(key, value) for key, value in rows.items()]
 
     def enable_zstd(self):
         self.ensure_connection()
@@ -163,14 +323,17 @@ class SQLiteCacheBackend(AbstractCacheBackend):
 
             self.connection.execute("PRAGMA auto_vacuum=full")
 
+    @synchronized
     def init_db(self):
         self.ensure_connection()
         with self.connection:
             self.cursor.execute(
                 "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT)"
             )
+            self.cursor.execute(IFRAME_TABLE_SQL)
             # self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_key ON cache (key)")
 
+    @synchronized
     def pull(self, key: str) -> Union[CacheResponse, None]:
         self.ensure_connection()
         with self.connection:
@@ -184,25 +347,24 @@ class SQLiteCacheBackend(AbstractCacheBackend):
                 logger.debug(f"No value found for key: {key}")
                 return None
 
+    @synchronized
     def push(self, key: str, value: Union[str, dict]) -> None:
-        if isinstance(value, dict):
-            try:
-                value = py_json.dumps(value)
-            except TypeError as e:
-                raise ValueError(f"Unable to serialize value to JSON: {e}")
-        elif not isinstance(value, str):
-            raise ValueError(
-                f"value argument should be a string or dict, not {type(value).__name__}"
+        value = dump_value(value)
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO cache VALUES (:0, :1)",
+                {"0": key, "1": value},
             )
 
+    @synchronized
+    def push_many(self, items: list[tuple[str, str]]) -> None:
+        # One transaction for the whole batch
         self.ensure_connection()
-        with self.lock:
-            with self.connection:
-                self.cursor.execute(
-                    "INSERT OR REPLACE INTO cache VALUES (:0, :1)",
-                    {"0": key, "1": value},
-                )
+        with self.connection:
+            self.cursor.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?)", items)
 
+    @synchronized
     def delete(self, key: str) -> None:
         self.ensure_connection()
         with self.connection:
@@ -215,6 +377,23 @@ class SQLiteCacheBackend(AbstractCacheBackend):
             else:
                 logger.debug(f"Attempted to delete non-existing key: {key}")
 
+    @synchronized
+    def pull_iframe(self, iframe_id: str) -> Optional[str]:
+        self.ensure_connection()
+        with self.connection:
+            row = self.cursor.execute(
+                "SELECT content FROM iframe_cache WHERE id = ?", (iframe_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    @synchronized
+    def push_iframe(self, iframe_id: str, content: str) -> None:
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO iframe_cache VALUES (?, ?)", (iframe_id, content)
+            )
+
     def _generate_test_data(self, num_rows: int, batch_size: int = 10000):
         logger.info("Generating test data")
         self.ensure_connection()
@@ -278,6 +457,7 @@ class SQLiteCacheBackend(AbstractCacheBackend):
         with self.connection:
             return self.connection.execute("SELECT sql FROM sqlite_master").fetchall()
 
+    @synchronized
     def close(self):
         if self.connection:
             self.connection.close()
@@ -289,10 +469,24 @@ class SQLiteCacheBackend(AbstractCacheBackend):
 
 
 class PostgreSQLCacheBackend(AbstractCacheBackend):
-    def __init__(self, connection_string: str):
+    def __init__(
+        self,
+        connection_string: str,
+        compression: bool = False,
+        compression_level: int = 9,
+    ):
         self.connection_string = connection_string
         self.connection = None
         self.cursor = None
+        self.lock = threading.RLock()
+        # With compression, values are written to `data` as zstd compressed bytea and `value` is NULL.
+        # Compressed rows are read back either way
+        self.compression = compression
+        self.compression_level = compression_level
+        self.codec: Optional[CacheCodec] = (
+            CacheCodec(compression_level) if compression else None
+        )
+        self.dictionary_checked_at = 0.0
         self.connect()
 
     def connect(self):
@@ -305,6 +499,7 @@ class PostgreSQLCacheBackend(AbstractCacheBackend):
         elif self.cursor is None or self.cursor.closed:
             self.cursor = self.connection.cursor()
 
+    @synchronized
     def init_db(self):
         self.ensure_connection()
         with self.connection:
@@ -316,66 +511,212 @@ class PostgreSQLCacheBackend(AbstractCacheBackend):
                 )
             """
             )
+            self.cursor.execute("ALTER TABLE cache ADD COLUMN IF NOT EXISTS data BYTEA")
+            self.cursor.execute(
+                "CREATE TABLE IF NOT EXISTS cache_dictionaries (id SERIAL PRIMARY KEY, data BYTEA NOT NULL)"
+            )
+            self.cursor.execute(METADATA_TABLE_SQL)
+            self.cursor.execute(IFRAME_TABLE_SQL)
+        if self.compression:
+            self.load_active_dictionary()
+
+    @synchronized
+    def load_active_dictionary(self):
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(
+                "SELECT id, data FROM cache_dictionaries ORDER BY id DESC LIMIT 1"
+            )
+            row = self.cursor.fetchone()
+        self.dictionary_checked_at = time.monotonic()
+        if row and row[0] != self.codec.active_dictionary_id:
+            self.codec.add_dictionary(row[0], row[1], active=True)
+            logger.debug(f"Using compression dictionary: {row[0]}")
+
+    @synchronized
+    def try_advisory_lock(self, lock_id: int) -> bool:
+        # Session level: held until the connection is closed
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute("SELECT pg_try_advisory_lock(%s)", (lock_id,))
+            return self.cursor.fetchone()[0]
 
+    @synchronized
+    def load_dictionary(self, dictionary_id: int):
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(
+                "SELECT data FROM cache_dictionaries WHERE id = %s", (dictionary_id,)
+            )
+            row = self.cursor.fetchone()
+        if not row:
+            raise UnknownDictionary(dictionary_id)
+        self.codec.add_dictionary(dictionary_id, row[0])
+
+    @synchronized
+    def train_dictionary(self, samples: int = 1000, size: int = 112640) -> int:
+        """Train a dictionary on random cached posts and use it for new values"""
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(
+                "SELECT key, value, data FROM cache ORDER BY RANDOM() LIMIT %s",
+                (samples,),
+            )
+            rows = self.cursor.fetchall()
+        dictionary = train_dictionary(
+            [self.decode_value(value, data) for _, value, data in rows], size
+        )
+        with self.connection:
+            self.cursor.execute(
+                "INSERT INTO cache_dictionaries (data) VALUES (%s) RETURNING id",
+                (psycopg2.Binary(dictionary),),
+            )
+            dictionary_id = self.cursor.fetchone()[0]
+        self.codec.add_dictionary(dictionary_id, dictionary, active=True)
+        logger.info(f"Trained compression dictionary {dictionary_id} on {len(rows)} posts")
+        return dictionary_id
+
+    def decode_value(self, value: Optional[str], data: Optional[bytes]) -> Optional[str]:
+        if data is None:
+            return value
+        if self.codec is None:
+            self.codec = CacheCodec(self.compression_level)
+        try:
+            return self.codec.decode(data)
+        except UnknownDictionary as ex:
+            self.load_dictionary(ex.dictionary_id)
+            return self.codec.decode(data)
+
+    def encode_row(self, key: str, value: str) -> tuple:
+        if self.compression:
+            if time.monotonic() - self.dictionary_checked_at > DICTIONARY_RELOAD_INTERVAL:
+                self.load_active_dictionary()
+            return key, None, psycopg2.Binary(self.codec.encode(value))
+        return key, value, None
+
+    @synchronized
     def all(self):
         self.ensure_connection()
         with self.connection:
-            self.cursor.execute("SELECT * FROM cache")
-            return self.cursor.fetchall()
+            self.cursor.execute("SELECT key, value, data FROM cache")
+            return [
+                (key, self.decode_value(value, data))
+                for key, value, data in self.cursor.fetchall()
+            ]
 
+    @synchronized
     def all_length(self) -> int:
         self.ensure_connection()
         with self.connection:
             self.cursor.execute("SELECT COUNT(*) FROM cache")
             return self.cursor.fetchone()[0]
 
-    def random(self, size: int) -> list[CacheResponse]:
+    @synchronized
+    def random_rows(self, table: str, columns: str, size: int) -> list[tuple]:
         self.ensure_connection()
         with self.connection:
             self.cursor.execute(
-                "SELECT key, value FROM cache ORDER BY RANDOM() LIMIT %s", (size,)
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass", (table,)
             )
-            return [CacheResponse(key, value) for key, value in self.cursor]
+            percent = random_sample_percent(self.cursor.fetchone()[0], size)
+            rows = []
+            if percent is not None:
+                self.cursor.execute(
+                    f"SELECT {columns} FROM {table} TABLESAMPLE SYSTEM (%s) ORDER BY RANDOM() LIMIT %s",
+                    (percent, size),
+                )
+                rows = self.cursor.fetchall()
+            if len(rows) < size:
+                self.cursor.execute(
+                    f"SELECT {columns} FROM {table} ORDER BY RANDOM() LIMIT %s",
+                    (size,),
+                )
+                rows = self.cursor.fetchall()
+        return rows
 
+    def random(self, size: int) -> list[CacheResponse]:
+        return [
+            CacheResponse(key, self.decode_value(value, data))
+            for key, value, data in self.random_rows("cache", "key, value, data", size)
+        ]
+
+    def random_metadata(self, size: int) -> list[PostMetadata]:
+        posts = [PostMetadata(*row) for row in self.random_rows("cache_metadata", ", ".join(METADATA_COLUMNS), size)]
+        if len(posts) < size:
+            # The side table has fewer rows than asked for, it's still being filled (see backfill_metadata).
+            # Only the rest is read from full posts, callers skip the duplicates this may give
+            posts.extend(super().random_metadata(size - len(posts)))
+        return posts
+
+    @synchronized
     def pull(self, key: str) -> Union[CacheResponse, None]:
         self.ensure_connection()
         with self.connection:
-            self.cursor.execute("SELECT value FROM cache WHERE key = %s", (key,))
+            self.cursor.execute(
+                "SELECT value, data FROM cache WHERE key = %s", (key,)
+            )
             cache = self.cursor.fetchone()
-            if cache:
-                logger.debug("Value found in DB, returning it")
-                return CacheResponse(key, cache[0])
-            else:
-                logger.debug(f"No value found for key: {key}")
-                return None
+        if cache:
+            logger.debug("Value found in DB, returning it")
+            return CacheResponse(key, self.decode_value(*cache))
+        else:
+            logger.debug(f"No value found for key: {key}")
+            return None
 
+    @synchronized
     def push(self, key: str, value: Union[str, dict]) -> None:
-        if isinstance(value, dict):
-            try:
-                value = py_json.dumps(value)
-            except TypeError as e:
-                raise ValueError(f"Unable to serialize value to JSON: {e}")
-        elif not isinstance(value, str):
-            raise ValueError(
-                f"value argument should be a string or dict, not {type(value).__name__}"
+        metadata = extract_post_metadata(key, value)
+        value = dump_value(value)
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(
+                "INSERT INTO cache (key, value, data) VALUES (%s, %s, %s) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, data = EXCLUDED.data",
+                self.encode_row(key, value),
             )
+            if metadata:
+                execute_values(self.cursor, METADATA_UPSERT_VALUES_SQL, [metadata])
 
+    @synchronized
+    def push_many(self, items: list[tuple[str, str]]) -> None:
+        # Keys must be unique within one batch, ON CONFLICT can't update the same row twice
+        metadata = [extract_post_metadata(key, value) for key, value in items]
         self.ensure_connection()
         with self.connection:
-            self.cursor.execute(
-                "INSERT INTO cache (key, value) VALUES (%s, %s) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value",
-                (key, value),
+            execute_values(
+                self.cursor,
+                "INSERT INTO cache (key, value, data) VALUES %s ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, data = EXCLUDED.data",
+                [self.encode_row(key, value) for key, value in items],
             )
+            metadata = [row for row in metadata if row]
+            if metadata:
+                execute_values(self.cursor, METADATA_UPSERT_VALUES_SQL, metadata)
 
+    @synchronized
     def delete(self, key: str) -> None:
         self.ensure_connection()
         with self.connection:
+            self.cursor.execute("DELETE FROM cache_metadata WHERE key = %s", (key,))
             self.cursor.execute("DELETE FROM cache WHERE key = %s", (key,))
             if self.cursor.rowcount > 0:
                 logger.debug(f"Deleted key: {key}")
             else:
                 logger.debug(f"Attempted to delete non-existing key: {key}")
 
+    @synchronized
+    def pull_iframe(self, iframe_id: str) -> Optional[str]:
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute("SELECT content FROM iframe_cache WHERE id = %s", (iframe_id,))
+            row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    @synchronized
+    def push_iframe(self, iframe_id: str, content: str) -> None:
+        self.ensure_connection()
+        with self.connection:
+            self.cursor.execute(IFRAME_UPSERT_SQL.format("%s, %s"), (iframe_id, content))
+
+    @synchronized
     def close(self):
         if self.cursor:
             self.cursor.close()
@@ -385,6 +726,218 @@ class PostgreSQLCacheBackend(AbstractCacheBackend):
         self.connection = None
 
 
+class AsyncPostgreSQLCacheBackend(AbstractAsyncCacheBackend):
+    """Same table as PostgreSQLCacheBackend, queried through an asyncpg pool without blocking the event loop"""
+
+    __slots__ = (
+        "connection_string",
+        "min_size",
+        "max_size",
+        "pool",
+        "pool_lock",
+        "compression",
+        "compression_level",
+        "codec",
+        "dictionary_checked_at",
+    )
+
+    def __init__(
+        self,
+        connection_string: str,
+        min_size: int = 2,
+        max_size: int = 10,
+        compression: bool = False,
+        compression_level: int = 9,
+    ):
+        if asyncpg is None:
+            raise ValueError("asyncpg library not found.")
+
+        self.connection_string = connection_string
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        self.pool_lock = asyncio.Lock()
+        self.compression = compression
+        self.compression_level = compression_level
+        self.codec: Optional[CacheCodec] = (
+            CacheCodec(compression_level) if compression else None
+        )
+        self.dictionary_checked_at = 0.0
+
+    async def connect(self):
+        pool = await asyncpg.create_pool(
+            self.connection_string, min_size=self.min_size, max_size=self.max_size
+        )
+        if self.compression:
+            await self.load_active_dictionary(pool)
+        self.pool = pool
+
+    async def load_active_dictionary(self, pool):
+        try:
+            row = await pool.fetchrow(
+                "SELECT id, data FROM cache_dictionaries ORDER BY id DESC LIMIT 1"
+            )
+        except asyncpg.UndefinedTableError:
+            row = None
+        self.dictionary_checked_at = time.monotonic()
+        if row and row["id"] != self.codec.active_dictionary_id:
+            self.codec.add_dictionary(row["id"], row["data"], active=True)
+            logger.debug(f"Using compression dictionary: {row['id']}")
+
+    async def encode_rows(self, items: list[tuple[str, str]]) -> list[tuple]:
+        if self.compression and time.monotonic() - self.dictionary_checked_at > DICTIONARY_RELOAD_INTERVAL:
+            await self.load_active_dictionary(await self.ensure_pool())
+        return [self.encode_row(key, value) for key, value in items]
+
+    async def ensure_pool(self):
+        # The pool belongs to the event loop it was created in, so it's created on first use
+        if self.pool is None:
+            async with self.pool_lock:
+                if self.pool is None:
+                    await self.connect()
+        return self.pool
+
+    async def init_db(self):
+        pool = await self.ensure_pool()
+        await pool.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """
+        )
+        await pool.execute("ALTER TABLE cache ADD COLUMN IF NOT EXISTS data BYTEA")
+        await pool.execute(
+            "CREATE TABLE IF NOT EXISTS cache_dictionaries (id SERIAL PRIMARY KEY, data BYTEA NOT NULL)"
+        )
+        await pool.execute(METADATA_TABLE_SQL)
+        await pool.execute(IFRAME_TABLE_SQL)
+
+    async def decode_value(self, value: Optional[str], data: Optional[bytes]) -> Optional[str]:
+        if data is None:
+            return value
+        if self.codec is None:
+            self.codec = CacheCodec(self.compression_level)
+        try:
+            return self.codec.decode(data)
+        except UnknownDictionary as ex:
+            pool = await self.ensure_pool()
+            dictionary = await pool.fetchval(
+                "SELECT data FROM cache_dictionaries WHERE id = $1", ex.dictionary_id
+            )
+            if dictionary is None:
+                raise
+            self.codec.add_dictionary(ex.dictionary_id, dictionary)
+            return self.codec.decode(data)
+
+    def encode_row(self, key: str, value: str) -> tuple:
+        if self.compression:
+            return key, None, self.codec.encode(value)
+        return key, value, None
+
+    async def all_length(self) -> int:
+        pool = await self.ensure_pool()
+        return await pool.fetchval("SELECT COUNT(*) FROM cache")
+
+    async def random_rows(self, table: str, columns: str, size: int) -> list:
+        pool = await self.ensure_pool()
+        percent = random_sample_percent(
+            await pool.fetchval("SELECT reltuples FROM pg_class WHERE oid = $1::regclass", table),
+            size,
+        )
+        rows = []
+        if percent is not None:
+            rows = await pool.fetch(
+                f"SELECT {columns} FROM {table} TABLESAMPLE SYSTEM ($1) ORDER BY RANDOM() LIMIT $2",
+                percent,
+                size,
+            )
+        if len(rows) < size:
+            rows = await pool.fetch(
+                f"SELECT {columns} FROM {table} ORDER BY RANDOM() LIMIT $1", size
+            )
+        return rows
+
+    async def random(self, size: int) -> list[CacheResponse]:
+        return [
+            CacheResponse(key, await self.decode_value(value, data))
+            for key, value, data in await self.random_rows("cache", "key, value, data", size)
+        ]
+
+    async def random_metadata(self, size: int) -> list[PostMetadata]:
+        posts = [PostMetadata(*row) for row in await self.random_rows("cache_metadata", ", ".join(METADATA_COLUMNS), size)]
+        if len(posts) < size:
+            # The side table has fewer rows than asked for, it's still being filled (see backfill_metadata).
+            # Only the rest is read from full posts, callers skip the duplicates this may give
+            posts.extend(await super().random_metadata(size - len(posts)))
+        return posts
+
+    async def pull(self, key: str) -> Union[CacheResponse, None]:
+        pool = await self.ensure_pool()
+        row = await pool.fetchrow("SELECT value, data FROM cache WHERE key = $1", key)
+        if row is not None:
+            logger.debug("Value found in DB, returning it")
+            return CacheResponse(key, await self.decode_value(row["value"], row["data"]))
+        else:
+            logger.debug(f"No value found for key: {key}")
+            return None
+
+    async def push(self, key: str, value: Union[str, dict]) -> None:
+        metadata = extract_post_metadata(key, value)
+        value = dump_value(value)
+
+        (row,) = await self.encode_rows([(key, value)])
+        pool = await self.ensure_pool()
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    "INSERT INTO cache (key, value, data) VALUES ($1, $2, $3) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, data = EXCLUDED.data",
+                    *row,
+                )
+                if metadata:
+                    await connection.execute(METADATA_UPSERT_ASYNC_SQL, *metadata)
+
+    async def push_many(self, items: list[tuple[str, str]]) -> None:
+        # A single multi-row upsert, keys must be unique within one batch
+        rows = await self.encode_rows(items)
+        metadata = [extract_post_metadata(key, value) for key, value in items]
+        pool = await self.ensure_pool()
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    "INSERT INTO cache (key, value, data) SELECT * FROM unnest($1::text[], $2::text[], $3::bytea[]) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, data = EXCLUDED.data",
+                    [row[0] for row in rows],
+                    [row[1] for row in rows],
+                    [row[2] for row in rows],
+                )
+                metadata = [row for row in metadata if row]
+                if metadata:
+                    await connection.executemany(METADATA_UPSERT_ASYNC_SQL, metadata)
+
+    async def delete(self, key: str) -> None:
+        pool = await self.ensure_pool()
+        await pool.execute("DELETE FROM cache_metadata WHERE key = $1", key)
+        status = await pool.execute("DELETE FROM cache WHERE key = $1", key)
+        if status != "DELETE 0":
+            logger.debug(f"Deleted key: {key}")
+        else:
+            logger.debug(f"Attempted to delete non-existing key: {key}")
+
+    async def pull_iframe(self, iframe_id: str) -> Optional[str]:
+        pool = await self.ensure_pool()
+        return await pool.fetchval("SELECT content FROM iframe_cache WHERE id = $1", iframe_id)
+
+    async def push_iframe(self, iframe_id: str, content: str) -> None:
+        pool = await self.ensure_pool()
+        await pool.execute(IFRAME_UPSERT_SQL.format("$1, $2"), iframe_id, content)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+        self.pool = None
+
+
 def migrate_to_postgres(
     sqlite_db_path: str, pg_conn_string: str, chunk_size: int = 1000
 ):
@@ -441,6 +994,139 @@ def migrate_to_postgres(
     )
 
 
+def compress_cache(
+    pg_conn_string: str,
+    batch_size: int = 500,
+    compression_level: int = 9,
+    train_samples: int = 1000,
+):
+    """Rewrite plain text rows as compressed `data`, batch by batch, while the cache stays in use"""
+    pg_db = PostgreSQLCacheBackend(
+        pg_conn_string, compression=True, compression_level=compression_level
+    )
+    pg_db.init_db()
+    # Every worker starts the migration, the first one to take the lock runs it
+    if not pg_db.try_advisory_lock(COMPRESS_CACHE_LOCK_ID):
+        logger.info("Cache compression is already running in another worker")
+        pg_db.close()
+        return
+
+    processed_rows = 0
+    start_time = time.time()
+    try:
+        # Loaded after the lock, a dictionary trained by a previous run is reused
+        pg_db.load_active_dictionary()
+        if pg_db.codec.active_dictionary_id is None and train_samples:
+            pg_db.train_dictionary(train_samples)
+
+        while True:
+            with pg_db.connection:
+                pg_db.cursor.execute(
+                    "SELECT key, value FROM cache WHERE data IS NULL AND value IS NOT NULL LIMIT %s",
+                    (batch_size,),
+                )
+                chunk = pg_db.cursor.fetchall()
+                if not chunk:
+                    break
+
+                # Rows rewritten by a push since they were read are left alone
+                execute_values(
+                    pg_db.cursor,
+                    "UPDATE cache SET value = NULL, data = v.data FROM (VALUES %s) AS v (key, value, data) WHERE cache.key = v.key AND cache.value = v.value",
+                    [
+                        (key, value, psycopg2.Binary(pg_db.codec.encode(value)))
+                        for key, value in chunk
+                    ],
+                )
+
+            processed_rows += len(chunk)
+            elapsed_time = time.time() - start_time
+            logger.info(
+                f"Compressed {processed_rows} rows. Speed: {processed_rows / elapsed_time:.2f} rows/second"
+            )
+    except Exception as e:
+        logger.error(f"An error occurred during compression: {e}")
+        logger.exception(e)
+    finally:
+        # Closing the connection releases the advisory lock
+        pg_db.close()
+
+    logger.success(f"Cache compression finished, {processed_rows} rows compressed")
+
+
+def backfill_metadata(pg_conn_string: str, batch_size: int = 500):
+    """Fill cache_metadata for posts cached before the side table existed"""
+    pg_db = PostgreSQLCacheBackend(pg_conn_string)
+    pg_db.init_db()
+    if not pg_db.try_advisory_lock(BACKFILL_METADATA_LOCK_ID):
+        logger.info("Metadata backfill is already running in another worker")
+        pg_db.close()
+        return
+
+    last_key = ""
+    processed_rows = 0
+    try:
+        while True:
+            with pg_db.connection:
+                pg_db.cursor.execute(
+                    "SELECT key, value, data FROM cache WHERE key > %s ORDER BY key LIMIT %s",
+                    (last_key, batch_size),
+                )
+                chunk = pg_db.cursor.fetchall()
+                if not chunk:
+                    break
+                last_key = chunk[-1][0]
+
+                metadata = []
+                for key, value, data in chunk:
+                    try:
+                        row = extract_post_metadata(key, pg_db.decode_value(value, data))
+                    except Exception as e:
+                        logger.warning(f"Skipping unreadable cached post {key}: {e}")
+                        continue
+                    if row:
+                        metadata.append(row)
+                # Rows written by a push in the meantime are newer, keep them
+                if metadata:
+                    execute_values(
+                        pg_db.cursor,
+                        f"INSERT INTO cache_metadata ({', '.join(METADATA_COLUMNS)}) VALUES %s ON CONFLICT (key) DO NOTHING",
+                        metadata,
+                    )
+
+            processed_rows += len(chunk)
+            logger.info(f"Metadata backfill: {processed_rows} rows processed")
+    except Exception as e:
+        logger.error(f"An error occurred during metadata backfill: {e}")
+        logger.exception(e)
+    finally:
+        pg_db.close()
+
+    logger.success(f"Metadata backfill finished, {processed_rows} rows processed")
+
+
+def execute_backfill_metadata_in_thread(pg_conn_string: str, batch_size: int = 500):
+    logger.info("Starting metadata backfill in thread")
+    backfill_thread = threading.Thread(
+        target=backfill_metadata, args=(pg_conn_string, batch_size), daemon=True
+    )
+    backfill_thread.start()
+    return backfill_thread
+
+
+def execute_compress_cache_in_thread(
+    pg_conn_string: str, batch_size: int = 500, compression_level: int = 9
+):
+    logger.info("Starting cache compression in thread")
+    compression_thread = threading.Thread(
+        target=compress_cache,
+        args=(pg_conn_string, batch_size, compression_level),
+        daemon=True,
+    )
+    compression_thread.start()
+    return compression_thread
+
+
 def execute_migrate_to_postgres_in_thread(
     sqlite_db_path: str, pg_conn_string: str, chunk_size: int = 1000
 ):
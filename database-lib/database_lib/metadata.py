@@ -0,0 +1,119 @@
+from typing import Optional, Union
+
+import orjson as json
+from loguru import logger
+
+# Columns of the cache_metadata side table, in insert order
+METADATA_COLUMNS = (
+    "key",
+    "title",
+    "subtitle",
+    "creator",
+    "collection",
+    "reading_time",
+    "tags",
+    "preview_image_id",
+    "is_locked",
+    "medium_url",
+    "updated_at",
+    "first_published_at",
+)
+
+METADATA_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS cache_metadata (
+        key TEXT PRIMARY KEY,
+        title TEXT,
+        subtitle TEXT,
+        creator TEXT,
+        collection TEXT,
+        reading_time DOUBLE PRECISION,
+        tags TEXT,
+        preview_image_id TEXT,
+        is_locked BOOLEAN,
+        medium_url TEXT,
+        updated_at BIGINT,
+        first_published_at BIGINT
+    )
+"""
+
+
+def metadata_upsert_sql(values: str) -> str:
+    update = ", ".join(f"{column} = EXCLUDED.{column}" for column in METADATA_COLUMNS[1:])
+    return f"INSERT INTO cache_metadata ({', '.join(METADATA_COLUMNS)}) VALUES {values} ON CONFLICT (key) DO UPDATE SET {update}"
+
+
+def _dumps(value) -> Optional[str]:
+    return None if value is None else json.dumps(value).decode("utf-8")
+
+
+def _loads(value: Optional[str]):
+    return None if value is None else json.loads(value)
+
+
+def extract_post_metadata(key: str, value: Union[str, dict]) -> Optional[tuple]:
+    """Row for cache_metadata, or None when the cached value holds no post.
+
+    Pass the parsed post when there is one. A value that isn't valid JSON gives None, so it's still
+    cached, only without metadata.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError as ex:
+            logger.warning(f"Not extracting metadata from invalid JSON for {key}: {ex}")
+            return None
+    try:
+        post = value["data"]["post"]
+    except (KeyError, TypeError):
+        return None
+    if not isinstance(post, dict) or not post:
+        return None
+
+    return (
+        key,
+        post.get("title"),
+        (post.get("previewContent") or {}).get("subtitle"),
+        _dumps(post.get("creator")),
+        _dumps(post.get("collection")),
+        post.get("readingTime"),
+        _dumps(post.get("tags")),
+        (post.get("previewImage") or {}).get("id"),
+        post.get("isLocked"),
+        post.get("mediumUrl"),
+        post.get("updatedAt"),
+        post.get("firstPublishedAt"),
+    )
+
+
+class PostMetadata:
+    """A cache_metadata row: the post fields the homepage needs, without the post content"""
+
+    __slots__ = METADATA_COLUMNS
+
+    def __init__(self, *row):
+        for column, value in zip(METADATA_COLUMNS, row):
+            setattr(self, column, value)
+
+    def to_post_data(self) -> dict:
+        # Same shape as the cached post JSON, so the usual metadata code works on it
+        return {
+            "data": {
+                "post": {
+                    "id": self.key,
+                    "title": self.title,
+                    "previewContent": {"subtitle": self.subtitle},
+                    "creator": _loads(self.creator),
+                    "collection": _loads(self.collection),
+                    "readingTime": self.reading_time,
+                    "tags": _loads(self.tags),
+                    "previewImage": {"id": self.preview_image_id},
+                    "isLocked": self.is_locked,
+                    "mediumUrl": self.medium_url,
+                    "updatedAt": self.updated_at,
+                    "firstPublishedAt": self.first_published_at,
+                }
+            }
+        }
+
+    def __repr__(self):
+        return f"PostMetadata({self.key!r}, {self.title!r})"
@@ -0,0 +1,151 @@
+import asyncio
+from typing import Union
+
+from loguru import logger
+
+from database_lib.main import (
+    AbstractAsyncCacheBackend,
+    AbstractCacheBackend,
+    CacheResponse,
+    dump_value,
+)
+from database_lib.metadata import PostMetadata
+
+
+class WriteBehindCache(AbstractAsyncCacheBackend):
+    """Buffers pushes in memory and writes them to `backend` in batches.
+
+    A batch is flushed when it reaches `max_batch_size` keys, every `flush_interval` seconds and on
+    `stop`/`close`. A key pushed twice before a flush is written once, with the last value. Reads see
+    buffered values. When `max_queue_size` keys are waiting, pushes of new keys go straight to the backend.
+    Calls to a sync backend run in a thread, so they don't block the event loop.
+    """
+
+    __slots__ = (
+        "backend",
+        "max_batch_size",
+        "flush_interval",
+        "max_queue_size",
+        "pending",
+        "flush_event",
+        "flush_lock",
+        "flusher",
+    )
+
+    def __init__(
+        self,
+        backend: Union[AbstractCacheBackend, AbstractAsyncCacheBackend],
+        max_batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 1000,
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.pending: dict[str, str] = {}
+        self.flush_event = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.flusher: Union[asyncio.Task, None] = None
+
+    async def _call(self, method: str, *args):
+        if isinstance(self.backend, AbstractAsyncCacheBackend):
+            return await getattr(self.backend, method)(*args)
+        return await asyncio.to_thread(getattr(self.backend, method), *args)
+
+    def _ensure_flusher(self):
+        # Started on first push, inside the event loop that uses the cache
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            # Stopping the flusher must not cut a batch that is already taken out of `pending`
+            await asyncio.shield(self.flush())
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            while self.pending:
+                batch = list(self.pending.items())[: self.max_batch_size]
+                for key, _ in batch:
+                    del self.pending[key]
+
+                try:
+                    await self._call("push_many", batch)
+                except Exception as ex:
+                    logger.error(f"Failed to write {len(batch)} cached posts: {ex}")
+                    logger.exception(ex)
+                    # Keep newer values pushed meanwhile, retry on the next flush while there is room
+                    for key, value in batch:
+                        if len(self.pending) >= self.max_queue_size:
+                            logger.warning(f"Write-behind queue is full, dropping cached post: {key}")
+                            continue
+                        self.pending.setdefault(key, value)
+                    return
+
+                logger.debug(f"Flushed {len(batch)} cached posts")
+
+    async def init_db(self):
+        await self._call("init_db")
+
+    async def all_length(self) -> int:
+        return await self._call("all_length")
+
+    async def random(self, size: int) -> list[CacheResponse]:
+        return await self._call("random", size)
+
+    async def random_metadata(self, size: int) -> list[PostMetadata]:
+        return await self._call("random_metadata", size)
+
+    async def pull(self, key: str) -> Union[CacheResponse, None]:
+        value = self.pending.get(key)
+        if value is not None:
+            return CacheResponse(key, value)
+        return await self._call("pull", key)
+
+    async def push(self, key: str, value: Union[str, dict]) -> None:
+        value = dump_value(value)
+
+        if len(self.pending) >= self.max_queue_size and key not in self.pending:
+            logger.warning("Write-behind queue is full, writing directly")
+            await self._call("push", key, value)
+            return
+
+        self.pending[key] = value
+        self._ensure_flusher()
+        if len(self.pending) >= self.max_batch_size:
+            self.flush_event.set()
+
+    async def push_many(self, items: list[tuple[str, str]]) -> None:
+        for key, value in items:
+            await self.push(key, value)
+
+    async def delete(self, key: str) -> None:
+        self.pending.pop(key, None)
+        await self._call("delete", key)
+
+    async def pull_iframe(self, iframe_id: str) -> Union[str, None]:
+        return await self._call("pull_iframe", iframe_id)
+
+    async def push_iframe(self, iframe_id: str, content: str) -> None:
+        # Rare next to posts, not worth buffering
+        await self._call("push_iframe", iframe_id, content)
+
+    async def stop(self) -> None:
+        if self.flusher is not None:
+            self.flusher.cancel()
+            try:
+                await self.flusher
+            except asyncio.CancelledError:
+                pass
+            self.flusher = None
+        await self.flush()
+
+    async def close(self):
+        await self.stop()
+        await self._call("close")
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from database_lib.compression import FORMAT_ZSTD, FORMAT_ZSTD_DICTIONARY, CacheCodec, UnknownDictionary, train_dictionary
+
+
+def make_post(index: int) -> str:
+    return json.dumps(
+        {
+            "data": {
+                "post": {
+                    "id": f"{index:012x}",
+                    "title": f"Post number {index}",
+                    "creator": {"id": f"user{index % 7}", "name": f"Author {index % 7}"},
+                    "content": {"bodyModel": {"paragraphs": [{"type": "P", "text": f"Paragraph {index} {n}"} for n in range(5)]}},
+                }
+            }
+        }
+    )
+
+
+@pytest.fixture(scope="module")
+def dictionary() -> bytes:
+    return train_dictionary([make_post(index) for index in range(200)], size=4096)
+
+
+def test_plain_zstd_round_trip():
+    codec = CacheCodec()
+    value = make_post(1)
+
+    blob = codec.encode(value)
+
+    assert blob[0] == FORMAT_ZSTD
+    assert CacheCodec().decode(blob) == value
+
+
+def test_dictionary_round_trip(dictionary):
+    codec = CacheCodec()
+    codec.add_dictionary(7, dictionary, active=True)
+    value = make_post(1000)
+
+    blob = codec.encode(value)
+
+    assert blob[0] == FORMAT_ZSTD_DICTIONARY
+    assert codec.decode(blob) == value
+
+    # Values written before a dictionary was trained stay readable
+    assert codec.decode(CacheCodec().encode(value)) == value
+
+
+def test_unknown_dictionary(dictionary):
+    codec = CacheCodec()
+    codec.add_dictionary(7, dictionary, active=True)
+    blob = codec.encode(make_post(1))
+
+    reader = CacheCodec()
+    with pytest.raises(UnknownDictionary) as ex:
+        reader.decode(blob)
+    assert ex.value.dictionary_id == 7
+
+    reader.add_dictionary(7, dictionary)
+    assert reader.decode(blob) == make_post(1)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        CacheCodec().decode(b"\x09data")
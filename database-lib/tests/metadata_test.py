@@ -0,0 +1,60 @@
+import json
+
+from database_lib import PostMetadata
+from database_lib.metadata import METADATA_COLUMNS, extract_post_metadata
+
+POST = {
+    "id": "1234abcd",
+    "title": "Title",
+    "previewContent": {"subtitle": "Subtitle"},
+    "creator": {"id": "user", "name": "Author"},
+    "collection": None,
+    "readingTime": 4.5,
+    "tags": [{"id": "python"}],
+    "previewImage": {"id": "1*image.png"},
+    "isLocked": True,
+    "mediumUrl": "https://medium.com/p/1234abcd",
+    "updatedAt": 1700000000000,
+    "firstPublishedAt": 1600000000000,
+    "content": {"bodyModel": {"paragraphs": []}},
+}
+
+
+def test_extract_from_dict_and_string():
+    value = {"data": {"post": POST}}
+
+    row = extract_post_metadata("1234abcd", value)
+
+    assert len(row) == len(METADATA_COLUMNS)
+    assert row == extract_post_metadata("1234abcd", json.dumps(value))
+    assert row[:3] == ("1234abcd", "Title", "Subtitle")
+    assert json.loads(row[3]) == POST["creator"]
+    assert row[4] is None
+
+
+def test_extract_without_a_post():
+    assert extract_post_metadata("a", {"data": {"post": None}}) is None
+    assert extract_post_metadata("a", {"errors": []}) is None
+    assert extract_post_metadata("a", "[]") is None
+    assert extract_post_metadata("a", {"data": {"post": "not a post"}}) is None
+
+
+def test_extract_from_invalid_json():
+    assert extract_post_metadata("a", '{"data": ') is None
+
+
+def test_to_post_data_gives_the_cached_post_fields():
+    metadata = PostMetadata(*extract_post_metadata("1234abcd", {"data": {"post": POST}}))
+
+    post = metadata.to_post_data()["data"]["post"]
+
+    assert post == {key: value for key, value in POST.items() if key != "content"}
+    assert repr(metadata) == "PostMetadata('1234abcd', 'Title')"
+
+
+def test_to_post_data_with_missing_fields():
+    post = PostMetadata(*extract_post_metadata("a", {"data": {"post": {"id": "a"}}})).to_post_data()["data"]["post"]
+
+    assert post["id"] == "a"
+    assert post["creator"] is None
+    assert post["previewImage"] == {"id": None}
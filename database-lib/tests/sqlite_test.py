@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from database_lib import SQLiteCacheBackend
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteCacheBackend(str(tmp_path / "cache.sqlite"))
+    cache.init_db()
+    yield cache
+    cache.close()
+
+
+def test_push_many_writes_the_batch_and_replaces_existing_keys(cache):
+    cache.push("a", {"value": "old"})
+
+    cache.push_many([("a", json.dumps({"value": "new"})), ("b", json.dumps({"value": "b"}))])
+
+    assert cache.all_length() == 2
+    assert cache.pull("a").json() == {"value": "new"}
+    assert cache.pull("b").json() == {"value": "b"}
+
+
+def test_push_many_with_an_empty_batch(cache):
+    cache.push_many([])
+
+    assert cache.all_length() == 0
+
+
+def fill(cache, count: int):
+    cache.push_many([(f"key{index}", json.dumps({"index": index})) for index in range(count)])
+
+
+def test_random_returns_distinct_keys(cache):
+    fill(cache, 50)
+
+    result = cache.random(10)
+
+    keys = [row.key for row in result]
+    assert len(keys) == 10
+    assert len(set(keys)) == 10
+    assert all(row.json() == {"index": int(row.key.removeprefix("key"))} for row in result)
+
+
+def test_random_returns_every_row_of_a_small_table(cache):
+    fill(cache, 5)
+
+    assert sorted(row.key for row in cache.random(10)) == [f"key{index}" for index in range(5)]
+
+
+def test_random_on_an_empty_table(cache):
+    assert cache.random(10) == []
+
+
+def test_random_without_rowid(cache):
+    # Like sqlite_zstd's transparent compression, which replaces the table with a view
+    cache.connection.executescript(
+        """
+        DROP TABLE cache;
+        CREATE TABLE _cache_zstd (key TEXT PRIMARY KEY, value TEXT);
+        CREATE VIEW cache AS SELECT key, value FROM _cache_zstd;
+        """
+    )
+    cache.connection.executemany("INSERT INTO _cache_zstd VALUES (?, ?)", [(f"key{index}", "{}") for index in range(20)])
+    cache.connection.commit()
+
+    keys = [row.key for row in cache.random(5)]
+
+    assert len(keys) == 5
+    assert len(set(keys)) == 5
+
+
+def test_random_metadata_is_read_from_full_posts(cache):
+    cache.push_many([("a", json.dumps({"data": {"post": {"id": "a", "title": "A"}}})), ("b", json.dumps({"errors": []}))])
+
+    assert [(post.key, post.title) for post in cache.random_metadata(10)] == [("a", "A")]
+
+
+def test_iframes_are_kept_apart_from_posts(cache):
+    assert cache.pull_iframe("abcd") is None
+
+    cache.push_iframe("abcd", "<html>old</html>")
+    cache.push_iframe("abcd", "<html>new</html>")
+
+    assert cache.pull_iframe("abcd") == "<html>new</html>"
+    assert cache.all_length() == 0
+    assert cache.pull("abcd") is None
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+from database_lib import SQLiteCacheBackend, WriteBehindCache
+
+
+class RecordingSQLiteCacheBackend(SQLiteCacheBackend):
+    __slots__ = ("threads",)
+
+    def push_many(self, items):
+        self.threads.append(threading.get_ident())
+        super().push_many(items)
+
+
+def make_backend(tmp_path) -> RecordingSQLiteCacheBackend:
+    backend = RecordingSQLiteCacheBackend(str(tmp_path / "cache.sqlite"))
+    backend.threads = []
+    backend.init_db()
+    return backend
+
+
+def test_sync_backend_is_written_from_a_thread(tmp_path):
+    backend = make_backend(tmp_path)
+
+    async def main():
+        cache = WriteBehindCache(backend, max_batch_size=10, flush_interval=60)
+        await cache.push("a", {"value": 1})
+        await cache.push("a", {"value": 2})
+        await cache.push("b", {"value": 3})
+
+        # Buffered values are visible before the flush
+        assert (await cache.pull("a")).json() == {"value": 2}
+        assert backend.all_length() == 0
+
+        await cache.close()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+
+    assert len(backend.threads) == 1
+    assert backend.threads[0] != loop_thread
+
+    backend.connect()
+    assert backend.all_length() == 2
+    assert backend.pull("a").json() == {"value": 2}
+    backend.close()
+
+
+def test_full_batch_is_flushed_without_waiting_for_the_interval(tmp_path):
+    backend = make_backend(tmp_path)
+
+    async def main():
+        cache = WriteBehindCache(backend, max_batch_size=2, flush_interval=60)
+        await cache.push("a", "{}")
+        await cache.push("b", "{}")
+        for _ in range(100):
+            if backend.threads:
+                break
+            await asyncio.sleep(0.01)
+        assert await cache.all_length() == 2
+        await cache.stop()
+
+    asyncio.run(main())
+    backend.close()
+
+
+def test_iframes_go_straight_to_the_backend(tmp_path):
+    backend = make_backend(tmp_path)
+
+    async def main():
+        cache = WriteBehindCache(backend, max_batch_size=10, flush_interval=60)
+        await cache.push_iframe("abcd", "<html></html>")
+        assert backend.pull_iframe("abcd") == "<html></html>"
+        assert await cache.pull_iframe("abcd") == "<html></html>"
+        await cache.close()
+
+    asyncio.run(main())
@@ -1,6 +1,7 @@
 import random
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+from curl_cffi import CurlOpt
 from curl_cffi.requests import AsyncSession
 from loguru import logger
 
@@ -9,17 +10,44 @@ from medium_parser.utils import generate_random_sha256_hash
 
 
 class MediumApi:
-    __slots__ = ("auth_cookies", "proxy_list", "timeout")
+    __slots__ = ("auth_cookies", "proxy_list", "timeout", "pool_size", "keepalive", "_sessions")
 
     def __init__(
         self,
         auth_cookies: Optional[str] = None,
         proxy_list: Optional[List[str]] = None,
         timeout: int = 3,
+        pool_size: int = 10,
+        keepalive: int = 60,
     ):
         self.auth_cookies = auth_cookies
         self.proxy_list = proxy_list
         self.timeout = timeout
+        # Connections per session, and seconds an idle connection is kept for reuse
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self._sessions: Dict[Optional[str], AsyncSession] = {}
+
+    def get_session(self, proxy: Optional[str] = None) -> AsyncSession:
+        """Long-lived session for `proxy`, so TLS and HTTP/3 connections to Medium are reused between posts"""
+        session = self._sessions.get(proxy)
+        if session is None:
+            session = AsyncSession(
+                max_clients=self.pool_size,
+                proxies={"http": proxy, "https": proxy} if proxy else None,
+                impersonate="chrome136",
+                http_version="v3",
+                # Every request sends its own cookies, nothing is carried over from earlier responses
+                discard_cookies=True,
+                curl_options={CurlOpt.MAXAGE_CONN: self.keepalive},
+            )
+            self._sessions[proxy] = session
+        return session
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            await session.close()
 
     async def query_post_by_id(self, post_id: str):
         logger.debug("Using graphql implementation")
@@ -65,26 +93,22 @@ class MediumApi:
         logger.debug("Request started...")
 
         try:
-            async with AsyncSession() as session:
-                response = await session.post(
-                    "https://medium.com/_/graphql",
-                    headers=headers,
-                    json=graphql_data,
-                    proxies={"http": proxy, "https": proxy} if proxy else None,
-                    timeout=self.timeout,
-                    impersonate="chrome136",
-                    http_version="v3"
-                )
+            response = await self.get_session(proxy).post(
+                "https://medium.com/_/graphql",
+                headers=headers,
+                json=graphql_data,
+                timeout=self.timeout,
+            )
 
-                if response.status_code != 200:
-                    logger.error(
-                        f"Failed to fetch post by ID {post_id} with status code: {response.status_code}, response: {response.text}"
-                    )
-                    return None
+            if response.status_code != 200:
+                logger.error(
+                    f"Failed to fetch post by ID {post_id} with status code: {response.status_code}, response: {response.text}"
+                )
+                return None
 
-                response_data = response.json()
-                # with open("/app/web/sidufh.json", "wb") as file:
-                #     file.write(response.content)
+            response_data = response.json()
+            # with open("/app/web/sidufh.json", "wb") as file:
+            #     file.write(response.content)
 
         except Exception as ex:
             logger.debug("Failed to make request or parse response")
@@ -0,0 +1,431 @@
+from __future__ import annotations
+
+import typing
+import urllib.parse
+
+import jinja2
+import tld
+from loguru import logger
+
+from rl_string_helper import RLStringHelper, split_overlapping_ranges
+
+from medium_parser import jinja_env, jinja_env_debug
+from medium_parser.emitter import FAST_BLOCK_EMITTERS
+from medium_parser.markups import parse_markups
+
+# Every template is compiled once at import time. Rendering a post only calls
+# `Template.render`, compiling templates per paragraph dominated render CPU on long posts.
+BLOCK_TEMPLATE_SOURCES: dict[str, str] = {
+    "h2": '<h2 id={{ id }} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-1xl md:text-2xl {{ css_class }}">{{ text }}</h2>',
+    "h3": '<h3 id={{ id }} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-1xl md:text-2xl {{ css_class }}">{{ text }}</h3>',
+    "h4": '<h4 id={{ id }} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-l md:text-xl {{ css_class }}">{{ text }}</h4>',
+    "image": '<div class="mt-7"><img loading="eager" alt="{{ paragraph.metadata.alt }}" class="pt-5 m-auto" role="presentation" referrerpolicy="no-referrer" src="https://miro.medium.com/v2/resize:fit:700/{{ paragraph.metadata.id }}"></div>',
+    "image_caption": "<figcaption class='mt-3 text-sm text-center text-gray-500 dark:text-gray-200'>{{ text }}</figcaption>",
+    "image_row": '<div class="mx-5"><div class="flex flex-row justify-center">{{ images }}</div></div>',
+    "paragraph": '<p class="{{ css_class }}">{{ text }}</p>',
+    "uli": '<ul class="pl-8 mt-2 list-disc">{{ li }}</ul>',
+    "oli": '<ol class="pl-8 mt-2 list-decimal">{{ li }}</ol>',
+    "li": "<li class='mt-3'>{{ text }}</li>",
+    "pre": '<pre class="flex flex-col justify-center border mt-7 dark:border-gray-700">{{code_block}}</pre>',
+    "code_block": '<code class="p-2 bg-gray-100 dark:bg-gray-900 overflow-x-auto {{ code_css_class }}">{{ text }}</code>',
+    "bq": '<blockquote style="box-shadow: inset 3px 0 0 0 rgb(209 207 239 / var(--tw-bg-opacity));" class="px-5 pt-3 pb-3 mt-5"><p class="font-italic">{{ text }}</p></blockquote>',
+    "pq": '<blockquote class="ml-5 text-2xl text-gray-600 mt-7 dark:text-gray-300"><p>{{ text }}</p></blockquote>',
+    # TODO: redirect all Medium embeding articles to Fredium
+    "mixtape_embed": """
+<div class="items-center p-2 overflow-hidden border border-gray-300 mt-7">
+    <a rel="noopener follow" href="{{ url }}" target="_blank">
+        <div class="flex flex-row justify-between p-2 overflow-hidden">
+            <div class="flex flex-col justify-center p-2">
+                <h2 class="text-base font-bold text-black dark:text-gray-100">{{ embed_title }}</h2>
+                <div class="block mt-2">
+                    <h3 class="text-sm text-grey-darker">{{ embed_description }}</h3>
+                </div>
+                <div class="mt-5">
+                    <p class="text-xs text-grey-darker">{{ embed_site }}</p>
+                </div>
+            </div>
+            <div class="relative flex h-40 flew-row w-60">
+                <div class="absolute inset-0 bg-center bg-cover" style="background-image: url('https://miro.medium.com/v2/resize:fit:320/{{ paragraph.mixtapeMetadata.thumbnailImageId }}'); background-repeat: no-repeat;" referrerpolicy="no-referrer"></div>
+            </div>
+        </div>
+    </a>
+</div>""",
+    "iframe": """<div class="mt-7"><div>
+    <iframe class="w-full" src="{{ src }}" referrerpolicy="no-referrer" width="{{ iframe_width }}" height="{{ iframe_height }}" allowfullscreen="" frameborder="0" scrolling="no"></iframe>
+</div></div>""",
+    "iframe_responsive": '<div class="mt-7"><iframe class="w-full" src="{{ src }}" width="{{ iframe_width }}" height="{{ iframe_height }}" referrerpolicy="no-referrer" allowfullscreen="" frameborder="0" scrolling="no"></iframe></div>',
+}
+
+BLOCK_TEMPLATES: dict[str, jinja2.Template] = {
+    name: jinja_env.from_string(source) for name, source in BLOCK_TEMPLATE_SOURCES.items()
+}
+
+# "jinja" renders the compiled templates, "fast" assembles the same HTML with plain strings
+BLOCK_EMITTERS: dict[str, dict[str, typing.Callable[..., str]]] = {
+    "jinja": {name: template.render for name, template in BLOCK_TEMPLATES.items()},
+    "fast": FAST_BLOCK_EMITTERS,
+}
+
+# Inline templates go through `RLStringHelper`, which needs the `DebugUndefined` environment
+# to measure the prefix and suffix around `{{ text }}`.
+HIGHLIGHT_TEMPLATE: jinja2.Template = jinja_env_debug.from_string(
+    '<mark class="bg-emerald-300">{{ text }}</mark>'
+)
+
+# paragraph name -> [(paragraph text the highlight was made on, start offset, end offset)]
+HighlightIndex = dict[str, list[tuple[str, int, int]]]
+
+
+def build_highlight_index(highlights: list) -> HighlightIndex:
+    """Group highlight spans by paragraph name, built once per post."""
+    index: HighlightIndex = {}
+    for highlight in highlights:
+        seen_names = set()
+        for highlight_paragraph in highlight["paragraphs"]:
+            name = highlight_paragraph["name"]
+            if name in seen_names:
+                continue
+            seen_names.add(name)
+            index.setdefault(name, []).append(
+                (
+                    highlight_paragraph["text"],
+                    highlight["startOffset"],
+                    highlight["endOffset"],
+                )
+            )
+    return index
+
+
+def merge_highlight_spans(spans: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    # Overlapping <mark> templates can't be nested, so overlapping highlights are joined
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+POST_PAGE_TITLE_TEMPLATE: jinja2.Template = jinja_env.from_string(
+    "{{ title }} | by {{ creator.name }}"
+)
+POST_PAGE_TITLE_WITH_COLLECTION_TEMPLATE: jinja2.Template = jinja_env.from_string(
+    "{{ title }} | by {{ creator.name }} | in {{ collection.name }}"
+)
+
+
+class BlockContext:
+    """Per-post state shared by the block renderers."""
+
+    __slots__ = ("paragraphs", "out_paragraphs", "taken_count", "post_data", "host_address", "emitters")
+
+    def __init__(
+        self,
+        paragraphs: list,
+        post_data: dict,
+        host_address: str,
+        html_emitter: str = "jinja",
+    ):
+        self.paragraphs: list[dict] = paragraphs
+        self.out_paragraphs: list[str] = []
+        # Blocks already handed out by `take_blocks`
+        self.taken_count: int = 0
+        self.post_data: dict = post_data
+        self.host_address: str = host_address
+        self.emitters: dict[str, typing.Callable[..., str]] = BLOCK_EMITTERS[html_emitter]
+
+    def render(self, template_name: str, **kwargs) -> str:
+        return self.emitters[template_name](**kwargs)
+
+    def take_blocks(self) -> list[str]:
+        """Blocks rendered since the last call, they are not kept here afterwards"""
+        blocks, self.out_paragraphs = self.out_paragraphs, []
+        self.taken_count += len(blocks)
+        return blocks
+
+    @property
+    def has_blocks(self) -> bool:
+        return self.taken_count > 0 or bool(self.out_paragraphs)
+
+
+# A block renderer receives the paragraph at `current_pos` and appends its HTML to
+# `ctx.out_paragraphs`, which only holds blocks not taken yet (see `BlockContext.take_blocks`).
+# It returns the position of the last paragraph it consumed, so blocks that group consecutive
+# paragraphs (lists, code, image rows) can skip ahead.
+BlockRenderer = typing.Callable[[BlockContext, int, RLStringHelper], int]
+
+BLOCK_RENDERERS: dict[str, BlockRenderer] = {}
+
+
+def block_renderer(*paragraph_types: str):
+    def decorator(func: BlockRenderer) -> BlockRenderer:
+        for paragraph_type in paragraph_types:
+            BLOCK_RENDERERS[paragraph_type] = func
+        return func
+
+    return decorator
+
+
+def parse_paragraph_text(
+    text: str, markups: list, is_code: bool = False
+) -> RLStringHelper:
+    # Hotfix, workaround for code block
+    has_code_block = any(markup["type"] == "CODE" for markup in markups)
+    if is_code or has_code_block:
+        quote_html_type = ["minimal"]
+        # quote_html_type = None
+    else:
+        quote_html_type = ["full"]
+    text_formater = RLStringHelper(text, quote_html_type=quote_html_type)
+
+    parsed_markups = parse_markups(markups)
+    fixed_markups = split_overlapping_ranges(parsed_markups)
+
+    for markup in fixed_markups:
+        text_formater.set_template(markup["start"], markup["end"], markup["template"])
+
+    return text_formater
+
+
+@block_renderer("H2", "H3", "H4")
+def render_header(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraph = ctx.paragraphs[current_pos]
+    css_class = []
+    if ctx.has_blocks:
+        css_class.append("pt-8" if paragraph["type"] == "H4" else "pt-12")
+    ctx.out_paragraphs.append(
+        ctx.render(
+            paragraph["type"].lower(),
+            id=paragraph["name"],
+            text=text_formater.get_text(),
+            css_class="".join(css_class),
+        )
+    )
+    return current_pos
+
+
+@block_renderer("IMG")
+def render_image(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraphs = ctx.paragraphs
+    paragraph = paragraphs[current_pos]
+    if paragraph["layout"] == "OUTSET_ROW":
+        image_templates_row = [ctx.render("image", paragraph=paragraph)]
+        _tmp_current_pos = current_pos + 1
+        while len(paragraphs) > _tmp_current_pos:
+            _paragraph = paragraphs[_tmp_current_pos]
+            if _paragraph["layout"] == "OUTSET_ROW_CONTINUE":
+                image_templates_row.append(ctx.render("image", paragraph=_paragraph))
+            else:
+                break
+
+            _tmp_current_pos += 1
+
+        ctx.out_paragraphs.append(
+            ctx.render("image_row", images="".join(image_templates_row))
+        )
+        return _tmp_current_pos - 1
+    elif paragraph["layout"] == "FULL_WIDTH":
+        logger.warning("IMG: not implemented FULL_WIDTH layout")
+        return current_pos
+
+    ctx.out_paragraphs.append(ctx.render("image", paragraph=paragraph))
+    if paragraph["text"]:
+        ctx.out_paragraphs.append(
+            ctx.render("image_caption", text=text_formater.get_text())
+        )
+    return current_pos
+
+
+@block_renderer("P")
+def render_paragraph(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraph = ctx.paragraphs[current_pos]
+    css_class = ["leading-8"]
+    if paragraph.get("hasDropCap", False):
+        #  не понятно как логика срабатывает, иногда как-будто две буквы идут в drop cap как здесь - https://medium.com/write-a-catalyst/trumps-gaza-proposal-a-negotiation-tactic-for-real-change-0291df856c77
+        css_class.extend(["first-letter:text-7xl", "first-letter:float-left", "first-letter:mr-2", "first-letter:pt-2"])
+    if ctx.paragraphs[current_pos - 1]["type"] in ["H4", "H3"]:
+        css_class.append("mt-3")
+    else:
+        css_class.append("mt-7")
+    ctx.out_paragraphs.append(
+        ctx.render("paragraph", text=text_formater.get_text(), css_class=" ".join(css_class))
+    )
+    return current_pos
+
+
+@block_renderer("ULI", "OLI")
+def render_list(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraphs = ctx.paragraphs
+    list_type = paragraphs[current_pos]["type"]
+    li_templates = []
+
+    _tmp_current_pos = current_pos
+    while len(paragraphs) > _tmp_current_pos:
+        _paragraph = paragraphs[_tmp_current_pos]
+        if _paragraph["type"] == list_type:
+            text_formater = parse_paragraph_text(_paragraph["text"], _paragraph["markups"])
+            li_templates.append(ctx.render("li", text=text_formater.get_text()))
+        else:
+            break
+
+        _tmp_current_pos += 1
+
+    ctx.out_paragraphs.append(ctx.render(list_type.lower(), li="".join(li_templates)))
+    return _tmp_current_pos - 1
+
+
+@block_renderer("PRE")
+def render_code_block(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraphs = ctx.paragraphs
+    paragraph = paragraphs[current_pos]
+    code_css_class = []
+    if (
+        paragraph["codeBlockMetadata"]
+        and paragraph["codeBlockMetadata"]["lang"] is not None
+    ):
+        code_css_class.append(f'language-{paragraph["codeBlockMetadata"]["lang"]}')
+    else:
+        code_css_class.append("nohighlight")
+        # code_css_class.append("auto")
+
+    code_list = []
+    _tmp_current_pos = current_pos
+    while len(paragraphs) > _tmp_current_pos:
+        _paragraph = paragraphs[_tmp_current_pos]
+        if _paragraph["type"] == "PRE":
+            text_formater = parse_paragraph_text(
+                _paragraph["text"], _paragraph["markups"], is_code=True
+            )
+            code_list.append(text_formater.get_text())
+        else:
+            break
+
+        _tmp_current_pos += 1
+
+    code_block_rendered = ctx.render(
+        "code_block", text="\n".join(code_list), code_css_class=" ".join(code_css_class)
+    )
+    ctx.out_paragraphs.append(ctx.render("pre", code_block=code_block_rendered))
+    return _tmp_current_pos - 1
+
+
+@block_renderer("BQ", "PQ")
+def render_quote(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraph = ctx.paragraphs[current_pos]
+    quote_rendered = ctx.render(paragraph["type"].lower(), text=text_formater.get_text())
+    logger.trace(quote_rendered)
+    ctx.out_paragraphs.append(quote_rendered)
+    return current_pos
+
+
+@block_renderer("MIXTAPE_EMBED")
+def render_mixtape_embed(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraph = ctx.paragraphs[current_pos]
+    if paragraph.get("mixtapeMetadata") is not None:
+        url = paragraph["mixtapeMetadata"]["href"]
+    else:
+        logger.warning("Ignore MIXTAPE_EMBED paragraph type, since we can't get url")
+        return current_pos
+
+    text_raw = paragraph["text"]
+
+    if len(paragraph["markups"]) != 3:
+        logger.warning("Ignore MIXTAPE_EMBED paragraph type, since we can't split text")
+        return current_pos
+
+    title_range = paragraph["markups"][1]
+    description_range = paragraph["markups"][2]
+
+    logger.trace(f"{title_range=}")
+    logger.trace(f"{description_range=}")
+
+    embed_title = text_raw[title_range["start"] : title_range["end"]]
+    embed_description = text_raw[description_range["start"] : description_range["end"]]
+
+    logger.trace(f"{embed_title=}")
+    logger.trace(f"{embed_description=}")
+
+    try:
+        embed_site = tld.get_fld(url)
+    except Exception as ex:
+        logger.warning(f"Can't get embed site fld: {ex}. Using custom logic...")
+        parsed_url = urllib.parse.urlparse(url)
+        embed_site = parsed_url.hostname
+
+    logger.trace(f"{embed_site=}")
+
+    ctx.out_paragraphs.append(
+        ctx.render(
+            "mixtape_embed",
+            paragraph=paragraph,
+            url=url,
+            embed_title=embed_title,
+            embed_description=embed_description,
+            embed_site=embed_site,
+        )
+    )
+    return current_pos
+
+
+@block_renderer("IFRAME")
+def render_iframe(ctx: BlockContext, current_pos: int, text_formater: RLStringHelper) -> int:
+    paragraph = ctx.paragraphs[current_pos]
+    logger.debug("Processing IFRAME paragraph")
+
+    # First check if we have direct mediaResource in the iframe
+    media_resource = paragraph.get("iframe", {}).get("mediaResource", {})
+
+    # If mediaResource is just a reference, look it up in post_data
+    media_resource_ref = paragraph.get("iframe", {}).get("mediaResource", {}).get("__ref")
+    if media_resource_ref and not media_resource.get("id") and not media_resource.get("iframeSrc"):
+        logger.debug(f"Found media resource reference: {media_resource_ref}")
+        data_payload = ctx.post_data.get("data", {})
+        if media_resource_ref in data_payload:
+            media_resource = data_payload[media_resource_ref]
+            logger.debug(f"Found media resource for ref: {media_resource_ref}")
+        else:
+            logger.warning(f"Could not find media resource for ref: {media_resource_ref}")
+
+    # Get iframe source from mediaResource
+    iframe_src_val = media_resource.get("iframeSrc")
+    iframe_id = media_resource.get("id")
+
+    # Determine the source URL for the iframe
+    src = iframe_src_val
+    if not src and iframe_id:
+        logger.debug(f"Using fallback iframe URL with ID: {iframe_id}")
+        src = f"{ctx.host_address}/render_iframe/{iframe_id}"
+
+    if not src:
+        logger.warning("No iframe source found, skipping iframe")
+        return current_pos
+
+    # Get iframe dimensions
+    iframe_width = media_resource.get("iframeWidth")
+    iframe_height = media_resource.get("iframeHeight")
+
+    # If dimensions are available in paragraph.iframe directly, use those
+    if not iframe_width and paragraph.get("iframe", {}).get("iframeWidth"):
+        iframe_width = paragraph["iframe"]["iframeWidth"]
+    if not iframe_height and paragraph.get("iframe", {}).get("iframeHeight"):
+        iframe_height = paragraph["iframe"]["iframeHeight"]
+
+    logger.debug(f"Iframe dimensions: {iframe_width}x{iframe_height}")
+
+    # Render with aspect ratio if we have valid dimensions
+    if iframe_width and iframe_height and iframe_width > 0:
+        template_name = "iframe"
+    else:
+        # Fallback to responsive iframe without aspect ratio
+        template_name = "iframe_responsive"
+
+    ctx.out_paragraphs.append(
+        ctx.render(
+            template_name,
+            src=src,
+            iframe_width=iframe_width or "100%",
+            iframe_height=iframe_height or "100%",
+        )
+    )
+    return current_pos
@@ -1,27 +1,37 @@
 from __future__ import annotations
 
 import asyncio
+import inspect
+import itertools
 import math
 import textwrap
 import typing
-import urllib.parse
 
 import jinja2
-import tld
 from asyncer import asyncify
 from loguru import logger
 
-from rl_string_helper import RLStringHelper, split_overlapping_ranges
+from rl_string_helper import RLStringHelper
 
-from . import jinja_env
 from .api import MediumApi
+from .blocks import (
+    BLOCK_EMITTERS,
+    BLOCK_RENDERERS,
+    HIGHLIGHT_TEMPLATE,
+    POST_PAGE_TITLE_TEMPLATE,
+    POST_PAGE_TITLE_WITH_COLLECTION_TEMPLATE,
+    BlockContext,
+    build_highlight_index,
+    merge_highlight_spans,
+    parse_paragraph_text,
+)
 from .exceptions import (
     InvalidMediumPostURL,
     InvalidURL,
     MediumPostQueryError,
 )
-from .markups import parse_markups
-from .models.html_result import HtmlResult
+from .models.html_result import HtmlResult, HtmlStreamResult
+from .singleflight import SingleFlight
 from .time import convert_datetime_to_human_readable
 from .utils import (
     correct_url,
@@ -34,7 +44,9 @@ from .utils import (
 )
 
 if typing.TYPE_CHECKING:
-    from database_lib import AbstractCacheBackend
+    from database_lib import AbstractAsyncCacheBackend, AbstractCacheBackend
+
+    from .render_pool import ProcessRenderExecutor
 
 
 class MediumParser:
@@ -45,18 +57,28 @@ class MediumParser:
         "post_template",
         "timeout",
         "medium_api",
+        "html_emitter",
+        "render_executor",
+        "_inflight",
     )
 
     def __init__(
         self,
-        cache: AbstractCacheBackend,
+        cache: AbstractCacheBackend | AbstractAsyncCacheBackend,
         medium_api: MediumApi,
         timeout: int,
         host_address: str,
         template_folder: str = "./templates",
+        html_emitter: str = "jinja",
+        render_executor: ProcessRenderExecutor | None = None,
     ):
+        if html_emitter not in BLOCK_EMITTERS:
+            raise ValueError(
+                f"Unknown HTML emitter: {html_emitter}. Available: {', '.join(BLOCK_EMITTERS)}"
+            )
+
         self.timeout: int = timeout
-        self.cache: AbstractCacheBackend = cache
+        self.cache: AbstractCacheBackend | AbstractAsyncCacheBackend = cache
         self.host_address: str = host_address
         self.jinja_template: jinja2.Environment = jinja2.Environment(
             loader=jinja2.FileSystemLoader(template_folder)
@@ -65,6 +87,10 @@ class MediumParser:
             "post.html"
         )
         self.medium_api: MediumApi = medium_api
+        self.html_emitter: str = html_emitter
+        self.render_executor: ProcessRenderExecutor | None = render_executor
+        # Concurrent requests for the same post share one query and one render
+        self._inflight: SingleFlight = SingleFlight()
 
     async def resolve(self, unknown: str) -> str:
         logger.debug(f"We got some unknown data: {unknown=}. Trying resolve them...///")
@@ -100,14 +126,22 @@ class MediumParser:
 
         return post_id
 
+    async def cache_call(self, method: str, *args):
+        """Calls `method` of the cache backend, awaiting it if the backend is async"""
+        # Async backends don't block the event loop, sync ones are called in place as before
+        result = getattr(self.cache, method)(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
     async def delete_from_cache(self, post_id: str):
-        self.cache.delete(post_id)
+        await self.cache_call("delete", post_id)
         return True
 
     async def get_post_data_from_cache(self, post_id: str):
         async def _get_from_cache():
             logger.debug("Using cache backend")
-            post_data = self.cache.pull(post_id)
+            post_data = await self.cache_call("pull", post_id)
             if post_data:
                 logger.debug("post query was found on cache")
                 parsed_data = post_data.json()
@@ -162,6 +196,22 @@ class MediumParser:
         use_cache: bool = True,
         retry: int = 2,
         force_cache: bool = False,
+    ):
+        return await self._inflight.do(
+            ("query", post_id, use_cache, retry, force_cache),
+            self._query,
+            post_id,
+            use_cache,
+            retry,
+            force_cache,
+        )
+
+    async def _query(
+        self,
+        post_id: str,
+        use_cache: bool,
+        retry: int,
+        force_cache: bool,
     ):
         logger.debug(f"Medium QUERY: {use_cache=}, {retry=}, {force_cache=}")
 
@@ -205,7 +255,7 @@ class MediumParser:
 
         if not is_cache_used:
             logger.debug("Pushing post data to cache")
-            self.cache.push(post_id, post_data)
+            await self.cache_call("push", post_id, post_data)
 
         logger.trace("Query: done")
         return post_data
@@ -220,32 +270,35 @@ class MediumParser:
         tags: list,
         post_data: dict,
     ) -> tuple[list, str, str]:
-        paragraphs = content["bodyModel"]["paragraphs"]
-        tags_list = [tag["displayTitle"] for tag in tags]
         out_paragraphs: list[str] = []
-        current_pos = 0
-
-        def parse_paragraph_text(
-            text: str, markups: list, is_code: bool = False
-        ) -> RLStringHelper:
-            # Hotfix, workaround for code block
-            has_code_block = any(markup["type"] == "CODE" for markup in markups)
-            if is_code or has_code_block:
-                quote_html_type = ["minimal"]
-                # quote_html_type = None
-            else:
-                quote_html_type = ["full"]
-            text_formater = RLStringHelper(text, quote_html_type=quote_html_type)
-
-            parsed_markups = parse_markups(markups)
-            fixed_markups = split_overlapping_ranges(parsed_markups)
+        blocks = self._iter_content_html_post(
+            content, title, subtitle, preview_image_id, highlights, tags, post_data
+        )
+        while True:
+            try:
+                out_paragraphs.append(next(blocks))
+            except StopIteration as stop:
+                title, subtitle = stop.value
+                break
 
-            for markup in fixed_markups:
-                text_formater.set_template(
-                    markup["start"], markup["end"], markup["template"]
-                )
+        return out_paragraphs, title, subtitle
 
-            return text_formater
+    def _iter_content_html_post(
+        self,
+        content: dict,
+        title: str,
+        subtitle: str,
+        preview_image_id: str,
+        highlights: list,
+        tags: list,
+        post_data: dict,
+    ) -> typing.Generator[str, None, tuple[str, str]]:
+        """Yield rendered body blocks one by one, returns the detected title and subtitle."""
+        paragraphs = content["bodyModel"]["paragraphs"]
+        tags_list = [tag["displayTitle"] for tag in tags]
+        highlight_index = build_highlight_index(highlights)
+        ctx = BlockContext(paragraphs, post_data, self.host_address, self.html_emitter)
+        current_pos = 0
 
         while len(paragraphs) > current_pos:
             paragraph = paragraphs[current_pos]
@@ -302,397 +355,52 @@ class MediumParser:
             else:
                 text_formater = parse_paragraph_text("", [])
 
-            for highlight in highlights:
-                for highlight_paragraph in highlight["paragraphs"]:
-                    if highlight_paragraph["name"] == paragraph["name"]:
-                        logger.trace("Apply highlight to this paragraph")
-                        if highlight_paragraph["text"] != text_formater.get_text():
-                            logger.warning(
-                                "Highlighted text and paragraph text are not the same! Skip..."
-                            )
-                            break
-                        quote_markup_template = (
-                            '<mark class="bg-emerald-300">{{ text }}</mark>'
-                        )
-                        text_formater.set_template(
-                            highlight["startOffset"],
-                            highlight["endOffset"],
-                            quote_markup_template,
-                        )
-                        break
-
-            if paragraph["type"] == "H2":
-                css_class = []
-                if out_paragraphs:
-                    css_class.append("pt-12")
-                header_template = jinja_env.from_string(
-                    '<h2 id={{ id }} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-1xl md:text-2xl {{ css_class }}">{{ text }}</h2>'
-                )
-                header_template_rendered = header_template.render(
-                    id=paragraph["name"],
-                    text=text_formater.get_text(),
-                    css_class="".join(css_class),
-                )
-                out_paragraphs.append(header_template_rendered)
-            elif paragraph["type"] == "H3":
-                css_class = []
-                if out_paragraphs:
-                    css_class.append("pt-12")
-                header_template = jinja_env.from_string(
-                    '<h3 id={{ id }} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-1xl md:text-2xl {{ css_class }}">{{ text }}</h3>'
-                )
-                header_template_rendered = header_template.render(
-                    id=paragraph["name"],
-                    text=text_formater.get_text(),
-                    css_class="".join(css_class),
-                )
-                out_paragraphs.append(header_template_rendered)
-            elif paragraph["type"] == "H4":
-                css_class = []
-                if out_paragraphs:
-                    css_class.append("pt-8")
-                header_template = jinja_env.from_string(
-                    '<h4 id={{ id }} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-l md:text-xl {{ css_class }}">{{ text }}</h4>'
-                )
-                header_template_rendered = header_template.render(
-                    id=paragraph["name"],
-                    text=text_formater.get_text(),
-                    css_class="".join(css_class),
-                )
-                out_paragraphs.append(header_template_rendered)
-            elif paragraph["type"] == "IMG":
-                image_template = jinja_env.from_string(
-                    '<div class="mt-7"><img loading="eager" alt="{{ paragraph.metadata.alt }}" class="pt-5 m-auto" role="presentation" referrerpolicy="no-referrer" src="https://miro.medium.com/v2/resize:fit:700/{{ paragraph.metadata.id }}"></div>'
-                )
-                image_caption_template = jinja_env.from_string(
-                    "<figcaption class='mt-3 text-sm text-center text-gray-500 dark:text-gray-200'>{{ text }}</figcaption>"
-                )
-                if paragraph["layout"] == "OUTSET_ROW":
-                    image_templates_row = []
-                    img_row_template = jinja_env.from_string(
-                        '<div class="mx-5"><div class="flex flex-row justify-center">{{ images }}</div></div>'
-                    )
-                    image_template_rendered = image_template.render(paragraph=paragraph)
-                    image_templates_row.append(image_template_rendered)
-                    _tmp_current_pos = current_pos + 1
-                    while len(paragraphs) > _tmp_current_pos:
-                        _paragraph = paragraphs[_tmp_current_pos]
-                        if _paragraph["layout"] == "OUTSET_ROW_CONTINUE":
-                            image_template_rendered = image_template.render(
-                                paragraph=_paragraph
-                            )
-                            image_templates_row.append(image_template_rendered)
-                        else:
-                            break
-
-                        _tmp_current_pos += 1
-
-                    img_row_template_rendered = img_row_template.render(
-                        images="".join(image_templates_row)
-                    )
-                    out_paragraphs.append(img_row_template_rendered)
-
-                    current_pos = _tmp_current_pos - 1
-                elif paragraph["layout"] == "FULL_WIDTH":
-                    logger.warning("IMG: not implemented FULL_WIDTH layout")
-                    current_pos += 1
-                    continue
-                else:
-                    image_template_rendered = image_template.render(paragraph=paragraph)
-                    out_paragraphs.append(image_template_rendered)
-                    if paragraph["text"]:
-                        out_paragraphs.append(
-                            image_caption_template.render(text=text_formater.get_text())
-                        )
-            elif paragraph["type"] == "P":
-                css_class = ["leading-8"]
-                if paragraph.get("hasDropCap", False):
-                    #  не понятно как логика срабатывает, иногда как-будто две буквы идут в drop cap как здесь - https://medium.com/write-a-catalyst/trumps-gaza-proposal-a-negotiation-tactic-for-real-change-0291df856c77
-                    css_class.extend(["first-letter:text-7xl", "first-letter:float-left", "first-letter:mr-2", "first-letter:pt-2"])
-                paragraph_template = jinja_env.from_string(
-                    '<p class="{{ css_class }}">{{ text }}</p>'
-                )
-                if paragraphs[current_pos - 1]["type"] in ["H4", "H3"]:
-                    css_class.append("mt-3")
-                else:
-                    css_class.append("mt-7")
-                paragraph_template_rendered = paragraph_template.render(
-                    text=text_formater.get_text(), css_class=" ".join(css_class)
-                )
-                out_paragraphs.append(paragraph_template_rendered)
-            elif paragraph["type"] == "ULI":
-                uli_template = jinja_env.from_string(
-                    '<ul class="pl-8 mt-2 list-disc">{{ li }}</ul>'
-                )
-                li_template = jinja_env.from_string("<li class='mt-3'>{{ text }}</li>")
-                li_templates = []
-
-                _tmp_current_pos = current_pos
-                while len(paragraphs) > _tmp_current_pos:
-                    _paragraph = paragraphs[_tmp_current_pos]
-                    if _paragraph["type"] == "ULI":
-                        text_formater = parse_paragraph_text(
-                            _paragraph["text"], _paragraph["markups"]
-                        )
-                        li_template_rendered = li_template.render(
-                            text=text_formater.get_text()
-                        )
-                        li_templates.append(li_template_rendered)
-                    else:
-                        break
-
-                    _tmp_current_pos += 1
-
-                uli_template_rendered = uli_template.render(li="".join(li_templates))
-                out_paragraphs.append(uli_template_rendered)
-
-                current_pos = _tmp_current_pos - 1
-            elif paragraph["type"] == "OLI":
-                ol_template = jinja_env.from_string(
-                    '<ol class="pl-8 mt-2 list-decimal">{{ li }}</ol>'
-                )
-                li_template = jinja_env.from_string("<li class='mt-3'>{{ text }}</li>")
-                li_templates = []
-
-                _tmp_current_pos = current_pos
-                while len(paragraphs) > _tmp_current_pos:
-                    _paragraph = paragraphs[_tmp_current_pos]
-                    if _paragraph["type"] == "OLI":
-                        text_formater = parse_paragraph_text(
-                            _paragraph["text"], _paragraph["markups"]
-                        )
-                        li_template_rendered = li_template.render(
-                            text=text_formater.get_text()
-                        )
-                        li_templates.append(li_template_rendered)
-                    else:
-                        break
-
-                    _tmp_current_pos += 1
-
-                ol_template_rendered = ol_template.render(li="".join(li_templates))
-                out_paragraphs.append(ol_template_rendered)
-
-                current_pos = _tmp_current_pos - 1
-            elif paragraph["type"] == "PRE":
-                pre_template = jinja_env.from_string(
-                    '<pre class="flex flex-col justify-center border mt-7 dark:border-gray-700">{{code_block}}</pre>'
-                )
-                code_block_template = jinja_env.from_string(
-                    '<code class="p-2 bg-gray-100 dark:bg-gray-900 overflow-x-auto {{ code_css_class }}">{{ text }}</code>'
-                )
-
-                code_css_class = []
-                if (
-                    paragraph["codeBlockMetadata"]
-                    and paragraph["codeBlockMetadata"]["lang"] is not None
-                ):
-                    code_css_class.append(
-                        f'language-{paragraph["codeBlockMetadata"]["lang"]}'
-                    )
-                else:
-                    code_css_class.append("nohighlight")
-                    # code_css_class.append("auto")
-
-                code_list = []
-                _tmp_current_pos = current_pos
-                while len(paragraphs) > _tmp_current_pos:
-                    _paragraph = paragraphs[_tmp_current_pos]
-                    if _paragraph["type"] == "PRE":
-                        text_formater = parse_paragraph_text(
-                            _paragraph["text"], _paragraph["markups"], is_code=True
+            paragraph_highlights = highlight_index.get(paragraph["name"])
+            if paragraph_highlights:
+                logger.trace("Apply highlights to this paragraph")
+                paragraph_text = text_formater.get_text()
+                highlight_spans = []
+                for highlight_text, start_offset, end_offset in paragraph_highlights:
+                    if highlight_text != paragraph_text:
+                        logger.warning(
+                            "Highlighted text and paragraph text are not the same! Skip..."
                         )
-                        code_list.append(text_formater.get_text())
-                    else:
-                        break
-
-                    _tmp_current_pos += 1
-
-                code_block_template_rendered = code_block_template.render(
-                    text="\n".join(code_list), code_css_class=" ".join(code_css_class)
-                )
-                pre_template_rendered = pre_template.render(
-                    code_block=code_block_template_rendered
-                )
-
-                out_paragraphs.append(pre_template_rendered)
-                current_pos = _tmp_current_pos - 1
-            elif paragraph["type"] == "BQ":
-                bq_template = jinja_env.from_string(
-                    '<blockquote style="box-shadow: inset 3px 0 0 0 rgb(209 207 239 / var(--tw-bg-opacity));" class="px-5 pt-3 pb-3 mt-5"><p class="font-italic">{{ text }}</p></blockquote>'
-                )
-                bq_template_rendered = bq_template.render(text=text_formater.get_text())
-                logger.trace(bq_template_rendered)
-                out_paragraphs.append(bq_template_rendered)
-            elif paragraph["type"] == "PQ":
-                pq_template = jinja_env.from_string(
-                    '<blockquote class="ml-5 text-2xl text-gray-600 mt-7 dark:text-gray-300"><p>{{ text }}</p></blockquote>'
-                )
-                pq_template_rendered = pq_template.render(text=text_formater.get_text())
-                logger.trace(pq_template_rendered)
-                out_paragraphs.append(pq_template_rendered)
-            elif paragraph["type"] == "MIXTAPE_EMBED":
-                # TODO: redirect all Medium embeding articles to Fredium
-                mixtape_embed_html = """
-<div class="items-center p-2 overflow-hidden border border-gray-300 mt-7">
-    <a rel="noopener follow" href="{{ url }}" target="_blank">
-        <div class="flex flex-row justify-between p-2 overflow-hidden">
-            <div class="flex flex-col justify-center p-2">
-                <h2 class="text-base font-bold text-black dark:text-gray-100">{{ embed_title }}</h2>
-                <div class="block mt-2">
-                    <h3 class="text-sm text-grey-darker">{{ embed_description }}</h3>
-                </div>
-                <div class="mt-5">
-                    <p class="text-xs text-grey-darker">{{ embed_site }}</p>
-                </div>
-            </div>
-            <div class="relative flex h-40 flew-row w-60">
-                <div class="absolute inset-0 bg-center bg-cover" style="background-image: url('https://miro.medium.com/v2/resize:fit:320/{{ paragraph.mixtapeMetadata.thumbnailImageId }}'); background-repeat: no-repeat;" referrerpolicy="no-referrer"></div>
-            </div>
-        </div>
-    </a>
-</div>"""
-                embed_template = jinja_env.from_string(mixtape_embed_html)
-                if paragraph.get("mixtapeMetadata") is not None:
-                    url = paragraph["mixtapeMetadata"]["href"]
-                else:
-                    logger.warning(
-                        "Ignore MIXTAPE_EMBED paragraph type, since we can't get url"
-                    )
-                    current_pos += 1
-                    continue
-
-                text_raw = paragraph["text"]
-
-                if len(paragraph["markups"]) != 3:
-                    logger.warning(
-                        "Ignore MIXTAPE_EMBED paragraph type, since we can't split text"
-                    )
-                    current_pos += 1
-                    continue
-
-                title_range = paragraph["markups"][1]
-                description_range = paragraph["markups"][2]
-
-                logger.trace(f"{title_range=}")
-                logger.trace(f"{description_range=}")
-
-                embed_title = text_raw[title_range["start"] : title_range["end"]]
-                embed_description = text_raw[
-                    description_range["start"] : description_range["end"]
-                ]
-
-                logger.trace(f"{embed_title=}")
-                logger.trace(f"{embed_description=}")
-
-                try:
-                    embed_site = tld.get_fld(url)
-                except Exception as ex:
-                    logger.warning(
-                        f"Can't get embed site fld: {ex}. Using custom logic..."
-                    )
-                    parsed_url = urllib.parse.urlparse(url)
-                    embed_site = parsed_url.hostname
-
-                logger.trace(f"{embed_site=}")
+                        continue
+                    highlight_spans.append((start_offset, end_offset))
 
-                embed_template_rendered = embed_template.render(
-                    paragraph=paragraph,
-                    url=url,
-                    embed_title=embed_title,
-                    embed_description=embed_description,
-                    embed_site=embed_site,
-                )
-                out_paragraphs.append(embed_template_rendered)
-            elif paragraph["type"] == "IFRAME":
-                logger.debug(f"Processing IFRAME paragraph")
-                
-                # First check if we have direct mediaResource in the iframe
-                media_resource = paragraph.get("iframe", {}).get("mediaResource", {})
-                
-                # If mediaResource is just a reference, look it up in post_data
-                media_resource_ref = paragraph.get("iframe", {}).get("mediaResource", {}).get("__ref")
-                if media_resource_ref and not media_resource.get("id") and not media_resource.get("iframeSrc"):
-                    logger.debug(f"Found media resource reference: {media_resource_ref}")
-                    data_payload = post_data.get("data", {})
-                    if media_resource_ref in data_payload:
-                        media_resource = data_payload[media_resource_ref]
-                        logger.debug(f"Found media resource for ref: {media_resource_ref}")
-                    else:
-                        logger.warning(f"Could not find media resource for ref: {media_resource_ref}")
-
-                # Get iframe source from mediaResource
-                iframe_src_val = media_resource.get("iframeSrc")
-                iframe_id = media_resource.get("id")
-                
-                # Determine the source URL for the iframe
-                src = iframe_src_val
-                if not src and iframe_id:
-                    logger.debug(f"Using fallback iframe URL with ID: {iframe_id}")
-                    src = f"{self.host_address}/render_iframe/{iframe_id}"
-
-                if not src:
-                    logger.warning("No iframe source found, skipping iframe")
-                    current_pos += 1
-                    continue
-
-                # Get iframe dimensions
-                iframe_width = media_resource.get("iframeWidth")
-                iframe_height = media_resource.get("iframeHeight")
-                
-                # If dimensions are available in paragraph.iframe directly, use those
-                if not iframe_width and paragraph.get("iframe", {}).get("iframeWidth"):
-                    iframe_width = paragraph["iframe"]["iframeWidth"]
-                if not iframe_height and paragraph.get("iframe", {}).get("iframeHeight"):
-                    iframe_height = paragraph["iframe"]["iframeHeight"]
-                
-                logger.debug(f"Iframe dimensions: {iframe_width}x{iframe_height}")
-
-                # Render with aspect ratio if we have valid dimensions
-                if iframe_width and iframe_height and iframe_width > 0:
-                    ratio = (iframe_height / iframe_width) * 100
-                    iframe_template = jinja_env.from_string(
-                        """<div class="mt-7"><div>
-    <iframe class="w-full" src="{{ src }}" referrerpolicy="no-referrer" width="{{ iframe_width }}" height="{{ iframe_height }}" allowfullscreen="" frameborder="0" scrolling="no"></iframe>
-</div></div>"""
-                    )
-                    iframe_template_rendered = iframe_template.render(
-                        src=src,
-                        ratio=f"{ratio:.4f}",
-                        iframe_width=iframe_width or "100%",
-                        iframe_height=iframe_height or "100%",
-                    )
-                    out_paragraphs.append(iframe_template_rendered)
-                else:
-                    # Fallback to responsive iframe without aspect ratio
-                    iframe_template = jinja_env.from_string(
-                        '<div class="mt-7"><iframe class="w-full" src="{{ src }}" width="{{ iframe_width }}" height="{{ iframe_height }}" referrerpolicy="no-referrer" allowfullscreen="" frameborder="0" scrolling="no"></iframe></div>'
-                    )
-                    iframe_template_rendered = iframe_template.render(
-                        src=src,
-                        iframe_width=iframe_width or "100%",
-                        iframe_height=iframe_height or "100%",
+                for start_offset, end_offset in merge_highlight_spans(highlight_spans):
+                    text_formater.set_template(
+                        start_offset, end_offset, HIGHLIGHT_TEMPLATE
                     )
-                    out_paragraphs.append(iframe_template_rendered)
 
+            block_renderer = BLOCK_RENDERERS.get(paragraph["type"])
+            if block_renderer is not None:
+                current_pos = block_renderer(ctx, current_pos, text_formater)
+                # Handed out and dropped, a streamed post never holds all of its blocks
+                yield from ctx.take_blocks()
             else:
                 logger.error(f"Unknown {paragraph['type']}: {paragraph}")
 
             current_pos += 1
 
-        return out_paragraphs, title, subtitle
+        return title, subtitle
 
-    async def render_as_html(self, post_id: str):
-        post_data = await self.query(post_id)
-        try:
-            result = await self._render_as_html(post_data, post_id)
-        except Exception as ex:
-            raise ex
-        else:
-            return result
+    async def render_as_html(self, post_id: str, use_cache: bool = True):
+        return await self._inflight.do(
+            ("render", post_id, use_cache), self._render_post, post_id, use_cache
+        )
+
+    async def _render_post(self, post_id: str, use_cache: bool):
+        post_data = await self.query(post_id, use_cache=use_cache)
+        return await self._render_as_html(post_data, post_id)
 
     async def generate_metadata(
         self, post_data: dict, post_id: str, as_dict: bool = False
+    ) -> tuple | dict[str, str]:
+        return self._generate_metadata(post_data, post_id, as_dict)
+
+    def _generate_metadata(
+        self, post_data: dict, post_id: str, as_dict: bool = False
     ) -> tuple | dict[str, str]:
         title = RLStringHelper(
             post_data["data"]["post"]["title"], ["minimal"]
@@ -750,14 +458,8 @@ class MediumParser:
             tags,
         )
 
-    async def _render_as_html(self, post_data: dict, post_id: str) -> "HtmlResult":
-        # Generate metadata in parallel
-        metadata_task = asyncio.create_task(self.generate_metadata(post_data, post_id))
-
-        # Parse and render content in parallel
-        content, title, subtitle = await asyncify(
-            self._parse_and_render_content_html_post
-        )(
+    def _content_args(self, post_data: dict) -> tuple:
+        return (
             post_data["data"]["post"]["content"],
             post_data["data"]["post"]["title"],
             post_data["data"]["post"]["previewContent"]["subtitle"],
@@ -767,7 +469,14 @@ class MediumParser:
             post_data,
         )
 
-        # Await metadata
+    async def _generate_post_context(
+        self, post_data: dict, post_id: str
+    ) -> tuple[str, str, str, dict]:
+        return self._post_context(post_data, post_id)
+
+    def _post_context(
+        self, post_data: dict, post_id: str
+    ) -> tuple[str, str, str, dict]:
         (
             title,
             subtitle,
@@ -781,12 +490,12 @@ class MediumParser:
             first_published_at,
             preview_image_id,
             tags,
-        ) = await metadata_task
+        ) = self._generate_metadata(post_data, post_id)
 
-        post_page_title_raw = "{{ title }} | by {{ creator.name }}"
         if collection:
-            post_page_title_raw += " | in {{ collection.name }}"
-        post_page_title = jinja_env.from_string(post_page_title_raw)
+            post_page_title = POST_PAGE_TITLE_WITH_COLLECTION_TEMPLATE
+        else:
+            post_page_title = POST_PAGE_TITLE_TEMPLATE
         post_page_title_rendered = post_page_title.render(
             title=title, creator=creator, collection=collection
         )
@@ -802,13 +511,70 @@ class MediumParser:
             "updatedAt": updated_at,
             "firstPublishedAt": first_published_at,
             "previewImageId": preview_image_id,
-            "content": content,
             "tags": tags,
         }
+
+        return post_page_title_rendered, description, url, post_context
+
+    async def _render_as_html(self, post_data: dict, post_id: str) -> "HtmlResult":
+        if self.render_executor is not None:
+            return await self.render_executor.render(post_data, post_id)
+
+        # Generate metadata in parallel
+        post_context_task = asyncio.create_task(
+            self._generate_post_context(post_data, post_id)
+        )
+
+        # Parse and render content in parallel
+        content, _, _ = await asyncify(self._parse_and_render_content_html_post)(
+            *self._content_args(post_data)
+        )
+
+        # Await metadata
+        post_page_title, description, url, post_context = await post_context_task
+
+        post_context["content"] = content
+        post_template_rendered = self.post_template.render(post_context)
+
+        return HtmlResult(post_page_title, description, url, post_template_rendered)
+
+    def render_post_data(self, post_data: dict, post_id: str) -> "HtmlResult":
+        """Synchronous `_render_as_html`, used by render worker processes"""
+        content, _, _ = self._parse_and_render_content_html_post(
+            *self._content_args(post_data)
+        )
+        post_page_title, description, url, post_context = self._post_context(
+            post_data, post_id
+        )
+
+        post_context["content"] = content
         post_template_rendered = self.post_template.render(post_context)
 
-        return HtmlResult(
-            post_page_title_rendered, description, url, post_template_rendered
+        return HtmlResult(post_page_title, description, url, post_template_rendered)
+
+    async def stream_as_html(self, post_id: str) -> "HtmlStreamResult":
+        post_data = await self.query(post_id)
+        return await self._stream_as_html(post_data, post_id)
+
+    async def _stream_as_html(
+        self, post_data: dict, post_id: str
+    ) -> "HtmlStreamResult":
+        """
+        Same page as `_render_as_html`, but nothing is rendered yet: `chunks` is a lazy
+        `post.html` generator that renders body blocks while it is consumed. The header only
+        needs metadata, so it comes out before the first block is rendered.
+        """
+        post_page_title, description, url, post_context = await self._generate_post_context(
+            post_data, post_id
+        )
+        # The empty first chunk marks the end of the article header, consumers that buffer
+        # output can flush everything before it without waiting for the first block
+        post_context["content"] = itertools.chain(
+            [""], self._iter_content_html_post(*self._content_args(post_data))
+        )
+
+        return HtmlStreamResult(
+            post_page_title, description, url, self.post_template.generate(post_context)
         )
 
     async def render_as_markdown(self) -> str:
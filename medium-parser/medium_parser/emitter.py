@@ -0,0 +1,133 @@
+"""Jinja-free emitters for the post body blocks.
+
+Each function mirrors the template with the same name in `medium_parser.blocks.BLOCK_TEMPLATE_SOURCES`
+and must produce byte-identical output. Values are inserted verbatim, like in the Jinja environment
+used for the templates (no autoescape): paragraph text is already escaped by `RLStringHelper`.
+`tests/emitter_test.py` compares both emitters over a corpus of cached posts.
+"""
+
+from __future__ import annotations
+
+import typing
+
+
+def _lookup(value: typing.Any, *path: str) -> typing.Any:
+    # Same output as Jinja's `{{ value.a.b }}` for JSON data: a missing key renders as an empty string
+    for key in path:
+        try:
+            value = value[key]
+        except (KeyError, TypeError, IndexError):
+            return ""
+    return value
+
+
+def emit_h2(id, text, css_class) -> str:
+    return f'<h2 id={id} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-1xl md:text-2xl {css_class}">{text}</h2>'
+
+
+def emit_h3(id, text, css_class) -> str:
+    return f'<h3 id={id} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-1xl md:text-2xl {css_class}">{text}</h3>'
+
+
+def emit_h4(id, text, css_class) -> str:
+    return f'<h4 id={id} class="font-bold font-sans break-normal text-gray-900 dark:text-gray-100 text-l md:text-xl {css_class}">{text}</h4>'
+
+
+def emit_image(paragraph) -> str:
+    alt = _lookup(paragraph, "metadata", "alt")
+    image_id = _lookup(paragraph, "metadata", "id")
+    return f'<div class="mt-7"><img loading="eager" alt="{alt}" class="pt-5 m-auto" role="presentation" referrerpolicy="no-referrer" src="https://miro.medium.com/v2/resize:fit:700/{image_id}"></div>'
+
+
+def emit_image_caption(text) -> str:
+    return f"<figcaption class='mt-3 text-sm text-center text-gray-500 dark:text-gray-200'>{text}</figcaption>"
+
+
+def emit_image_row(images) -> str:
+    return f'<div class="mx-5"><div class="flex flex-row justify-center">{images}</div></div>'
+
+
+def emit_paragraph(text, css_class) -> str:
+    return f'<p class="{css_class}">{text}</p>'
+
+
+def emit_uli(li) -> str:
+    return f'<ul class="pl-8 mt-2 list-disc">{li}</ul>'
+
+
+def emit_oli(li) -> str:
+    return f'<ol class="pl-8 mt-2 list-decimal">{li}</ol>'
+
+
+def emit_li(text) -> str:
+    return f"<li class='mt-3'>{text}</li>"
+
+
+def emit_pre(code_block) -> str:
+    return f'<pre class="flex flex-col justify-center border mt-7 dark:border-gray-700">{code_block}</pre>'
+
+
+def emit_code_block(text, code_css_class) -> str:
+    return f'<code class="p-2 bg-gray-100 dark:bg-gray-900 overflow-x-auto {code_css_class}">{text}</code>'
+
+
+def emit_bq(text) -> str:
+    return f'<blockquote style="box-shadow: inset 3px 0 0 0 rgb(209 207 239 / var(--tw-bg-opacity));" class="px-5 pt-3 pb-3 mt-5"><p class="font-italic">{text}</p></blockquote>'
+
+
+def emit_pq(text) -> str:
+    return f'<blockquote class="ml-5 text-2xl text-gray-600 mt-7 dark:text-gray-300"><p>{text}</p></blockquote>'
+
+
+def emit_mixtape_embed(paragraph, url, embed_title, embed_description, embed_site) -> str:
+    thumbnail_image_id = _lookup(paragraph, "mixtapeMetadata", "thumbnailImageId")
+    return f"""
+<div class="items-center p-2 overflow-hidden border border-gray-300 mt-7">
+    <a rel="noopener follow" href="{url}" target="_blank">
+        <div class="flex flex-row justify-between p-2 overflow-hidden">
+            <div class="flex flex-col justify-center p-2">
+                <h2 class="text-base font-bold text-black dark:text-gray-100">{embed_title}</h2>
+                <div class="block mt-2">
+                    <h3 class="text-sm text-grey-darker">{embed_description}</h3>
+                </div>
+                <div class="mt-5">
+                    <p class="text-xs text-grey-darker">{embed_site}</p>
+                </div>
+            </div>
+            <div class="relative flex h-40 flew-row w-60">
+                <div class="absolute inset-0 bg-center bg-cover" style="background-image: url('https://miro.medium.com/v2/resize:fit:320/{thumbnail_image_id}'); background-repeat: no-repeat;" referrerpolicy="no-referrer"></div>
+            </div>
+        </div>
+    </a>
+</div>"""
+
+
+def emit_iframe(src, iframe_width, iframe_height) -> str:
+    return f"""<div class="mt-7"><div>
+    <iframe class="w-full" src="{src}" referrerpolicy="no-referrer" width="{iframe_width}" height="{iframe_height}" allowfullscreen="" frameborder="0" scrolling="no"></iframe>
+</div></div>"""
+
+
+def emit_iframe_responsive(src, iframe_width, iframe_height) -> str:
+    return f'<div class="mt-7"><iframe class="w-full" src="{src}" width="{iframe_width}" height="{iframe_height}" referrerpolicy="no-referrer" allowfullscreen="" frameborder="0" scrolling="no"></iframe></div>'
+
+
+FAST_BLOCK_EMITTERS: dict[str, typing.Callable[..., str]] = {
+    "h2": emit_h2,
+    "h3": emit_h3,
+    "h4": emit_h4,
+    "image": emit_image,
+    "image_caption": emit_image_caption,
+    "image_row": emit_image_row,
+    "paragraph": emit_paragraph,
+    "uli": emit_uli,
+    "oli": emit_oli,
+    "li": emit_li,
+    "pre": emit_pre,
+    "code_block": emit_code_block,
+    "bq": emit_bq,
+    "pq": emit_pq,
+    "mixtape_embed": emit_mixtape_embed,
+    "iframe": emit_iframe,
+    "iframe_responsive": emit_iframe_responsive,
+}
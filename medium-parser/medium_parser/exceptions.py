@@ -36,3 +36,11 @@ class MediumPostUnavailable(MediumPostQueryError):
 
 class MediumPostDeleted(MediumPostQueryError):
     pass
+
+
+class RenderQueueFull(MediumParserException):
+    pass
+
+
+class RenderTimeout(MediumParserException):
+    pass
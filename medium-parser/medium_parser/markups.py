@@ -2,13 +2,31 @@ import jinja2
 
 from medium_parser import jinja_env_debug
 
-
-def raw_render(**kwargs):
-    for key, value in kwargs.items():
-        if isinstance(value, str):
-            kwargs[key] = f"{{% raw %}}{value}{{% endraw %}}"
-
-    return kwargs
+# Templates are compiled once at import time. Link and user markups bind their attributes per markup
+# (see `bind_template`), `text` is left undefined for RLStringHelper
+STATIC_MARKUP_TEMPLATES: dict[str, jinja2.Template] = {
+    "STRONG": jinja_env_debug.from_string("<strong>{{text}}</strong>"),
+    "EM": jinja_env_debug.from_string("<em>{{text}}</em>"),
+    "CODE": jinja_env_debug.from_string(
+        "<code class='p-1.5 bg-gray-300 dark:bg-gray-600'>{{text}}</code>"
+    ),
+}
+LINK_MARKUP_TEMPLATE = jinja_env_debug.from_string(
+    '<a style="text-decoration: underline;" rel="{{rel}}" title="{{title}}" href="{{href}}" target="{{target}}">'
+    "{{text}}</a>"
+)
+USER_MARKUP_TEMPLATE = jinja_env_debug.from_string(
+    '<a style="text-decoration: underline;" href="https://medium.com/u/{{userId}}">{{text}}</a>'
+)
+
+
+def bind_template(template: jinja2.Template, **attributes) -> jinja2.Template:
+    """A copy of the compiled `template` with `attributes` as its globals, nothing is compiled again"""
+    # Template.__new__ compiles its source argument, so the compiled code is shared by copying the attributes
+    bound = object.__new__(type(template))
+    bound.__dict__.update(template.__dict__)
+    bound.globals = {**template.globals, **attributes}
+    return bound
 
 
 def parse_markups(
@@ -23,36 +41,22 @@ def parse_markups(
                 if not markup.get("href", "").startswith("#"):
                     target = "_blank"
 
-                template = jinja_env_debug.from_string(
-                    '<a style="text-decoration: underline;" rel="{{rel}}" title="{{title}}" href="{{href}}" target="{{target}}">{{text}}</a>'
-                )
-                template_rendered = template.render(
-                    raw_render(
-                        rel=markup.get("rel", ""),
-                        target=target,
-                        title=markup.get("title", ""),
-                        href=markup["href"],
-                    )
+                template = bind_template(
+                    LINK_MARKUP_TEMPLATE,
+                    rel=markup.get("rel", ""),
+                    target=target,
+                    title=markup.get("title", ""),
+                    href=markup["href"],
                 )
             elif markup["anchorType"] == "USER":
-                template = jinja_env_debug.from_string(
-                    '<a style="text-decoration: underline;" href="https://medium.com/u/{{userId}}">{{text}}</a>'
-                )
-                template_rendered = template.render(userId=markup["userId"])
+                template = bind_template(USER_MARKUP_TEMPLATE, userId=markup["userId"])
             else:
                 continue
-        elif markup["type"] == "STRONG":
-            template_rendered = "<strong>{{text}}</strong>"
-        elif markup["type"] == "EM":
-            template_rendered = "<em>{{text}}</em>"
-        elif markup["type"] == "CODE":
-            template_rendered = (
-                "<code class='p-1.5 bg-gray-300 dark:bg-gray-600'>{{text}}</code>"
-            )
+        elif markup["type"] in STATIC_MARKUP_TEMPLATES:
+            template = STATIC_MARKUP_TEMPLATES[markup["type"]]
         else:
             continue
 
-        template = jinja_env_debug.from_string(template_rendered)
         markup["template"] = template
         markups_out.append(markup)
 
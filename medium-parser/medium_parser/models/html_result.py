@@ -1,3 +1,4 @@
+from collections.abc import Iterator
 from dataclasses import dataclass
 
 
@@ -7,3 +8,11 @@ class HtmlResult:
     description: str
     url: str
     data: str
+
+
+@dataclass
+class HtmlStreamResult:
+    title: str
+    description: str
+    url: str
+    chunks: Iterator[str]
@@ -0,0 +1,119 @@
+"""Process pool backend for post rendering.
+
+Rendering is pure Python CPU work, so in a thread pool it holds the GIL and slows down the event
+loop of the worker. `ProcessRenderExecutor` moves it to separate processes: the post JSON goes in,
+an `HtmlResult` comes out.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from loguru import logger
+
+from .exceptions import RenderQueueFull, RenderTimeout
+from .models.html_result import HtmlResult
+
+_worker_parser = None
+
+
+def _init_worker(host_address: str, template_folder: str, html_emitter: str) -> None:
+    global _worker_parser
+    from .core import MediumParser
+
+    # Rendering never touches the cache or the Medium API
+    _worker_parser = MediumParser(
+        None, None, 0, host_address, template_folder=template_folder, html_emitter=html_emitter
+    )
+
+
+def _render_post(post_json: str, post_id: str) -> HtmlResult:
+    return _worker_parser.render_post_data(json.loads(post_json), post_id)
+
+
+class ProcessRenderExecutor:
+    __slots__ = (
+        "host_address",
+        "template_folder",
+        "html_emitter",
+        "max_workers",
+        "max_queue_size",
+        "timeout",
+        "mp_context",
+        "_executor",
+        "_pending",
+        "_pending_lock",
+    )
+
+    def __init__(
+        self,
+        host_address: str,
+        template_folder: str = "./templates",
+        html_emitter: str = "jinja",
+        max_workers: int | None = None,
+        max_queue_size: int = 64,
+        timeout: float = 20,
+        mp_context: str = "spawn",
+    ):
+        self.host_address: str = host_address
+        self.template_folder: str = template_folder
+        self.html_emitter: str = html_emitter
+        self.max_workers: int = max_workers or multiprocessing.cpu_count()
+        self.max_queue_size: int = max_queue_size
+        self.timeout: float = timeout
+        # "spawn" by default: forking a process that already runs an event loop and threads is unsafe
+        self.mp_context: str = mp_context
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: int = 0
+        self._pending_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily, so the pool is never started in a process that does not render
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.mp_context),
+                initializer=_init_worker,
+                initargs=(self.host_address, self.template_folder, self.html_emitter),
+            )
+        return self._executor
+
+    def _job_done(self, _: Future) -> None:
+        # Called from the executor's management thread
+        with self._pending_lock:
+            self._pending -= 1
+
+    async def render(self, post_data: dict, post_id: str) -> HtmlResult:
+        # Jobs that are running or waiting for a process. A job that timed out still occupies its
+        # slot until the process finishes it, so a stuck pool rejects work instead of piling it up
+        if self._pending >= self.max_workers + self.max_queue_size:
+            raise RenderQueueFull(f"Render queue is full ({self._pending} jobs), post_id: {post_id}")
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_render_post, json.dumps(post_data), post_id)
+        except BrokenProcessPool:
+            logger.error("Render process pool is broken, starting a new one")
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            future = self._get_executor().submit(_render_post, json.dumps(post_data), post_id)
+
+        with self._pending_lock:
+            self._pending += 1
+        future.add_done_callback(self._job_done)
+
+        try:
+            # On timeout the job is cancelled if it has not started yet, a running one can't be interrupted
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise RenderTimeout(f"Rendering took more than {self.timeout} seconds, post_id: {post_id}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
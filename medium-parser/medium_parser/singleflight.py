@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import typing
+
+from loguru import logger
+
+T = typing.TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller starts the work as a task, callers arriving while it runs await the same task
+    and get the same result or exception. Nothing is cached: once the task is done the key is free.
+    """
+
+    __slots__ = ("_tasks",)
+
+    def __init__(self):
+        self._tasks: dict[typing.Hashable, asyncio.Task] = {}
+
+    def _forget(self, key: typing.Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception as retrieved, all waiters may already be gone
+        if not task.cancelled():
+            task.exception()
+
+    async def do(
+        self,
+        key: typing.Hashable,
+        func: typing.Callable[..., typing.Awaitable[T]],
+        *args,
+        **kwargs,
+    ) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            logger.trace(f"Joining in-flight call: {key}")
+
+        # A cancelled caller must not cancel the work the other callers are waiting for
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
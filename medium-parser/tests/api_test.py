@@ -0,0 +1,20 @@
+import asyncio
+
+from medium_parser.api import MediumApi
+
+
+def test_sessions_are_reused_per_proxy_until_closed():
+    async def main():
+        api = MediumApi(proxy_list=["socks5://127.0.0.1:1080"], pool_size=4, keepalive=30)
+        direct = api.get_session()
+        proxied = api.get_session("socks5://127.0.0.1:1080")
+
+        assert api.get_session() is direct
+        assert api.get_session("socks5://127.0.0.1:1080") is proxied
+        assert direct is not proxied
+
+        await api.close()
+        assert api.get_session() is not direct
+        await api.close()
+
+    asyncio.run(main())
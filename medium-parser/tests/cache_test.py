@@ -0,0 +1,83 @@
+import asyncio
+import pathlib
+
+from database_lib import AbstractAsyncCacheBackend
+from database_lib.main import CacheResponse, dump_value
+
+from medium_parser.core import MediumParser
+
+TEMPLATE_FOLDER = str(pathlib.Path(__file__).parent / "templates")
+POST_ID = "1234abcd"
+POST_DATA = {"data": {"post": {"id": POST_ID, "title": "Title"}}}
+
+
+class MemoryAsyncCache(AbstractAsyncCacheBackend):
+    def __init__(self):
+        self.rows: dict[str, str] = {}
+        self.calls: list[str] = []
+
+    async def init_db(self):
+        pass
+
+    async def all_length(self) -> int:
+        return len(self.rows)
+
+    async def random(self, size: int) -> list[CacheResponse]:
+        return [CacheResponse(key, value) for key, value in list(self.rows.items())[:size]]
+
+    async def pull(self, key: str):
+        self.calls.append("pull")
+        await asyncio.sleep(0)
+        value = self.rows.get(key)
+        return CacheResponse(key, value) if value is not None else None
+
+    async def push(self, key: str, value):
+        self.calls.append("push")
+        await asyncio.sleep(0)
+        self.rows[key] = dump_value(value)
+
+    async def delete(self, key: str):
+        self.calls.append("delete")
+        self.rows.pop(key, None)
+
+    async def close(self):
+        pass
+
+
+class FakeMediumApi:
+    def __init__(self):
+        self.queries: list[str] = []
+
+    async def query_post_by_id(self, post_id: str) -> dict:
+        self.queries.append(post_id)
+        return POST_DATA
+
+
+def make_parser(cache) -> MediumParser:
+    return MediumParser(cache=cache, medium_api=FakeMediumApi(), timeout=5, host_address="https://freedium.cfd", template_folder=TEMPLATE_FOLDER)
+
+
+def test_query_goes_through_an_async_cache_backend():
+    cache = MemoryAsyncCache()
+    parser = make_parser(cache)
+
+    async def main():
+        assert await parser.query(POST_ID) == POST_DATA
+        assert await parser.query(POST_ID) == POST_DATA
+        assert await parser.delete_from_cache(POST_ID)
+
+    asyncio.run(main())
+
+    assert parser.medium_api.queries == [POST_ID]
+    assert cache.calls == ["pull", "push", "pull", "delete"]
+    assert cache.rows == {}
+
+
+def test_query_without_cache_still_stores_the_result():
+    cache = MemoryAsyncCache()
+    parser = make_parser(cache)
+
+    asyncio.run(parser.query(POST_ID, use_cache=False))
+
+    assert cache.calls == ["push"]
+    assert CacheResponse(POST_ID, cache.rows[POST_ID]).json() == POST_DATA
@@ -0,0 +1,87 @@
+"""Differential harness for the HTML emitters.
+
+Renders every post in the corpus with the Jinja templates and with the fast emitter and asserts
+byte-identical output. The corpus is `tests/fixtures/posts/*.json`, plus every cached post from:
+
+  - MEDIUM_PARSER_CORPUS_DIR: a directory of GraphQL responses (e.g. `query_result.json` dumps)
+  - MEDIUM_PARSER_CORPUS_SQLITE: a `SQLiteCacheBackend` database
+"""
+
+import asyncio
+import json
+import os
+import pathlib
+
+import pytest
+from database_lib import SQLiteCacheBackend
+
+from medium_parser.core import MediumParser
+
+TESTS_DIR = pathlib.Path(__file__).parent
+FIXTURES_DIR = TESTS_DIR / "fixtures" / "posts"
+TEMPLATE_FOLDER = str(TESTS_DIR / "templates")
+HOST_ADDRESS = "https://freedium.cfd"
+
+
+def load_corpus() -> list[tuple[str, dict]]:
+    paths = sorted(FIXTURES_DIR.glob("*.json"))
+    corpus_dir = os.environ.get("MEDIUM_PARSER_CORPUS_DIR")
+    if corpus_dir:
+        paths.extend(sorted(pathlib.Path(corpus_dir).glob("*.json")))
+
+    corpus = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            corpus.append((path.name, json.load(file)))
+
+    corpus_sqlite = os.environ.get("MEDIUM_PARSER_CORPUS_SQLITE")
+    if corpus_sqlite:
+        cache = SQLiteCacheBackend(corpus_sqlite)
+        try:
+            for key, value in cache.all():
+                corpus.append((key, json.loads(value)))
+        finally:
+            cache.close()
+
+    return [(name, post_data) for name, post_data in corpus if (post_data.get("data") or {}).get("post")]
+
+
+def make_parser(html_emitter: str) -> MediumParser:
+    return MediumParser(None, None, 5, HOST_ADDRESS, template_folder=TEMPLATE_FOLDER, html_emitter=html_emitter)
+
+
+CORPUS = load_corpus()
+
+
+@pytest.mark.parametrize("name,post_data", CORPUS, ids=[name for name, _ in CORPUS])
+def test_fast_emitter_matches_jinja(name, post_data):
+    post = post_data["data"]["post"]
+    args = (
+        post["content"],
+        post["title"],
+        post["previewContent"]["subtitle"],
+        post["previewImage"]["id"],
+        post["highlights"],
+        post["tags"],
+        post_data,
+    )
+
+    expected = make_parser("jinja")._parse_and_render_content_html_post(*args)
+    actual = make_parser("fast")._parse_and_render_content_html_post(*args)
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("name,post_data", CORPUS, ids=[name for name, _ in CORPUS])
+def test_fast_emitter_matches_jinja_full_page(name, post_data):
+    post_id = post_data["data"]["post"]["id"]
+
+    expected = asyncio.run(make_parser("jinja")._render_as_html(post_data, post_id))
+    actual = asyncio.run(make_parser("fast")._render_as_html(post_data, post_id))
+
+    assert actual == expected
+
+
+def test_unknown_emitter():
+    with pytest.raises(ValueError):
+        make_parser("mako")
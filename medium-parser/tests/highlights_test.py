@@ -0,0 +1,66 @@
+import pathlib
+
+from medium_parser.blocks import build_highlight_index, merge_highlight_spans
+from medium_parser.core import MediumParser
+
+TEMPLATE_FOLDER = str(pathlib.Path(__file__).parent / "templates")
+
+
+def make_highlight(start_offset, end_offset, *paragraphs):
+    return {
+        "startOffset": start_offset,
+        "endOffset": end_offset,
+        "paragraphs": [{"name": name, "text": text} for name, text in paragraphs],
+    }
+
+
+def make_paragraph(name, text):
+    return {"id": name, "name": name, "type": "P", "text": text, "markups": [], "layout": None, "metadata": None}
+
+
+def render_body(paragraphs, highlights):
+    parser = MediumParser(None, None, 5, "https://freedium.cfd", template_folder=TEMPLATE_FOLDER)
+    out_paragraphs, _, _ = parser._parse_and_render_content_html_post(
+        {"bodyModel": {"paragraphs": paragraphs}}, "Title", "", "", highlights, [], {}
+    )
+    return out_paragraphs
+
+
+def test_build_highlight_index():
+    index = build_highlight_index(
+        [
+            make_highlight(0, 4, ("a", "text a"), ("b", "text b")),
+            make_highlight(2, 6, ("a", "text a")),
+        ]
+    )
+
+    assert index == {
+        "a": [("text a", 0, 4), ("text a", 2, 6)],
+        "b": [("text b", 0, 4)],
+    }
+
+
+def test_merge_highlight_spans():
+    assert merge_highlight_spans([(10, 12), (0, 4), (2, 6)]) == [(0, 6), (10, 12)]
+
+
+def test_multiple_highlights_per_paragraph():
+    text = "The quick brown fox jumps over the lazy dog"
+    out_paragraphs = render_body(
+        [make_paragraph("p1", text)],
+        [make_highlight(4, 9, ("p1", text)), make_highlight(35, 39, ("p1", text))],
+    )
+
+    assert out_paragraphs == [
+        '<p class="leading-8 mt-7">The <mark class="bg-emerald-300">quick</mark> brown fox jumps over the <mark class="bg-emerald-300">lazy</mark> dog</p>'
+    ]
+
+
+def test_mismatched_highlight_is_skipped():
+    text = "Some paragraph text"
+    out_paragraphs = render_body(
+        [make_paragraph("p1", text)],
+        [make_highlight(0, 4, ("p1", "Edited paragraph text")), make_highlight(5, 14, ("p1", text))],
+    )
+
+    assert out_paragraphs == ['<p class="leading-8 mt-7">Some <mark class="bg-emerald-300">paragraph</mark> text</p>']
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from medium_parser import jinja_env_debug, markups
+from medium_parser.markups import LINK_MARKUP_TEMPLATE, parse_markups
+
+
+def test_link_and_user_markups_are_not_compiled_per_render():
+    link = {"type": "A", "anchorType": "LINK", "href": "https://example.com/?a={{b}}", "rel": "nofollow"}
+    user = {"type": "A", "anchorType": "USER", "userId": "abc123"}
+
+    with mock.patch.object(jinja_env_debug, "from_string", side_effect=AssertionError("compiled")):
+        link_markup, user_markup = parse_markups([link, user])
+
+    assert link_markup["template"].render(text="link") == (
+        '<a style="text-decoration: underline;" rel="nofollow" title="" href="https://example.com/?a={{b}}" '
+        'target="_blank">link</a>'
+    )
+    assert user_markup["template"].render(text="user") == (
+        '<a style="text-decoration: underline;" href="https://medium.com/u/abc123">user</a>'
+    )
+
+
+def test_bound_templates_leave_text_for_the_string_helper():
+    template = parse_markups([{"type": "A", "anchorType": "LINK", "href": "#section"}])[0]["template"]
+
+    assert template.render() == (
+        '<a style="text-decoration: underline;" rel="" title="" href="#section" target="">{{ text }}</a>'
+    )
+    # The shared template keeps no attributes of a markup
+    assert "href" not in LINK_MARKUP_TEMPLATE.globals
+    assert markups.bind_template(LINK_MARKUP_TEMPLATE, href="#a").globals["href"] == "#a"
@@ -0,0 +1,63 @@
+import asyncio
+import json
+import pathlib
+
+import pytest
+
+from medium_parser.core import MediumParser
+from medium_parser.exceptions import RenderQueueFull, RenderTimeout
+from medium_parser.render_pool import ProcessRenderExecutor
+
+TESTS_DIR = pathlib.Path(__file__).parent
+TEMPLATE_FOLDER = str(TESTS_DIR / "templates")
+FIXTURES = sorted((TESTS_DIR / "fixtures" / "posts").glob("*.json"))
+HOST_ADDRESS = "https://freedium.cfd"
+
+
+def load_post(path):
+    with open(path, "r", encoding="utf-8") as file:
+        post_data = json.load(file)
+    return post_data, post_data["data"]["post"]["id"]
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = ProcessRenderExecutor(HOST_ADDRESS, TEMPLATE_FOLDER, max_workers=1, timeout=60)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=[path.name for path in FIXTURES])
+def test_process_render_matches_thread_render(executor, path):
+    post_data, post_id = load_post(path)
+    thread_parser = MediumParser(None, None, 5, HOST_ADDRESS, template_folder=TEMPLATE_FOLDER)
+    process_parser = MediumParser(None, None, 5, HOST_ADDRESS, template_folder=TEMPLATE_FOLDER, render_executor=executor)
+
+    assert asyncio.run(process_parser._render_as_html(post_data, post_id)) == asyncio.run(thread_parser._render_as_html(post_data, post_id))
+
+
+def test_queue_full():
+    post_data, post_id = load_post(FIXTURES[0])
+    executor = ProcessRenderExecutor(HOST_ADDRESS, TEMPLATE_FOLDER, max_workers=1, max_queue_size=0, timeout=60)
+
+    async def render_twice():
+        return await asyncio.gather(executor.render(post_data, post_id), executor.render(post_data, post_id), return_exceptions=True)
+
+    try:
+        first, second = asyncio.run(render_twice())
+    finally:
+        executor.shutdown()
+
+    assert first.data
+    assert isinstance(second, RenderQueueFull)
+
+
+def test_timeout():
+    post_data, post_id = load_post(FIXTURES[0])
+    # Starting a process alone takes longer than that
+    executor = ProcessRenderExecutor(HOST_ADDRESS, TEMPLATE_FOLDER, max_workers=1, timeout=0.001)
+    try:
+        with pytest.raises(RenderTimeout):
+            asyncio.run(executor.render(post_data, post_id))
+    finally:
+        executor.shutdown()
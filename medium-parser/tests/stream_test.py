@@ -0,0 +1,49 @@
+import asyncio
+import json
+import pathlib
+
+import pytest
+
+from medium_parser import core
+from medium_parser.core import MediumParser
+
+TESTS_DIR = pathlib.Path(__file__).parent
+FIXTURES = sorted((TESTS_DIR / "fixtures" / "posts").glob("*.json"))
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=[path.name for path in FIXTURES])
+def test_stream_matches_render(path):
+    with open(path, "r", encoding="utf-8") as file:
+        post_data = json.load(file)
+    post_id = post_data["data"]["post"]["id"]
+    parser = MediumParser(None, None, 5, "https://freedium.cfd", template_folder=str(TESTS_DIR / "templates"))
+
+    rendered = asyncio.run(parser._render_as_html(post_data, post_id))
+    streamed = asyncio.run(parser._stream_as_html(post_data, post_id))
+
+    assert (streamed.title, streamed.description, streamed.url) == (rendered.title, rendered.description, rendered.url)
+    assert "".join(streamed.chunks) == rendered.data
+
+
+def test_streamed_blocks_are_not_kept(monkeypatch):
+    with open(FIXTURES[0], "r", encoding="utf-8") as file:
+        post_data = json.load(file)
+    parser = MediumParser(None, None, 5, "https://freedium.cfd", template_folder=str(TESTS_DIR / "templates"))
+    contexts = []
+
+    class RecordingBlockContext(core.BlockContext):
+        __slots__ = ()
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            contexts.append(self)
+
+    monkeypatch.setattr(core, "BlockContext", RecordingBlockContext)
+
+    blocks = 0
+    for _ in parser._iter_content_html_post(*parser._content_args(post_data)):
+        blocks += 1
+        assert contexts[0].out_paragraphs == []
+
+    assert blocks > 0
+    assert contexts[0].taken_count == blocks
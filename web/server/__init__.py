@@ -17,12 +17,20 @@ from typing import Optional
 
 import pickledb
 import redis.asyncio as redis
-from database_lib import PostgreSQLCacheBackend, execute_migrate_to_postgres_in_thread, migrate_to_postgres
+from database_lib import (
+    AsyncPostgreSQLCacheBackend,
+    PostgreSQLCacheBackend,
+    WriteBehindCache,
+    execute_backfill_metadata_in_thread,
+    execute_compress_cache_in_thread,
+    execute_migrate_to_postgres_in_thread,
+    migrate_to_postgres,
+)
 from loguru import logger
 from medium_parser.api import MediumApi
 from medium_parser.core import MediumParser
+from medium_parser.render_pool import ProcessRenderExecutor
 from psycopg2 import OperationalError, connect
-from xkcdpass import xkcd_password as xp
 
 from server.utils.logger import configure_logger
 
@@ -50,20 +58,66 @@ wait_for_postgres()
 # logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
 configure_logger()
 
-medium_cache = PostgreSQLCacheBackend(config.DATABASE_URL)
+medium_cache = PostgreSQLCacheBackend(
+    config.DATABASE_URL, compression=config.DATABASE_COMPRESSION, compression_level=config.DATABASE_COMPRESSION_LEVEL
+)
 medium_cache.init_db()
 
+if config.DATABASE_COMPRESSION_MIGRATE:
+    execute_compress_cache_in_thread(config.DATABASE_URL, compression_level=config.DATABASE_COMPRESSION_LEVEL)
+
+if config.DATABASE_METADATA_BACKFILL:
+    execute_backfill_metadata_in_thread(config.DATABASE_URL)
+
 logger.debug(f"Database length: {medium_cache.all_length()}")
 
+medium_async_cache = None
+if config.ASYNC_DATABASE:
+    medium_async_cache = AsyncPostgreSQLCacheBackend(
+        config.DATABASE_URL,
+        min_size=config.DATABASE_POOL_MIN_SIZE,
+        max_size=config.DATABASE_POOL_MAX_SIZE,
+        compression=config.DATABASE_COMPRESSION,
+        compression_level=config.DATABASE_COMPRESSION_LEVEL,
+    )
+
+medium_write_behind_cache = None
+if config.WRITE_BEHIND_CACHE:
+    medium_write_behind_cache = WriteBehindCache(
+        medium_async_cache or medium_cache,
+        max_batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=config.WRITE_BEHIND_FLUSH_INTERVAL,
+        max_queue_size=config.WRITE_BEHIND_QUEUE_SIZE,
+    )
+
 medium_api = MediumApi(
-    auth_cookies=config.MEDIUM_AUTH_COOKIES, timeout=config.REQUEST_TIMEOUT, proxy_list=config.PROXY_LIST
+    auth_cookies=config.MEDIUM_AUTH_COOKIES,
+    timeout=config.REQUEST_TIMEOUT,
+    proxy_list=config.PROXY_LIST,
+    pool_size=config.MEDIUM_API_POOL_SIZE,
+    keepalive=config.MEDIUM_API_KEEPALIVE,
 )
+render_executor = None
+if config.RENDER_BACKEND == "process":
+    render_executor = ProcessRenderExecutor(
+        host_address=config.HOST_ADDRESS,
+        template_folder="server/templates",
+        html_emitter=config.HTML_EMITTER,
+        max_workers=config.RENDER_PROCESS_WORKERS,
+        max_queue_size=config.RENDER_QUEUE_SIZE,
+        timeout=config.RENDER_TIMEOUT,
+    )
+elif config.RENDER_BACKEND != "thread":
+    raise ValueError(f"Unknown render backend: {config.RENDER_BACKEND}. Available: thread, process")
+
 medium_parser = MediumParser(
-    cache=medium_cache,
+    cache=medium_write_behind_cache or medium_async_cache or medium_cache,
     medium_api=medium_api,
     timeout=config.REQUEST_TIMEOUT,
     host_address=config.HOST_ADDRESS,
     template_folder="server/templates",
+    html_emitter=config.HTML_EMITTER,
+    render_executor=render_executor,
 )
 
 redis_storage = redis.Redis(
@@ -82,8 +136,4 @@ transponder_code_correlation: ContextVar[Optional[str]] = ContextVar(
 
 ban_db = pickledb.load("ban_post_list.db", True)
 
-WORDS_LIST_FILE = "xkcdpass/static/legac"
-
-xkcd_passwd = xp.generate_wordlist(wordfile=WORDS_LIST_FILE, min_length=5, max_length=8)
-
 maintenance_mode = Value("b", False)
@@ -1,17 +1,75 @@
 import random
 
-import aiohttp
 from aiohttp_retry import RetryClient
-from aiohttp_socks import ProxyConnector
 from fastapi import Response
 from loguru import logger
 from medium_parser import retry_options
+from medium_parser.singleflight import SingleFlight
 
-from server import config
+from server import config, medium_parser
+from server.services.http import http_sessions
+from server.utils import serializer
 from server.utils.logger_trace import trace
+from server.utils.redis_health import redis_breaker
 
 IFRAME_HEADERS = {"Access-Control-Allow-Origin": "*", "X-Frame-Options": "SAMEORIGIN"}
 
+iframe_flights = SingleFlight()
+
+
+async def fetch_iframe_content(iframe_id: str) -> str | None:
+    proxy = random.choice(config.PROXY_LIST) if config.PROXY_LIST else None
+    retry_client = RetryClient(
+        client_session=http_sessions.get(proxy), raise_for_status=False, retry_options=retry_options
+    )
+    async with retry_client.get(
+        f"https://medium.com/media/{iframe_id}",
+        timeout=config.REQUEST_TIMEOUT,
+        headers={
+            "User-Agent": (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/131.0.0.0 Safari/537.36"
+            ),
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.5",
+        },
+    ) as request:
+        if request.status != 200:
+            logger.error(
+                f"Failed to fetch iframe {iframe_id}\n"
+                f"Status code: {request.status}"
+            )
+            return None
+
+        return await request.text()
+
+
+async def load_iframe_content(iframe_id: str) -> str | None:
+    """Patched iframe HTML from Redis, the cache backend's iframe table or Medium, in that order"""
+    key = f"iframe:{iframe_id}"
+    content = serializer.loads(await redis_breaker.get(key))
+    if isinstance(content, str):
+        return content
+
+    try:
+        content = await medium_parser.cache_call("pull_iframe", iframe_id)
+    except Exception as ex:
+        logger.warning(f"Couldn't read iframe {iframe_id} from cache: {ex}")
+        content = None
+
+    if content is None:
+        raw_content = await fetch_iframe_content(iframe_id)
+        if raw_content is None:
+            return None
+        content = patch_iframe_content(raw_content)
+        try:
+            await medium_parser.cache_call("push_iframe", iframe_id, content)
+        except Exception as ex:
+            logger.warning(f"Couldn't store iframe {iframe_id} in cache: {ex}")
+
+    await redis_breaker.setex(key, config.IFRAME_CACHE_TTL, serializer.dumps(content))
+    return content
+
 
 @trace
 async def iframe_proxy(iframe_id: str):
@@ -26,32 +84,9 @@ async def iframe_proxy(iframe_id: str):
     """
     logger.debug(f"Fetching iframe content for ID: {iframe_id}")
 
-    connector = ProxyConnector.from_url(random.choice(config.PROXY_LIST)) if config.PROXY_LIST else None
-
-    async with aiohttp.ClientSession(connector=connector) as session:
-        async with RetryClient(
-            client_session=session, raise_for_status=False, retry_options=retry_options
-        ) as retry_client:
-            async with retry_client.get(
-                f"https://medium.com/media/{iframe_id}",
-                timeout=config.REQUEST_TIMEOUT,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-                    "Accept-Language": "en-US,en;q=0.5",
-                },
-            ) as request:
-                if request.status != 200:
-                    logger.error(
-                        f"Failed to fetch iframe {iframe_id}\n"
-                        f"Status code: {request.status}"
-                    )
-                    return Response(content="", media_type="text/html", headers=IFRAME_HEADERS)
-
-                request_content = await request.text()
-
-    patched_content = patch_iframe_content(request_content)
-    return Response(content=patched_content, media_type="text/html", headers=IFRAME_HEADERS)
+    # Embeds of a popular post are requested by every reader at once, fetch each one only once
+    content = await iframe_flights.do(iframe_id, load_iframe_content, iframe_id)
+    return Response(content=content or "", media_type="text/html", headers=IFRAME_HEADERS)
 
 
 def patch_iframe_content(content: str) -> str:
@@ -1,16 +1,17 @@
 from fastapi import Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from html5lib import serialize  # type: ignore
-from html5lib.html5parser import parse  # type: ignore
+from fastapi.responses import JSONResponse
 from loguru import logger
+from starlette.concurrency import run_in_threadpool
 
 from server import config
 from server.handlers.iframe import iframe_proxy
 from server.handlers.miro import miro_proxy
 from server.handlers.misc import delete_from_cache, report_problem
-from server.handlers.post import render_homepage, render_medium_post_link
+from server.handlers.post import head_medium_post_link, render_homepage, render_medium_post_link
 from server.services.jinja import base_template, main_template
+from server.utils.cache import aio_redis_cache
 from server.utils.logger_trace import trace
+from server.utils.page import html_page_response, normalize_html
 
 
 @trace
@@ -42,24 +43,32 @@ async def route_processing(path: str, request: Request):
 
     if path.startswith("@miro/"):
         miro_data = path.removeprefix("@miro/")
-        return await miro_proxy(miro_data)
+        return await miro_proxy(miro_data, request_headers=request.headers)
     if path.startswith("render_iframe/"):
         iframe_id = path.removeprefix("render_iframe/")
         return await iframe_proxy(iframe_id)
 
-    return await render_medium_post_link(url, db_cache, redis)
+    if request.method == "HEAD":
+        head_response = await head_medium_post_link(url, request.headers, redis)
+        if head_response is not None:
+            return head_response
 
+    return await render_medium_post_link(url, db_cache, redis, request.headers)
 
-@trace
-async def main_page():
+
+@aio_redis_cache(10 * 60)
+async def render_main_page() -> bytes:
     homepage_template = await render_homepage(as_html=True)
     main_template_rendered = main_template.render(postleter=homepage_template)
     base_template_rendered = base_template.render(
         body_template=main_template_rendered, host_address=config.HOST_ADDRESS
     )
-    parsed_template = parse(base_template_rendered)
-    serialized_template = serialize(parsed_template, encoding="utf-8")
-    return HTMLResponse(serialized_template)
+    return await run_in_threadpool(normalize_html, base_template_rendered)
+
+
+@trace
+async def main_page():
+    return html_page_response(await render_main_page())
 
 
 def register_main_router(app):
@@ -1,33 +1,68 @@
 import random
+from collections.abc import AsyncIterator, Mapping
 
 import aiohttp
 from aiohttp_retry import RetryClient
-from aiohttp_socks import ProxyConnector
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from medium_parser import retry_options
 
 from server import config
+from server.services.http import http_sessions
 
 IFRAME_HEADERS = {"Access-Control-Allow-Origin": "*", "X-Frame-Options": "SAMEORIGIN"}
 
+# Conditional and partial requests are answered by miro itself
+FORWARDED_REQUEST_HEADERS = ("Range", "If-None-Match", "If-Modified-Since", "If-Range")
+FORWARDED_RESPONSE_HEADERS = (
+    "Content-Length",
+    "Content-Range",
+    "Accept-Ranges",
+    "ETag",
+    "Last-Modified",
+    "Cache-Control",
+    "Expires",
+)
 
-async def miro_proxy(miro_data: str, use_proxy: bool = False):
+CHUNK_SIZE = 64 * 1024
+
+
+async def stream_upstream_body(response: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            yield chunk
+    finally:
+        # Back to the pool, or closed if the client went away before the body was read
+        response.release()
+
+
+async def miro_proxy(miro_data: str, use_proxy: bool = False, request_headers: Mapping[str, str] | None = None):
     url = f"https://miro.medium.com/{miro_data}"
     headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36"
+        "User-Agent": (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/83.0.4103.116 Safari/537.36"
+        ),
+        # Images are compressed already, and the body is passed through byte for byte with its Content-Length
+        "Accept-Encoding": "identity",
     }
+    for name in FORWARDED_REQUEST_HEADERS:
+        value = (request_headers or {}).get(name)
+        if value is not None:
+            headers[name] = value
 
-    if use_proxy and config.PROXY_LIST:
-        proxy = random.choice(config.PROXY_LIST)
-        connector = ProxyConnector.from_url(proxy)
-    else:
-        connector = None
+    proxy = random.choice(config.PROXY_LIST) if use_proxy and config.PROXY_LIST else None
+    client = RetryClient(client_session=http_sessions.get(proxy), raise_for_status=False, retry_options=retry_options)
 
-    async with aiohttp.ClientSession(connector=connector) as session:
-        client = RetryClient(client_session=session, raise_for_status=False, retry_options=retry_options)
+    request = await client.get(url, timeout=config.REQUEST_TIMEOUT, headers=headers)
+    response_headers = {name: request.headers[name] for name in FORWARDED_RESPONSE_HEADERS if name in request.headers}
 
-        async with client.get(url, timeout=config.REQUEST_TIMEOUT, headers=headers) as request:
-            request_content = await request.read()
-            content_type = request.headers["Content-Type"]
+    if request.status == 304:
+        request.release()
+        return Response(status_code=request.status, headers=response_headers)
 
-    return Response(content=request_content, media_type=content_type)
+    return StreamingResponse(
+        stream_upstream_body(request),
+        status_code=request.status,
+        headers=response_headers,
+        media_type=request.headers.get("Content-Type"),
+    )
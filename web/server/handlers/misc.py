@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from fastapi.responses import JSONResponse
 
 from server import config, ban_db, medium_parser
+from server.utils.negative_cache import negative_cache
 from server.utils.notify import send_message
 from server.utils.logger_trace import trace
 
@@ -29,6 +30,7 @@ async def delete_from_cache(key_data: DeleteFromCache):
 
     try:
         await medium_parser.delete_from_cache(key_data.key)
+        await negative_cache.forget(f"post:{key_data.key}")
     except Exception as ex:
         logger.exception(ex)
         return JSONResponse({"message": f"Couldn't delete from cache: {ex}"}, status_code=500)
@@ -1,44 +1,49 @@
 import asyncio
-import pickle
+import time
+from collections.abc import Mapping
 
-from fastapi.responses import HTMLResponse
-from html5lib import serialize
-from html5lib.html5parser import parse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from async_lru import alru_cache
 from loguru import logger
 from medium_parser import medium_parser_exceptions
+from medium_parser.models.html_result import HtmlStreamResult
+from medium_parser.singleflight import SingleFlight
+from medium_parser.utils import extract_hex_string
+from starlette.concurrency import iterate_in_threadpool
 
-from server import config, medium_cache, redis_storage, medium_parser
+from server import config, medium_async_cache, medium_cache, medium_parser
 from server.services.jinja import base_template, homepage_template
 from server.utils.cache import aio_redis_cache
 from server.utils.exceptions import handle_exception
 from server.utils.logger_trace import trace
-from server.utils.notify import send_message
-from server.utils.utils import safe_check_redis_connection
+from server.utils.negative_cache import negative_cache
+from server.utils.notify import exception_key, send_message
+from server.utils import serializer
+from server.utils.page import RenderedPost, build_rendered_post, rendered_post_response
+from server.utils.redis_health import redis_breaker
+from server.utils.utils import buffer_chunks, tee_chunks
 
 
 @trace
 @aio_redis_cache(10 * 60)
 async def render_homepage(limit: int = config.HOME_PAGE_MAX_POSTS, as_html: bool = False):
-    random_post_id_list = list(set([i.key for i in medium_cache.random(limit)]))
+    # Narrow cache_metadata rows, no post content is read or parsed for the homepage
+    if medium_async_cache is not None:
+        random_posts = await medium_async_cache.random_metadata(limit)
+    else:
+        random_posts = medium_cache.random_metadata(limit)
 
     outlet_posts_list = []
-    tasks = []
-    for post_id in random_post_id_list:
-
-        async def fetch_post_metadata(post_id):
-            try:
-                logger.debug(f"Fetching post_id: {post_id}")
-                post_data = await medium_parser.query(post_id, force_cache=True, retry=1)
-                post_metadata = await medium_parser.generate_metadata(post_data, post_id, as_dict=True)
-                outlet_posts_list.append(post_metadata)
-            except Exception as ex:
-                await handle_exception(ex, message=f"Couldn't render post_id for postleter: {post_id}. Just ignore that")
-
-        task = fetch_post_metadata(post_id)
-        tasks.append(task)
-
-    await asyncio.gather(*tasks)
+    seen_post_ids = set()
+    for post in random_posts:
+        if post.key in seen_post_ids:
+            continue
+        seen_post_ids.add(post.key)
+        try:
+            post_metadata = await medium_parser.generate_metadata(post.to_post_data(), post.key, as_dict=True)
+            outlet_posts_list.append(post_metadata)
+        except Exception as ex:
+            await handle_exception(ex, message=f"Couldn't render post_id for postleter: {post.key}. Just ignore that")
 
     homepage_template_rendered = homepage_template.render(post_list=outlet_posts_list)
     if as_html:
@@ -47,27 +52,131 @@ async def render_homepage(limit: int = config.HOME_PAGE_MAX_POSTS, as_html: bool
     return HTMLResponse(homepage_template_rendered)
 
 
-async def render_medium_post_link(path: str, use_cache: bool = True, use_redis: bool = True):
-    redis_available = await safe_check_redis_connection(redis_storage)
+async def stream_medium_post(path: str, post_id: str, post_stream: HtmlStreamResult, store_in_redis: bool):
+    base_context = {
+        "host_address": config.HOST_ADDRESS,
+        "enable_ads_header": config.ENABLE_ADS_BANNER,
+        "body_chunks": post_stream.chunks,
+        "title": post_stream.title,
+        "description": post_stream.description,
+    }
+    page_chunks: list[str] = []
+    chunks = buffer_chunks(base_template.generate(base_context), config.STREAM_CHUNK_SIZE)
+    if store_in_redis:
+        # The Redis copy is normalised and compressed as a whole, so only then the page is kept in memory
+        chunks = tee_chunks(chunks, page_chunks)
+
+    try:
+        # Body blocks are rendered while the generator is consumed, keep that CPU work off the event loop
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+    except Exception as ex:
+        # Status code and headers are already sent, the only thing left is to cut the response
+        logger.exception(ex)
+        send_message(
+            f"Error while streaming post: <code>{path}</code>, error: <code>{ex}</code>",
+            key=f"stream: {exception_key(ex)}",
+        )
+        return
+
+    if store_in_redis:
+        await store_rendered_post(post_id, await build_rendered_post(post_stream, "".join(page_chunks)))
+
+    send_message(f"✅ Successfully rendered post: {path}", True, "GOOD")
+
+
+async def store_rendered_post(post_id: str, rendered_post: RenderedPost) -> None:
+    # Fresh for CACHE_LIFE_TIME, then served stale while a refresh runs, until the key expires
+    rendered_post.fresh_until = time.time() + config.CACHE_LIFE_TIME
+    ttl = config.CACHE_LIFE_TIME + config.CACHE_STALE_LIFE_TIME
+    if await redis_breaker.setex(post_id, ttl, serializer.dumps(rendered_post)):
+        logger.debug(f"Stored rendered post in Redis cache: {post_id}")
+
+
+refresh_tasks: dict[str, asyncio.Task] = {}
+# A burst of requests for one uncached post resolves, renders, compresses and stores it once
+post_flights = SingleFlight()
+
+
+async def refresh_rendered_post(post_id: str) -> None:
+    # The lock keeps other workers from refreshing the same post, it's not released on purpose:
+    # a failed refresh is not retried before it expires
+    if not await redis_breaker.call("set", f"refresh:{post_id}", 1, nx=True, ex=config.CACHE_REFRESH_LOCK_TIME):
+        logger.debug(f"Post is already being refreshed: {post_id}")
+        return
+
+    logger.debug(f"Refreshing stale rendered post: {post_id}")
+    # Rendered from the database copy, a new upstream fetch only with CACHE_REFRESH_FROM_UPSTREAM
+    rendered_medium_post = await medium_parser.render_as_html(post_id, use_cache=not config.CACHE_REFRESH_FROM_UPSTREAM)
+    await store_rendered_post(post_id, await build_rendered_post(rendered_medium_post))
+
+
+def schedule_refresh(post_id: str) -> None:
+    if post_id in refresh_tasks:
+        return
+
+    async def _refresh():
+        try:
+            await refresh_rendered_post(post_id)
+        except Exception as ex:
+            logger.warning(f"Couldn't refresh rendered post {post_id}, serving stale page: {ex}")
+        finally:
+            refresh_tasks.pop(post_id, None)
+
+    refresh_tasks[post_id] = asyncio.create_task(_refresh())
+
+
+async def render_and_store_post(post_id: str, store_in_redis: bool) -> RenderedPost:
+    logger.debug(f"No Redis cache found, querying...: {post_id}")
+    rendered_medium_post = await medium_parser.render_as_html(post_id)
+    logger.debug("Rendered Medium post from HTML template")
+    rendered_post = await build_rendered_post(rendered_medium_post)
+    if store_in_redis:
+        await store_rendered_post(post_id, rendered_post)
+    return rendered_post
+
+
+def load_rendered_post(redis_result: bytes | None) -> RenderedPost | None:
+    rendered_post = serializer.loads(redis_result)
+    if rendered_post is None:
+        return None
+    if not isinstance(rendered_post, RenderedPost):
+        logger.debug("Ignoring unexpected value under a post key in Redis cache")
+        return None
+    return rendered_post
+
+
+async def render_medium_post_link(
+    path: str, use_cache: bool = True, use_redis: bool = True, request_headers: Mapping[str, str] | None = None
+):
+    redis_available = redis_breaker.available
     logger.debug(f"Redis available: {redis_available}")
 
+    post_stream = None
     try:
-        post_id = await medium_parser.resolve(path)
+        # A post ID in the path always resolves, only other paths may need an upstream request that can fail
+        async with negative_cache.guard(f"url:{path}", use_cache and not extract_hex_string(path)):
+            post_id = await post_flights.do(("resolve", path), medium_parser.resolve, path)
         redis_result = None
         if redis_available and use_cache and use_redis:
-            redis_result = await redis_storage.get(post_id)
+            redis_result = await redis_breaker.get(post_id)
             logger.debug(f"Redis cache hit for post_id: {post_id}")
-
-        if not redis_result:
-            logger.debug(f"No Redis cache found, querying...: {post_id}")
-            rendered_medium_post = await medium_parser.render_as_html(post_id)
-            logger.debug("Rendered Medium post from HTML template")
-            if redis_available and use_redis:
-                await redis_storage.setex(post_id, config.CACHE_LIFE_TIME, pickle.dumps(rendered_medium_post))
-                logger.debug(f"Stored rendered post in Redis cache: {post_id}")
+        rendered_post = load_rendered_post(redis_result)
+
+        if rendered_post is None:
+            async with negative_cache.guard(f"post:{post_id}", use_cache):
+                if config.STREAM_POST_PAGES:
+                    logger.debug(f"No Redis cache found, streaming...: {post_id}")
+                    post_stream = await medium_parser.stream_as_html(post_id)
+                else:
+                    store_in_redis = redis_available and use_redis
+                    rendered_post = await post_flights.do(
+                        ("render", post_id, store_in_redis), render_and_store_post, post_id, store_in_redis
+                    )
         else:
-            rendered_medium_post = pickle.loads(redis_result)
             logger.debug("Loaded rendered post from Redis cache")
+            if rendered_post.is_stale:
+                schedule_refresh(post_id)
 
     except medium_parser_exceptions.InvalidURL as ex:
         return await handle_exception(
@@ -75,7 +184,11 @@ async def render_medium_post_link(path: str, use_cache: bool = True, use_redis:
             "Unable to identify the Medium article URL.",
             status_code=404,
         )
-    except (medium_parser_exceptions.InvalidMediumPostURL, medium_parser_exceptions.MediumPostQueryError, medium_parser_exceptions.PageLoadingError) as ex:
+    except (
+        medium_parser_exceptions.InvalidMediumPostURL,
+        medium_parser_exceptions.MediumPostQueryError,
+        medium_parser_exceptions.PageLoadingError,
+    ) as ex:
         return await handle_exception(
             ex,
             "Unable to identify the link as a Medium.com article page. Please check the URL for any typing errors.",
@@ -85,19 +198,55 @@ async def render_medium_post_link(path: str, use_cache: bool = True, use_redis:
         return await handle_exception(ex, "Unable to identify the Medium article ID.", status_code=500)
     except medium_parser_exceptions.NotValidMediumURL as ex:
         return await handle_exception(ex, "You sure that this is a valid Medium.com URL?", status_code=404, quiet=True)
+    except (medium_parser_exceptions.RenderQueueFull, medium_parser_exceptions.RenderTimeout) as ex:
+        return await handle_exception(
+            ex, "The server is busy right now. Please try again in a few moments.", status_code=503
+        )
     except Exception as ex:
         return await handle_exception(ex, status_code=500)
     else:
-        base_context = {
-            "host_address": config.HOST_ADDRESS,
-            "enable_ads_header": config.ENABLE_ADS_BANNER,
-            "body_template": rendered_medium_post.data,
-            "title": rendered_medium_post.title,
-            "description": rendered_medium_post.description,
-        }
-        rendered_post = base_template.render(base_context)
-        parsed_rendered_post = parse(rendered_post)
-        serialized_rendered_post = serialize(parsed_rendered_post, encoding="utf-8")
+        if post_stream is not None:
+            return StreamingResponse(
+                stream_medium_post(path, post_id, post_stream, redis_available and use_redis), media_type="text/html"
+            )
 
         send_message(f"✅ Successfully rendered post: {path}", True, "GOOD")
-        return HTMLResponse(serialized_rendered_post)
+        return rendered_post_response(rendered_post, request_headers or {})
+
+
+def head_response(status_code: int, headers: Mapping[str, str] | None = None) -> Response:
+    # Starlette sets Content-Length: 0 for the empty body, but the GET response has a page of unknown length
+    response = Response(status_code=status_code, headers=headers, media_type="text/html")
+    del response.headers["content-length"]
+    return response
+
+
+async def head_medium_post_link(
+    path: str, request_headers: Mapping[str, str], use_redis: bool = True
+) -> Response | None:
+    """Answer a HEAD from the caches alone, None when the full GET handling has to run"""
+    post_id = extract_hex_string(path)
+    if not post_id:
+        # Resolving the path may need an upstream request, only a known failure is answered here
+        if await negative_cache.get(f"url:{path}") is not None:
+            logger.debug(f"Answering HEAD for a known bad URL: {path}")
+            return head_response(404)
+        return None
+
+    if await negative_cache.get(f"post:{post_id}") is not None:
+        logger.debug(f"Answering HEAD for a known failed post: {post_id}")
+        return head_response(404)
+
+    rendered_post = None
+    if use_redis and redis_breaker.available:
+        rendered_post = load_rendered_post(await redis_breaker.get(post_id))
+
+    if rendered_post is not None:
+        logger.debug(f"Answering HEAD from Redis cache: {post_id}")
+        return rendered_post_response(rendered_post, request_headers, head=True)
+
+    if config.HEAD_FETCH_UNCACHED:
+        return None
+
+    logger.debug(f"Answering HEAD for uncached post without fetching it: {path}")
+    return head_response(200, {"Cache-Control": "no-cache"})
@@ -6,10 +6,14 @@ from fastapi import APIRouter, FastAPI
 from loguru import logger
 from pydantic_settings import BaseSettings
 
-from server import redis_storage
+from server import medium_api, medium_async_cache, medium_write_behind_cache, redis_storage, render_executor
 from server.exceptions.main import register_main_error_handler
 from server.handlers.main import register_main_router
 from server.middlewares import register_middlewares
+from server.services.http import http_sessions
+from server.utils.cache import local_cache
+from server.utils.notify import admin_notifier
+from server.utils.redis_health import redis_breaker
 
 NAME = "Freedium"
 VERSION = "1.0"
@@ -32,10 +36,28 @@ settings = Settings()
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # Startup
     logger.info("Application startup")
+    redis_breaker.start()
     yield
     # Shutdown
+    await redis_breaker.stop()
+    if local_cache is not None:
+        logger.info(f"Local cache: {local_cache.hits} hits, {local_cache.misses} misses")
     logger.debug("Close Redis connection")
     await redis_storage.close()
+    if medium_write_behind_cache is not None:
+        logger.debug("Flush queued database writes")
+        await medium_write_behind_cache.stop()
+    if medium_async_cache is not None:
+        logger.debug("Close database connection pool")
+        await medium_async_cache.close()
+    if render_executor is not None:
+        logger.debug("Stop render processes")
+        render_executor.shutdown(wait=False)
+    logger.debug("Send queued admin notifications")
+    await admin_notifier.close()
+    logger.debug("Close upstream HTTP sessions")
+    await http_sessions.close()
+    await medium_api.close()
     if settings.sentry_sdk_dsn:
         logger.debug("Flush Sentry messages")
         sentry_sdk.flush()
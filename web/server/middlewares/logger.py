@@ -1,82 +1,103 @@
 import asyncio
+import itertools
+import random
+import secrets
 import time
-from collections.abc import Awaitable, Callable
 
 from loguru import logger
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from server import config, transponder_code_correlation, url_correlation, xkcd_passwd, xp
+from server import config, transponder_code_correlation, url_correlation
 from server.utils.error import generate_error
-from server.utils.notify import send_message
+from server.utils.notify import exception_key, send_message
 from server.utils.utils import string_to_number_ascii
 
+# Request IDs are a per-worker random prefix and a counter: unique across workers, no work per request
+REQUEST_ID_PREFIX = secrets.token_hex(3)
+request_counter = itertools.count(1)
 
-class LoggerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self, request: Request, call_next: Callable[[Request], Awaitable[StreamingResponse]]
-    ) -> Response:  # type: ignore
-        start_time = time.time()
-        generated_id = xp.generate_xkcdpassword(xkcd_passwd, delimiter="-", numwords=3)
-        transponder_code = string_to_number_ascii(generated_id)
-        transponder_code_correlation.set(transponder_code)
-        url_correlation.set(request.url)
 
-        with logger.contextualize(id=generated_id):
-            logger.debug(f"Current ID '{generated_id}' transponder code is '{transponder_code}'")
-            logger.trace(request.__dict__)
+def sanitize_header(name: str, value: str) -> str:
+    if name.lower() == "authorization":
+        value = f"{value[:25]}******"
+    return value
+
+
+def log_headers(direction: str, headers: Headers) -> None:
+    logger.debug(f"{direction} Headers:")
+    for name, value in headers.items():
+        logger.debug(f"\t{direction} {name}: {sanitize_header(name, value)}")
+
 
-            logger.debug(f"< HTTP/{request['http_version']} {request.method} {request.url}")
-            logger.debug(f"< IP host origin: {request.client.host}")
+class LoggerMiddleware:
+    """Tags every request with an ID, times it and cuts it off after config.TIMEOUT seconds without a response.
 
-            logger.debug("< Params:")
-            for name, value in request.path_params.items():
-                logger.debug(f"\t< {name}: {value}")
+    Plain ASGI instead of BaseHTTPMiddleware: the app runs in the request's own task, without a memory
+    stream, and streamed bodies go straight to the server. Full header dumps are only logged for a
+    REQUEST_LOG_SAMPLE_RATE share of requests.
+    """
 
-            logger.debug("< Headers:")
-            for name, value in request.headers.items():
-                value = self._sanitize_header(name, value)
-                logger.debug(f"\t< {name}: {value}")
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-            if hasattr(request, "cookies") and request.cookies:
-                logger.debug("< Coockies:")
-                for name, value in request.cookies.items():
-                    logger.debug(f"\t< {name}: {value}")
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        request_id = f"{REQUEST_ID_PREFIX}-{next(request_counter):x}"
+        transponder_code = string_to_number_ascii(request_id)
+        transponder_code_correlation.set(transponder_code)
+        query_string = scope["query_string"].decode("latin-1")
+        url = f"{scope['path']}?{query_string}" if query_string else scope["path"]
+        url_correlation.set(url)
+        sampled = random.random() < config.REQUEST_LOG_SAMPLE_RATE
+
+        deadline: asyncio.Timeout | None = None
+        response_started = False
+        status_code = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started, status_code
+            if message["type"] == "http.response.start":
+                if deadline is not None:
+                    deadline.reschedule(None)
+                response_started = True
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = str(time.perf_counter() - start_time)
+                if sampled:
+                    log_headers(">", headers)
+            await send(message)
+
+        with logger.contextualize(id=request_id):
+            if sampled:
+                logger.debug(f"< HTTP/{scope['http_version']} {scope['method']} {url}, transponder code '{transponder_code}'")
+                client = scope.get("client")
+                logger.debug(f"< IP host origin: {client[0] if client else None}")
+                log_headers("<", Headers(scope=scope))
 
             try:
-                response = await asyncio.wait_for(call_next(request), timeout=config.TIMEOUT)
+                # The timeout covers the time until the response starts, streamed bodies may take longer
+                async with asyncio.timeout(config.TIMEOUT) as deadline:
+                    await self.app(scope, receive, send_wrapper)
             except Exception as ex:
-                exception_class = type(ex)
+                if deadline is not None and deadline.expired():
+                    ex = TimeoutError(f"No response after {config.TIMEOUT}s")
+                # The error page is sent after the timeout block has exited
+                deadline = None
                 logger.exception(ex)
                 send_message(
-                    f"Error while processing url: <code>{url_correlation.get()}</code>, transponder_id: <code>{generated_id}</code>, transponder_code: <code>{transponder_code_correlation.get()}</code>, error: <code>{ex}</code>. exception: <code>{exception_class.__name__}</code>."
+                    f"Error while processing url: <code>{url}</code>, transponder_id: <code>{request_id}</code>, transponder_code: <code>{transponder_code}</code>, error: <code>{ex}</code>. exception: <code>{type(ex).__name__}</code>.",
+                    key=exception_key(ex),
                 )
+                if response_started:
+                    # Status and headers are already sent, let the server drop the connection
+                    raise
                 response = await generate_error()
+                await response(scope, receive, send_wrapper)
 
-            logger.trace(response.__dict__)
-
-            response.headers["X-Request-ID"] = generated_id
-            # response.headers["Access-Control-Expose-Headers"] = "X-Request-ID, Origin, X-Requested-With, Content-Type, Accept"
-
-            logger.debug(f"> HTTP/{request['http_version']} {response.status_code}")
-
-            logger.debug("> Headers:")
-            for name, value in response.headers.items():
-                value = self._sanitize_header(name, value)
-                logger.debug(f"\t> {name}: {value}")
-
-            if hasattr(response, "cookies"):
-                logger.debug("> Coockies:")
-                for name, value in response.cookies.items():
-                    logger.debug(f"\t> {name}: {value}")
-
-            process_time = time.time() - start_time
-            response.headers["X-Process-Time"] = str(process_time)
-
-            return response
-
-    def _sanitize_header(self, name, value):
-        if name.lower() == "authorization":
-            value = f"{value[:25]}******"
-        return value
+            logger.debug(f"> {scope['method']} {url} {status_code} in {time.perf_counter() - start_time:.3f}s")
@@ -0,0 +1,40 @@
+import aiohttp
+from aiohttp_socks import ProxyConnector
+from loguru import logger
+
+from server import config
+
+
+class HttpSessionPool:
+    """Long-lived aiohttp sessions, one per proxy (None for direct connections), so upstream TCP and TLS
+    connections are reused across requests instead of being set up for every image or iframe."""
+
+    __slots__ = ("limit", "keepalive_timeout", "_sessions")
+
+    def __init__(self, limit: int = 100, keepalive_timeout: float = 30):
+        self.limit: int = limit
+        self.keepalive_timeout: float = keepalive_timeout
+        self._sessions: dict[str | None, aiohttp.ClientSession] = {}
+
+    def get(self, proxy: str | None = None) -> aiohttp.ClientSession:
+        session = self._sessions.get(proxy)
+        if session is None or session.closed:
+            # Created on first use, inside the worker's event loop
+            if proxy:
+                connector = ProxyConnector.from_url(proxy, limit=self.limit, keepalive_timeout=self.keepalive_timeout)
+            else:
+                connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive_timeout)
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[proxy] = session
+        return session
+
+    async def close(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            try:
+                await session.close()
+            except Exception as ex:
+                logger.warning(f"Couldn't close HTTP session: {ex}")
+
+
+http_sessions = HttpSessionPool(config.HTTP_POOL_SIZE, config.HTTP_KEEPALIVE_TIMEOUT)
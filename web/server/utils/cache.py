@@ -1,15 +1,80 @@
-import pickle
-from server import redis_storage
+import time
+from collections import OrderedDict
 from functools import wraps
 from loguru import logger
-from server.utils.utils import safe_check_redis_connection
+from medium_parser.singleflight import SingleFlight
+from server import config
+from server.utils import serializer
+from server.utils.redis_health import redis_breaker
+
+
+class LocalCache:
+    """Per-worker LRU of deserialised values in front of Redis, entries expire after their own TTL"""
+
+    __slots__ = ("max_size", "_entries", "hits", "misses")
+
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_cache = LocalCache(config.LOCAL_CACHE_SIZE) if config.LOCAL_CACHE else None
+# Concurrent misses of the same key share one Redis read and, on a Redis miss, one call of the function
+cache_flights = SingleFlight()
 
 
 def aio_redis_cache(expire_time: int = 60 * 10):  # enable_pickle: bool = False
+    # Other workers may store a newer value in Redis, so a local copy lives shorter than the Redis one
+    local_ttl = min(expire_time, config.LOCAL_CACHE_TTL)
+
     def decorator(func):
+        async def load(key, *args, **kwargs):
+            result_raw = serializer.loads(await redis_breaker.get(key))
+
+            if result_raw is not None:
+                logger.trace("Result found in REDIS")
+            else:
+                logger.trace("Result not found in REDIS")
+                # If the result is not found in Redis cache, call the original function
+                result_raw = await func(*args, **kwargs)
+                try:
+                    result = serializer.dumps(result_raw)
+                except serializer.UnsupportedValue as ex:
+                    logger.warning(f"Not caching {func.__name__} result: {ex}")
+                    return result_raw
+                # Store the result in Redis with an expiration time
+                await redis_breaker.setex(key, expire_time, result)
+
+            if local_cache is not None:
+                local_cache.set(key, result_raw, local_ttl)
+            return result_raw
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if not await safe_check_redis_connection(redis_storage):
+            if not redis_breaker.available:
                 logger.error("REDIS is not available!")
                 return await func(*args, **kwargs)
             # logger.trace(f"{enable_pickle=}, {expire_time=}")
@@ -17,27 +82,14 @@ def aio_redis_cache(expire_time: int = 60 * 10):  # enable_pickle: bool = False
             # Serialize the arguments and function name as a key for Redis
             key = "{}-{}".format(func.__name__, ",".join(str(arg) for arg in args))
             logger.trace(f"REDIS key: {key}")
-            result = await redis_storage.get(key)
-
-            if result is not None:
-                # If the result is found in Redis cache, deserialize and return it
-                # if enable_pickle:  # type(result).__name__ != "str"
-                result_raw = pickle.loads(result)
-                # else:
-                #     result = result.decode("utf-8")
-                logger.trace("Result found in REDIS")
-            else:
-                logger.trace("Result not found in REDIS")
-                # If the result is not found in Redis cache, call the original function
-                result_raw = await func(*args, **kwargs)
-                # if enable_pickle:
-                result = pickle.dumps(result_raw)
-                # else:
-                #     result = result.encode("utf-8")
-                # Store the result in Redis with an expiration time
-                await redis_storage.setex(key, expire_time, result)
 
-            return result_raw
+            if local_cache is not None:
+                result_raw = local_cache.get(key)
+                if result_raw is not None:
+                    logger.trace("Result found in local cache")
+                    return result_raw
+
+            return await cache_flights.do(key, load, key, *args, **kwargs)
 
         return wrapper
 
@@ -6,7 +6,7 @@ from fastapi.responses import HTMLResponse
 from server import config, transponder_code_correlation, url_correlation
 from server.services.jinja import base_template, error_template
 from server.utils.logger_trace import trace
-from server.utils.notify import send_message
+from server.utils.notify import message_key, send_message
 
 # ChatGPT promt: Make this text more Humoristic in one sentenced text, 15 different with emojies as Python list: Sorry to hear that but we have some problem
 ERROR_MSG_LIST = [
@@ -30,6 +30,8 @@ ERROR_MSG_LIST = [
 
 @trace
 async def generate_error(error_msg: Optional[str] = None, title: Optional[str] = None, status_code: int = 500, quiet: bool = False):
+    # Same error on different urls is one admin notification, random messages included
+    notify_key = f"📛 {status_code}: {message_key(str(error_msg))}"
     if not error_msg:
         error_msg = random.choice(ERROR_MSG_LIST)
 
@@ -37,7 +39,7 @@ async def generate_error(error_msg: Optional[str] = None, title: Optional[str] =
         title = "Opppps.."
 
     if not quiet:
-        send_message(f"📛 Error while processing url: <code>{url_correlation.get()}</code>, transponder_code: <code>{transponder_code_correlation.get()}</code>, error: <code>{error_msg}</code>")
+        send_message(f"📛 Error while processing url: <code>{url_correlation.get()}</code>, transponder_code: <code>{transponder_code_correlation.get()}</code>, error: <code>{error_msg}</code>", key=notify_key)
 
     error_template_rendered = error_template.render(error_msg=error_msg, transponder_code=transponder_code_correlation.get())
     base_context = {
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from loguru import logger
+from medium_parser import medium_parser_exceptions
+
+from server import config
+from server.utils.redis_health import RedisCircuitBreaker, redis_breaker
+
+# Failures that come back the same on a retry: bad URLs and posts Medium can't give us
+REMEMBERED_ERRORS = (
+    medium_parser_exceptions.InvalidURL,
+    medium_parser_exceptions.InvalidMediumPostURL,
+    medium_parser_exceptions.InvalidMediumPostID,
+    medium_parser_exceptions.NotValidMediumURL,
+    medium_parser_exceptions.PageLoadingError,
+    medium_parser_exceptions.MediumPostQueryError,
+)
+
+
+class NegativeCache:
+    """Remembers failed URL resolutions and post queries for a short time.
+
+    Entries live in a per-worker LRU and in Redis, so other workers skip the upstream call too.
+    A remembered failure is raised again as the original exception type with the original message.
+    Redis is used through the circuit breaker, while it's open only the local entries count.
+    """
+
+    __slots__ = ("breaker", "ttl", "max_size", "_local")
+
+    def __init__(self, breaker: RedisCircuitBreaker, ttl: int, max_size: int):
+        self.breaker: RedisCircuitBreaker = breaker
+        self.ttl: int = ttl
+        self.max_size: int = max_size
+        self._local: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+
+    def _remember_local(self, key: str, expires_at: float, kind: str, reason: str) -> None:
+        self._local[key] = (expires_at, kind, reason)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    async def get(self, key: str) -> tuple[str, str] | None:
+        entry = self._local.get(key)
+        if entry is not None:
+            expires_at, kind, reason = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(key)
+                return kind, reason
+            del self._local[key]
+
+        redis_result = await self.breaker.get(f"negative:{key}")
+        if redis_result is None:
+            return None
+
+        kind, _, reason = redis_result.decode("utf-8").partition("\n")
+        self._remember_local(key, time.monotonic() + self.ttl, kind, reason)
+        return kind, reason
+
+    async def add(self, key: str, ex: Exception) -> None:
+        kind, reason = type(ex).__name__, str(ex)
+        logger.debug(f"Remembering failure for {self.ttl}s: {key}, {kind}: {reason}")
+        self._remember_local(key, time.monotonic() + self.ttl, kind, reason)
+        await self.breaker.setex(f"negative:{key}", self.ttl, f"{kind}\n{reason}")
+
+    async def forget(self, key: str) -> None:
+        self._local.pop(key, None)
+        await self.breaker.call("delete", f"negative:{key}")
+
+    async def raise_if_failed(self, key: str) -> None:
+        entry = await self.get(key)
+        if entry is None:
+            return
+        kind, reason = entry
+        logger.debug(f"Known failure: {key}, {kind}: {reason}")
+        raise getattr(medium_parser_exceptions, kind, medium_parser_exceptions.MediumParserException)(reason)
+
+    @asynccontextmanager
+    async def guard(self, key: str, enabled: bool = True):
+        """Raise a remembered failure for `key`, or remember the failure raised inside the block"""
+        if not enabled:
+            yield
+            return
+
+        await self.raise_if_failed(key)
+        try:
+            yield
+        except REMEMBERED_ERRORS as ex:
+            await self.add(key, ex)
+            raise
+
+
+negative_cache = NegativeCache(redis_breaker, config.NEGATIVE_CACHE_TTL, config.NEGATIVE_CACHE_SIZE)
@@ -1,41 +1,195 @@
-import urllib3
+import asyncio
+import re
+import time
 from enum import Enum
 
+import aiohttp
+import urllib3
 from loguru import logger
 
 from server import config
 
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4000
+
+URL_PATTERN = re.compile(r"https?://\S+")
+
 
 class MessageStatus(Enum):
     ERROR = "ERROR"
     GOOD = "GOOD"
 
 
-def send_message(text: str, silent: bool = False, status: MessageStatus = "ERROR") -> None:
-    # return True
-    if not config.TELEGRAM_BOT_TOKEN or not config.TELEGRAM_ADMIN_ID:
-        logger.warning("Can't send log messages, because of lack of some informations. Ignore....")
-        return
+def telegram_url() -> str:
+    return f"https://api.telegram.org/bot{config.TELEGRAM_BOT_TOKEN}/sendMessage"
 
-    if status == MessageStatus.GOOD.value:
-        logger.warning(f"Ignoring sending GOOD message")
-        return True
 
-    if len(text) > 4000:
-        logger.warning(f"Message is too long ({len(text)}): {text}")
-        text = text[:4000]
+def message_key(text: str) -> str:
+    """Deduplication key for `text`: the same message about different URLs is one key"""
+    return URL_PATTERN.sub("<url>", text)
 
-    url = f"https://api.telegram.org/bot{config.TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {
+
+def exception_key(ex: Exception) -> str:
+    return f"{type(ex).__name__}: {message_key(str(ex))}"
+
+
+def telegram_payload(text: str, silent: bool) -> dict:
+    return {
         "chat_id": config.TELEGRAM_ADMIN_ID,
         "text": text,
         "parse_mode": "HTML",
         "disable_notification": silent
     }
 
-    http = urllib3.PoolManager()
-    response = http.request("POST", url, fields=data)
+
+class AdminNotifier:
+    """Collects admin messages and sends them to Telegram from a background task.
+
+    Messages with the same key (the text, unless the caller passes one) within `batch_window` seconds are
+    sent once, the first text with a count of the others. Distinct ones are joined into as few Telegram
+    messages as fit. At most `rate_limit` messages are sent per minute, the rest waits for the next window.
+    Up to `max_queue_size` distinct messages wait, newer ones are dropped.
+    """
+
+    __slots__ = (
+        "batch_window",
+        "max_queue_size",
+        "rate_limit",
+        "pending",
+        "dropped",
+        "next_send_at",
+        "session",
+        "worker",
+        "flush_lock",
+    )
+
+    def __init__(self, batch_window: float = 5, max_queue_size: int = 100, rate_limit: int = 20):
+        self.batch_window: float = batch_window
+        self.max_queue_size: int = max_queue_size
+        self.rate_limit: int = rate_limit
+        # key -> [first text, count, silent]
+        self.pending: dict[str, list] = {}
+        self.dropped: int = 0
+        self.next_send_at: float = 0.0
+        self.session: aiohttp.ClientSession | None = None
+        self.worker: asyncio.Task | None = None
+        self.flush_lock: asyncio.Lock = asyncio.Lock()
+
+    def enqueue(self, text: str, silent: bool = False, key: str | None = None) -> None:
+        key = key or text
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[1] += 1
+            entry[2] = entry[2] and silent
+        elif len(self.pending) >= self.max_queue_size:
+            self.dropped += 1
+            logger.warning(f"Admin notification queue is full, dropping message: {text[:200]}")
+            return
+        else:
+            self.pending[key] = [text, 1, silent]
+
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+
+    def _take_batches(self) -> list[tuple[str, bool]]:
+        entries, self.pending = self.pending, {}
+        texts = []
+        silent = True
+        for text, count, entry_silent in entries.values():
+            if count > 1:
+                text = f"{text}\n\n(and {count - 1} more like it)"
+            texts.append(text[:MAX_MESSAGE_LENGTH])
+            silent = silent and entry_silent
+        if self.dropped:
+            texts.append(f"{self.dropped} notifications were dropped, the queue was full")
+            self.dropped = 0
+
+        batches = []
+        current = ""
+        for text in texts:
+            if current and len(current) + len(text) + 2 > MAX_MESSAGE_LENGTH:
+                batches.append((current, silent))
+                current = ""
+            current = f"{current}\n\n{text}" if current else text
+        if current:
+            batches.append((current, silent))
+        return batches
+
+    async def _send(self, text: str, silent: bool) -> None:
+        # Spread messages out, Telegram limits how often a bot may write to one chat
+        delay = self.next_send_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.next_send_at = time.monotonic() + 60 / self.rate_limit
+
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+        try:
+            async with self.session.post(telegram_url(), data=telegram_payload(text, silent)) as response:
+                if response.status == 200:
+                    logger.info("Message sent successfully")
+                else:
+                    logger.warning(f"Failed to send message. Status: {response.status}")
+        except Exception as ex:
+            logger.warning(f"Failed to send message: {ex}")
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            for text, silent in self._take_batches():
+                await self._send(text, silent)
+
+    async def _run(self) -> None:
+        while self.pending:
+            await asyncio.sleep(self.batch_window)
+            # Cancelling the worker must not lose batches that are already taken out of `pending`
+            await asyncio.shield(self.flush())
+
+    async def close(self) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        # Waits for a flush that is still sending, then sends what's left
+        await self.flush()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+admin_notifier = AdminNotifier(config.NOTIFY_BATCH_WINDOW, config.NOTIFY_QUEUE_SIZE, config.NOTIFY_RATE_LIMIT)
+# Only for callers outside the event loop (gunicorn hooks, threads), shared instead of one per message
+http = urllib3.PoolManager()
+
+
+def send_message_sync(text: str, silent: bool = False) -> None:
+    response = http.request("POST", telegram_url(), fields=telegram_payload(text, silent))
     if response.status == 200:
         logger.info("Message sent successfully")
     else:
         logger.warning(f"Failed to send message. Status: {response.status}")
+
+
+def send_message(text: str, silent: bool = False, status: MessageStatus = "ERROR", key: str | None = None) -> None:
+    # return True
+    if not config.TELEGRAM_BOT_TOKEN or not config.TELEGRAM_ADMIN_ID:
+        logger.warning("Can't send log messages, because of lack of some informations. Ignore....")
+        return
+
+    if status == MessageStatus.GOOD.value:
+        logger.warning(f"Ignoring sending GOOD message")
+        return True
+
+    if len(text) > MAX_MESSAGE_LENGTH:
+        logger.warning(f"Message is too long ({len(text)}): {text}")
+        text = text[:MAX_MESSAGE_LENGTH]
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        send_message_sync(text, silent)
+        return
+
+    admin_notifier.enqueue(text, silent, key)
@@ -0,0 +1,260 @@
+import gzip
+import hashlib
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from html.parser import HTMLParser
+
+from fastapi.responses import HTMLResponse, Response
+from html5lib import serialize  # type: ignore
+from html5lib.html5parser import parse  # type: ignore
+from loguru import logger
+from medium_parser.models.html_result import HtmlResult, HtmlStreamResult
+from starlette.concurrency import run_in_threadpool
+
+from server import config
+from server.services.jinja import base_template
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VOID_ELEMENTS = frozenset(
+    ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr")
+)
+# html5lib's serializer leaves out end tags that HTML allows to omit
+OPTIONAL_END_TAG_ELEMENTS = frozenset(
+    (
+        "html", "head", "body", "p", "li", "dt", "dd", "option", "optgroup", "colgroup",
+        "caption", "thead", "tbody", "tfoot", "tr", "td", "th", "rp", "rt",
+    )
+)
+
+
+@dataclass
+class RenderedPost:
+    """Rendered post page as it is stored in the Redis cache."""
+
+    title: str
+    description: str
+    url: str
+    # Full page, normalised by html5lib, encoded as UTF-8 and compressed once at render time
+    page_gzip: bytes
+    page_br: bytes | None = None  # None without the brotli library
+    fresh_until: float = 0.0  # unix time, after it the page is still served but rendered again in the background
+    content_hash: str = ""  # hash of the uncompressed page, base of the ETag
+    last_modified: float = 0.0  # unix time of the render
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() > self.fresh_until
+
+    def etag(self, encoding: str | None) -> str:
+        # Strong ETags must differ between encodings of the same page
+        return f'"{self.content_hash}-{encoding}"' if encoding else f'"{self.content_hash}"'
+
+    @property
+    def page_length(self) -> int:
+        # gzip's trailer holds the uncompressed size, no need to decompress (pages are far below 4 GiB)
+        return int.from_bytes(self.page_gzip[-4:], "little")
+
+    @property
+    def page(self) -> bytes:
+        # Only for the rare client that accepts neither encoding
+        return gzip.decompress(self.page_gzip)
+
+    def encoded(self, encoding: str) -> bytes | None:
+        if encoding == "br":
+            return self.page_br
+        if encoding == "gzip":
+            return self.page_gzip
+        return None
+
+
+def normalize_html(html: str) -> bytes:
+    # html5lib is pure Python and slow, it runs once per render and never on a cache hit
+    return serialize(parse(html), encoding="utf-8")
+
+
+def compress_page(page: bytes) -> tuple[bytes, bytes | None]:
+    # Highest levels, the cost is paid once per render and every response reuses the result
+    page_br = brotli.compress(page, quality=11, mode=brotli.MODE_TEXT) if brotli is not None else None
+    return gzip.compress(page, compresslevel=9, mtime=0), page_br
+
+
+def hash_page(page: bytes) -> str:
+    return hashlib.blake2b(page, digest_size=16).hexdigest()
+
+
+def render_post_page_html(rendered_medium_post: HtmlResult) -> str:
+    base_context = {
+        "host_address": config.HOST_ADDRESS,
+        "enable_ads_header": config.ENABLE_ADS_BANNER,
+        "body_template": rendered_medium_post.data,
+        "title": rendered_medium_post.title,
+        "description": rendered_medium_post.description,
+    }
+    return base_template.render(base_context)
+
+
+async def build_rendered_post(
+    rendered_medium_post: HtmlResult | HtmlStreamResult, page_html: str | None = None
+) -> RenderedPost:
+    if page_html is None:
+        page_html = render_post_page_html(rendered_medium_post)
+    page = await run_in_threadpool(normalize_html, page_html)
+    page_gzip, page_br = await run_in_threadpool(compress_page, page)
+    return RenderedPost(
+        rendered_medium_post.title,
+        rendered_medium_post.description,
+        rendered_medium_post.url,
+        page_gzip,
+        page_br,
+        content_hash=hash_page(page),
+        last_modified=time.time(),
+    )
+
+
+class WellFormedChecker(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.open_tags: list[tuple[str, tuple[int, int]]] = []
+        self.problems: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag not in VOID_ELEMENTS:
+            self.open_tags.append((tag, self.getpos()))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_ELEMENTS:
+            return
+        if all(open_tag != tag for open_tag, _ in self.open_tags):
+            self.problems.append(f"Unexpected </{tag}> at {self.getpos()}")
+            return
+        while self.open_tags:
+            open_tag, pos = self.open_tags.pop()
+            if open_tag == tag:
+                break
+            self.report_unclosed(open_tag, pos)
+
+    def report_unclosed(self, tag: str, pos: tuple[int, int]) -> None:
+        if tag not in OPTIONAL_END_TAG_ELEMENTS:
+            self.problems.append(f"Unclosed <{tag}> opened at {pos}")
+
+    def close(self) -> None:
+        super().close()
+        for open_tag, pos in self.open_tags:
+            self.report_unclosed(open_tag, pos)
+        self.open_tags = []
+
+
+def check_html_well_formed(html: str) -> list[str]:
+    checker = WellFormedChecker()
+    checker.feed(html)
+    checker.close()
+    return checker.problems
+
+
+def html_page_response(page: bytes, status_code: int = 200) -> HTMLResponse:
+    if config.CHECK_HTML_WELL_FORMED:
+        for problem in check_html_well_formed(page.decode("utf-8")):
+            logger.warning(f"HTML is not well-formed: {problem}")
+    return HTMLResponse(page, status_code=status_code)
+
+
+def parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    encodings = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def select_encoding(accept_encoding: str, available: tuple[str, ...] = ("br", "gzip")) -> str | None:
+    """Best of `available` for the Accept-Encoding header, None for an uncompressed response"""
+    encodings = parse_accept_encoding(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = encodings.get(encoding, encodings.get("*", 0.0))
+        # Ties go to the earlier, smaller encoding
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, W/ prefixes are ignored
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified_since(if_modified_since: str, last_modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return False
+    # HTTP dates have a one second resolution
+    return int(last_modified) <= since
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str, last_modified: float) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since is ignored when If-None-Match is present
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    return bool(if_modified_since and last_modified and not_modified_since(if_modified_since, last_modified))
+
+
+def rendered_post_headers(rendered_post: RenderedPost, encoding: str | None) -> dict[str, str]:
+    headers = {"Vary": "Accept-Encoding"}
+    if rendered_post.content_hash:
+        headers["ETag"] = rendered_post.etag(encoding)
+    if rendered_post.last_modified:
+        headers["Last-Modified"] = formatdate(rendered_post.last_modified, usegmt=True)
+    return headers
+
+
+def rendered_post_response(
+    rendered_post: RenderedPost, request_headers: Mapping[str, str], status_code: int = 200, head: bool = False
+) -> Response:
+    available = ("br", "gzip") if rendered_post.page_br is not None else ("gzip",)
+    encoding = select_encoding(request_headers.get("accept-encoding", ""), available)
+    headers = rendered_post_headers(rendered_post, encoding)
+    if (
+        status_code == 200
+        and rendered_post.content_hash
+        and is_not_modified(request_headers, headers["ETag"], rendered_post.last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if head:
+        # Everything a GET would send except the body, the page itself is never touched
+        headers["Content-Length"] = str(len(rendered_post.encoded(encoding)) if encoding else rendered_post.page_length)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(status_code=status_code, headers=headers, media_type="text/html")
+
+    if encoding is None:
+        response = html_page_response(rendered_post.page, status_code=status_code)
+    else:
+        if config.CHECK_HTML_WELL_FORMED:
+            for problem in check_html_well_formed(rendered_post.page.decode("utf-8")):
+                logger.warning(f"HTML is not well-formed: {problem}")
+        response = HTMLResponse(
+            rendered_post.encoded(encoding), status_code=status_code, headers={"Content-Encoding": encoding}
+        )
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+from loguru import logger
+
+from server import config, redis_storage
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class RedisCircuitBreaker:
+    """Tracks Redis health so requests don't wait on a dead Redis.
+
+    Closed: Redis is used. After `failure_threshold` failed calls in a row the breaker opens and Redis is
+    skipped. After `reset_timeout` seconds it is half-open: calls go through again, the first success closes
+    it and a failure opens it for another `reset_timeout`. A background task pings Redis every
+    `check_interval` seconds and feeds the result in, so recovery is noticed without waiting for traffic.
+    """
+
+    __slots__ = ("redis", "failure_threshold", "reset_timeout", "check_interval", "state", "failures", "opened_at", "_monitor")
+
+    def __init__(self, redis, failure_threshold: int = 3, reset_timeout: float = 30, check_interval: float = 5):
+        self.redis = redis
+        self.failure_threshold: int = failure_threshold
+        self.reset_timeout: float = reset_timeout
+        self.check_interval: float = check_interval
+        self.state: str = CLOSED
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+        self._monitor: asyncio.Task | None = None
+
+    @property
+    def available(self) -> bool:
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            logger.info("Redis circuit breaker is half-open, trying Redis again")
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Redis is back, closing circuit breaker")
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self, ex: Exception) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            logger.error(f"Redis is not available, opening circuit breaker for {self.reset_timeout}s: {ex}")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, method: str, *args, default=None, **kwargs):
+        """Run a Redis command, `default` when the breaker is open or the command fails"""
+        if not self.available:
+            return default
+        try:
+            result = await getattr(self.redis, method)(*args, **kwargs)
+        except Exception as ex:
+            logger.warning(f"Redis {method.upper()} failed: {ex}")
+            self.record_failure(ex)
+            return default
+        self.record_success()
+        return result
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.call("get", key)
+
+    async def setex(self, key: str, expire_time: int, value) -> bool:
+        return bool(await self.call("setex", key, expire_time, value, default=False))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.redis.ping()
+            except Exception as ex:
+                # Only a failed ping while closed counts towards the threshold, don't reopen on every tick
+                if self.state != OPEN:
+                    self.record_failure(ex)
+            else:
+                self.record_success()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._monitor is None:
+            return
+        self._monitor.cancel()
+        try:
+            await self._monitor
+        except asyncio.CancelledError:
+            pass
+        self._monitor = None
+
+
+redis_breaker = RedisCircuitBreaker(
+    redis_storage,
+    failure_threshold=config.REDIS_FAILURE_THRESHOLD,
+    reset_timeout=config.REDIS_RESET_TIMEOUT,
+    check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+)
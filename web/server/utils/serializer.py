@@ -0,0 +1,121 @@
+import struct
+
+from loguru import logger
+
+from server.utils.page import RenderedPost
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Redis values written by this module: <header><fields><body>
+# Anything else (old pickled entries, entries of another version) is treated as a cache miss
+MAGIC = b"FRC"
+VERSION = 3
+HEADER = struct.Struct(">3sBBB")  # magic, version, kind, flags
+FIELD_LENGTH = struct.Struct(">I")
+TIMESTAMPS = struct.Struct(">dd")  # fresh_until, last_modified
+
+KIND_BYTES = 1
+KIND_STR = 2
+KIND_RENDERED_POST = 3
+
+FLAG_ZSTD = 1
+
+# Smaller bodies don't win enough from compression to pay for the frame header
+COMPRESS_MIN_SIZE = 512
+COMPRESSION_LEVEL = 6
+
+
+class UnsupportedValue(TypeError):
+    pass
+
+
+def _pack_blob(data: bytes) -> bytes:
+    return FIELD_LENGTH.pack(len(data)) + data
+
+
+def _pack_field(value: str) -> bytes:
+    return _pack_blob(value.encode("utf-8"))
+
+
+def _unpack_blob(blob: memoryview, offset: int) -> tuple[bytes, int]:
+    (length,) = FIELD_LENGTH.unpack_from(blob, offset)
+    offset += FIELD_LENGTH.size
+    return bytes(blob[offset : offset + length]), offset + length
+
+
+def _unpack_field(blob: memoryview, offset: int) -> tuple[str, int]:
+    data, offset = _unpack_blob(blob, offset)
+    return data.decode("utf-8"), offset
+
+
+def _compress(body: bytes) -> tuple[int, bytes]:
+    if zstandard is None or len(body) < COMPRESS_MIN_SIZE:
+        return 0, body
+    return FLAG_ZSTD, zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(body)
+
+
+def _decompress(flags: int, body: bytes) -> bytes:
+    if not flags & FLAG_ZSTD:
+        return body
+    if zstandard is None:
+        raise ValueError("zstandard library not found.")
+    return zstandard.ZstdDecompressor().decompress(body)
+
+
+def dumps(value: RenderedPost | str | bytes) -> bytes:
+    if isinstance(value, RenderedPost):
+        # Pages are stored precompressed with gzip and brotli, the body is the brotli page (empty without brotli)
+        fields = TIMESTAMPS.pack(value.fresh_until, value.last_modified)
+        fields += _pack_field(value.title) + _pack_field(value.description) + _pack_field(value.url) + _pack_field(value.content_hash)
+        fields += _pack_blob(value.page_gzip)
+        return HEADER.pack(MAGIC, VERSION, KIND_RENDERED_POST, 0) + fields + (value.page_br or b"")
+
+    if isinstance(value, str):
+        kind, fields, body = KIND_STR, b"", value.encode("utf-8")
+    elif isinstance(value, bytes):
+        kind, fields, body = KIND_BYTES, b"", value
+    else:
+        raise UnsupportedValue(f"Can't store {type(value).__name__} in Redis cache")
+
+    flags, body = _compress(body)
+    return HEADER.pack(MAGIC, VERSION, kind, flags) + fields + body
+
+
+def loads(blob: bytes | None) -> RenderedPost | str | bytes | None:
+    """Decode a value written by `dumps`, None for a miss or an entry this version can't read"""
+    if not blob or len(blob) < HEADER.size:
+        return None
+
+    view = memoryview(blob)
+    magic, version, kind, flags = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        logger.debug("Ignoring Redis cache entry written in another format")
+        return None
+
+    offset = HEADER.size
+    try:
+        if kind == KIND_RENDERED_POST:
+            fresh_until, last_modified = TIMESTAMPS.unpack_from(view, offset)
+            offset += TIMESTAMPS.size
+            title, offset = _unpack_field(view, offset)
+            description, offset = _unpack_field(view, offset)
+            url, offset = _unpack_field(view, offset)
+            content_hash, offset = _unpack_field(view, offset)
+            page_gzip, offset = _unpack_blob(view, offset)
+            page_br = bytes(view[offset:]) or None
+            return RenderedPost(title, description, url, page_gzip, page_br, fresh_until, content_hash, last_modified)
+
+        body = _decompress(flags, bytes(view[offset:]))
+        if kind == KIND_STR:
+            return body.decode("utf-8")
+        if kind == KIND_BYTES:
+            return body
+    except Exception as ex:
+        logger.warning(f"Ignoring unreadable Redis cache entry: {ex}")
+        return None
+
+    logger.debug(f"Ignoring Redis cache entry of unknown kind: {kind}")
+    return None
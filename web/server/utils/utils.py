@@ -1,5 +1,6 @@
 import random
 import socket
+from collections.abc import Iterable, Iterator
 
 from server.utils.logger_trace import trace
 
@@ -17,13 +18,25 @@ def is_negative(num: int) -> bool:
     return num < 0
 
 
-async def safe_check_redis_connection(connection):
-    try:
-        response = await connection.ping()
-    except Exception:
-        return False
-    else:
-        return response
+def buffer_chunks(chunks: Iterable[str], size: int) -> Iterator[str]:
+    """Join small template chunks into pieces of at least `size` characters. An empty chunk forces a flush."""
+    buffer: list[str] = []
+    buffer_len = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffer_len += len(chunk)
+        if buffer_len >= size or (not chunk and buffer_len):
+            yield "".join(buffer)
+            buffer = []
+            buffer_len = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def tee_chunks(chunks: Iterable[str], sink: list[str]) -> Iterator[str]:
+    for chunk in chunks:
+        sink.append(chunk)
+        yield chunk
 
 
 def is_port_in_use(port: int) -> bool:
@@ -0,0 +1,104 @@
+"""The `server` package connects to PostgreSQL and Redis when it is imported. The tests register a bare
+package in its place, with in-memory stand-ins for the shared objects, so modules under test import
+without any service running."""
+
+import os
+import pathlib
+import sys
+import types
+from contextvars import ContextVar
+
+import pytest
+
+WEB_DIR = pathlib.Path(__file__).parent.parent
+
+os.environ.setdefault("ADMIN_SECRET_KEY", "test")
+# Templates are loaded relative to the web directory
+os.chdir(WEB_DIR)
+sys.path.insert(0, str(WEB_DIR))
+
+
+class FakeRedis:
+    """The subset of redis.asyncio.Redis the server uses, `fail` makes every command raise"""
+
+    def __init__(self):
+        self.store: dict[str, bytes] = {}
+        self.fail: bool = False
+        self.commands: list[str] = []
+
+    def _command(self, name: str) -> None:
+        self.commands.append(name)
+        if self.fail:
+            raise ConnectionError("Redis is down")
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    async def get(self, key: str) -> bytes | None:
+        self._command("get")
+        return self.store.get(key)
+
+    async def set(self, key: str, value, nx: bool = False, ex: int | None = None) -> bool | None:
+        self._command("set")
+        if nx and key in self.store:
+            return None
+        self.store[key] = self._encode(value)
+        return True
+
+    async def setex(self, key: str, expire_time: int, value) -> bool:
+        self._command("setex")
+        self.store[key] = self._encode(value)
+        return True
+
+    async def delete(self, key: str) -> int:
+        self._command("delete")
+        return int(self.store.pop(key, None) is not None)
+
+    async def ping(self) -> bool:
+        self._command("ping")
+        return True
+
+
+class FakeBanDb:
+    """pickledb's get/set/exists"""
+
+    def __init__(self):
+        self.db: dict[str, object] = {}
+
+    def get(self, key: str):
+        return self.db.get(key, False)
+
+    def set(self, key: str, value) -> bool:
+        self.db[key] = value
+        return True
+
+    def exists(self, key: str) -> bool:
+        return key in self.db
+
+
+server = types.ModuleType("server")
+server.__path__ = [str(WEB_DIR / "server")]
+sys.modules["server"] = server
+
+from server import config  # noqa: E402
+
+server.config = config
+server.redis_storage = FakeRedis()
+server.ban_db = FakeBanDb()
+server.medium_parser = None
+server.medium_cache = None
+server.medium_async_cache = None
+server.url_correlation = ContextVar("url_correlation", default="UNKNOWN_URL")
+server.transponder_code_correlation = ContextVar("transponder_code_correlation", default="test")
+
+
+@pytest.fixture
+def redis_storage():
+    redis = server.redis_storage
+    redis.store.clear()
+    redis.commands.clear()
+    redis.fail = False
+    return redis
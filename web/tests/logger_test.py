@@ -0,0 +1,69 @@
+import asyncio
+
+from server.middlewares import logger as logger_middleware
+from server.middlewares.logger import LoggerMiddleware
+
+
+async def receive():
+    await asyncio.sleep(3600)
+
+
+def make_scope() -> dict:
+    return {"type": "http", "http_version": "1.1", "method": "GET", "path": "/post", "query_string": b"", "headers": []}
+
+
+def run(app) -> list[dict]:
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(LoggerMiddleware(app)(make_scope(), receive, send))
+    return messages
+
+
+def test_response_is_tagged():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    messages = run(app)
+
+    headers = dict(messages[0]["headers"])
+    assert messages[0]["status"] == 200
+    assert headers[b"x-request-id"].startswith(logger_middleware.REQUEST_ID_PREFIX.encode())
+    assert b"x-process-time" in headers
+    assert messages[1]["body"] == b"ok"
+
+
+def test_no_response_before_the_timeout_gives_an_error_page(monkeypatch):
+    monkeypatch.setattr(logger_middleware.config, "TIMEOUT", 0.05)
+    cancelled = False
+
+    async def app(scope, receive, send):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    messages = run(app)
+
+    assert cancelled
+    assert messages[0]["status"] == 500
+    assert b"x-request-id" in dict(messages[0]["headers"])
+
+
+def test_streamed_body_may_outlast_the_timeout(monkeypatch):
+    monkeypatch.setattr(logger_middleware.config, "TIMEOUT", 0.05)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await asyncio.sleep(0.1)
+        await send({"type": "http.response.body", "body": b"late"})
+
+    messages = run(app)
+
+    assert [message.get("status") for message in messages] == [200, None]
+    assert messages[1]["body"] == b"late"
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from medium_parser import medium_parser_exceptions
+
+from server.utils.negative_cache import NegativeCache
+from server.utils.redis_health import RedisCircuitBreaker
+
+
+def test_failure_is_remembered_and_raised_again_until_forgotten(redis_storage):
+    async def main():
+        cache = NegativeCache(RedisCircuitBreaker(redis_storage), ttl=60, max_size=10)
+        calls = 0
+
+        async def resolve():
+            nonlocal calls
+            async with cache.guard("url:example"):
+                calls += 1
+                raise medium_parser_exceptions.InvalidURL("Invalid Medium URL: example")
+
+        with pytest.raises(medium_parser_exceptions.InvalidURL):
+            await resolve()
+        with pytest.raises(medium_parser_exceptions.InvalidURL, match="Invalid Medium URL: example"):
+            await resolve()
+        assert calls == 1
+
+        # Another worker only has the Redis entry
+        other_worker = NegativeCache(RedisCircuitBreaker(redis_storage), ttl=60, max_size=10)
+        with pytest.raises(medium_parser_exceptions.InvalidURL, match="Invalid Medium URL: example"):
+            await other_worker.raise_if_failed("url:example")
+
+        await cache.forget("url:example")
+        assert await cache.get("url:example") is None
+        with pytest.raises(medium_parser_exceptions.InvalidURL):
+            await resolve()
+        assert calls == 2
+
+    asyncio.run(main())
+
+
+def test_other_errors_are_not_remembered(redis_storage):
+    async def main():
+        cache = NegativeCache(RedisCircuitBreaker(redis_storage), ttl=60, max_size=10)
+
+        with pytest.raises(TimeoutError):
+            async with cache.guard("post:1234abcd"):
+                raise TimeoutError
+
+        assert await cache.get("post:1234abcd") is None
+
+    asyncio.run(main())
+
+
+def test_local_entry_skips_redis(redis_storage):
+    async def main():
+        cache = NegativeCache(RedisCircuitBreaker(redis_storage), ttl=60, max_size=10)
+        await cache.add("post:1234abcd", medium_parser_exceptions.MediumPostQueryError("gone"))
+        redis_storage.commands.clear()
+
+        assert await cache.get("post:1234abcd") == ("MediumPostQueryError", "gone")
+        assert redis_storage.commands == []
+
+    asyncio.run(main())
+
+
+def test_redis_failures_and_an_open_breaker_are_misses(redis_storage):
+    async def main():
+        breaker = RedisCircuitBreaker(redis_storage, failure_threshold=2, reset_timeout=60)
+        cache = NegativeCache(breaker, ttl=60, max_size=10)
+        redis_storage.store["negative:post:1234abcd"] = b"MediumPostQueryError\ngone"
+        redis_storage.fail = True
+
+        assert await cache.get("post:1234abcd") is None
+        await cache.add("post:5678abcd", medium_parser_exceptions.MediumPostQueryError("gone"))
+        assert not breaker.available
+
+        # Open: Redis isn't asked at all, local entries still count
+        redis_storage.commands.clear()
+        assert await cache.get("post:1234abcd") is None
+        assert await cache.get("post:5678abcd") == ("MediumPostQueryError", "gone")
+        await cache.forget("post:5678abcd")
+        assert redis_storage.commands == []
+
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import asyncio
+
+from server.utils import notify
+from server.utils.notify import AdminNotifier, exception_key, message_key
+
+
+class RecordingNotifier(AdminNotifier):
+    """Records messages instead of posting them to Telegram"""
+
+    __slots__ = ("sent", "send_started", "send_delay")
+
+    def __init__(self, send_delay: float = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.sent: list[str] = []
+        self.send_started: asyncio.Event = asyncio.Event()
+        self.send_delay: float = send_delay
+
+    async def _send(self, text: str, silent: bool) -> None:
+        self.send_started.set()
+        await asyncio.sleep(self.send_delay)
+        self.sent.append(text)
+
+
+def test_keys_ignore_urls():
+    first = ValueError("Invalid Medium URL: https://medium.com/p/1234abcd")
+    second = ValueError("Invalid Medium URL: https://example.com/other-post")
+
+    assert exception_key(first) == exception_key(second) == "ValueError: Invalid Medium URL: <url>"
+    assert exception_key(first) != exception_key(TypeError(str(first)))
+    assert message_key("error at https://medium.com/p/1234abcd") == "error at <url>"
+
+
+def test_same_key_is_sent_once_with_a_count():
+    async def main():
+        notifier = RecordingNotifier(batch_window=60)
+        for code in ("aaaa", "bbbb", "cccc"):
+            notifier.enqueue(f"Error, transponder_code: {code}", key="TimeoutError: No response")
+        notifier.enqueue("Other error")
+        await notifier.close()
+        return notifier.sent
+
+    sent = asyncio.run(main())
+
+    assert sent == ["Error, transponder_code: aaaa\n\n(and 2 more like it)\n\nOther error"]
+
+
+def test_close_finishes_the_batch_being_sent():
+    async def main():
+        notifier = RecordingNotifier(send_delay=0.05, batch_window=0)
+        notifier.enqueue("First")
+        await notifier.send_started.wait()
+        # "First" is out of the queue and being sent when the notifier is closed
+        notifier.enqueue("Second")
+        await notifier.close()
+        return notifier.sent
+
+    assert asyncio.run(main()) == ["First", "Second"]
+
+
+def test_send_message_passes_the_key(monkeypatch):
+    monkeypatch.setattr(notify.config, "TELEGRAM_BOT_TOKEN", "token")
+    monkeypatch.setattr(notify.config, "TELEGRAM_ADMIN_ID", "1")
+
+    async def main():
+        notifier = RecordingNotifier(batch_window=60)
+        monkeypatch.setattr(notify, "admin_notifier", notifier)
+        notify.send_message("Error on https://medium.com/p/1", key="key")
+        notify.send_message("Error on https://medium.com/p/2", key="key")
+        await notifier.close()
+        return notifier.sent
+
+    assert asyncio.run(main()) == ["Error on https://medium.com/p/1\n\n(and 1 more like it)"]
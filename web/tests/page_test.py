@@ -0,0 +1,132 @@
+import gzip
+from email.utils import formatdate
+
+import pytest
+
+from server.utils import page as page_module
+from server.utils.page import RenderedPost, compress_page, etag_matches, hash_page, is_not_modified, parse_accept_encoding, rendered_post_response, select_encoding
+
+PAGE = b"<html><head></head><body>" + b"<p>Medium post</p>" * 100 + b"</body></html>"
+LAST_MODIFIED = 1700000000.0
+
+
+def make_rendered_post(with_brotli: bool = True) -> RenderedPost:
+    page_gzip, page_br = compress_page(PAGE)
+    return RenderedPost("Title", "", "", page_gzip, page_br if with_brotli else None, 0.0, hash_page(PAGE), LAST_MODIFIED)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, *;q=0, deflate;q=bad") == {"gzip": 1.0, "br": 0.5, "*": 0.0, "deflate": 0.0}
+    assert parse_accept_encoding("") == {}
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip;q=0.8", "gzip"),
+        ("br;q=0.8, gzip;q=0.8", "br"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("*;q=0.5, br;q=0", "gzip"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_select_encoding(accept_encoding, expected):
+    assert select_encoding(accept_encoding) == expected
+
+
+def test_select_encoding_without_brotli():
+    assert select_encoding("br, gzip;q=0.5", ("gzip",)) == "gzip"
+    assert select_encoding("br", ("gzip",)) is None
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        ('"abc-br"', True),
+        ('W/"abc-br"', True),
+        ('"other", "abc-br"', True),
+        ("*", True),
+        ('"abc-gzip"', False),
+        ('"abc"', False),
+    ],
+)
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, '"abc-br"') is expected
+
+
+def test_is_not_modified():
+    etag = '"abc-br"'
+    since = formatdate(LAST_MODIFIED, usegmt=True)
+    before = formatdate(LAST_MODIFIED - 60, usegmt=True)
+
+    assert is_not_modified({"if-none-match": etag}, etag, LAST_MODIFIED)
+    assert is_not_modified({"if-modified-since": since}, etag, LAST_MODIFIED + 0.5)
+    assert not is_not_modified({"if-modified-since": before}, etag, LAST_MODIFIED)
+    assert not is_not_modified({"if-modified-since": "not a date"}, etag, LAST_MODIFIED)
+    # If-None-Match wins over If-Modified-Since
+    assert not is_not_modified({"if-none-match": '"other"', "if-modified-since": since}, etag, LAST_MODIFIED)
+    assert not is_not_modified({}, etag, LAST_MODIFIED)
+
+
+def test_page_length_from_the_gzip_trailer():
+    assert make_rendered_post().page_length == len(PAGE)
+
+
+def test_response_in_the_preferred_encoding():
+    rendered_post = make_rendered_post()
+
+    response = rendered_post_response(rendered_post, {"accept-encoding": "gzip, br"})
+
+    assert response.status_code == 200
+    assert response.body == rendered_post.page_br
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"] == rendered_post.etag("br")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["last-modified"] == formatdate(LAST_MODIFIED, usegmt=True)
+
+
+def test_response_without_brotli_and_uncompressed():
+    gzip_response = rendered_post_response(make_rendered_post(with_brotli=False), {"accept-encoding": "br, gzip"})
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzip_response.body) == PAGE
+
+    plain_response = rendered_post_response(make_rendered_post(), {})
+    assert "content-encoding" not in plain_response.headers
+    assert plain_response.body == PAGE
+    assert plain_response.headers["etag"] == make_rendered_post().etag(None)
+
+
+def test_not_modified_response():
+    rendered_post = make_rendered_post()
+
+    response = rendered_post_response(rendered_post, {"accept-encoding": "gzip", "if-none-match": rendered_post.etag("gzip")})
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == rendered_post.etag("gzip")
+
+
+def test_head_response_has_the_get_headers_without_a_body():
+    rendered_post = make_rendered_post()
+
+    compressed = rendered_post_response(rendered_post, {"accept-encoding": "gzip"}, head=True)
+    assert compressed.body == b""
+    assert compressed.headers["content-length"] == str(len(rendered_post.page_gzip))
+    assert compressed.headers["content-encoding"] == "gzip"
+
+    plain = rendered_post_response(rendered_post, {}, head=True)
+    assert plain.headers["content-length"] == str(len(PAGE))
+    assert "content-encoding" not in plain.headers
+
+
+def test_compress_page_without_brotli(monkeypatch):
+    monkeypatch.setattr(page_module, "brotli", None)
+
+    page_gzip, page_br = compress_page(PAGE)
+
+    assert gzip.decompress(page_gzip) == PAGE
+    assert page_br is None
@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+from medium_parser import medium_parser_exceptions
+from medium_parser.models.html_result import HtmlResult
+
+from server.handlers import post
+from server.utils import serializer
+from server.utils.page import RenderedPost, build_rendered_post, compress_page, hash_page
+
+POST_ID = "1234abcd"
+
+
+class FakeMediumParser:
+    def __init__(self):
+        self.renders: list[tuple[str, bool]] = []
+
+    async def resolve(self, path: str) -> str:
+        return POST_ID
+
+    async def render_as_html(self, post_id: str, use_cache: bool = True) -> HtmlResult:
+        self.renders.append((post_id, use_cache))
+        return HtmlResult("Fresh title", "Fresh description", f"https://medium.com/p/{post_id}", "<p>Fresh</p>")
+
+
+def make_rendered_post(fresh_until: float, page: bytes = b"<html><body>Stale</body></html>") -> RenderedPost:
+    page_gzip, page_br = compress_page(page)
+    return RenderedPost("Stale title", "", "", page_gzip, page_br, fresh_until, hash_page(page), time.time())
+
+
+def test_stale_post_is_served_and_refreshed_once_from_the_database(redis_storage, monkeypatch):
+    parser = FakeMediumParser()
+    monkeypatch.setattr(post, "medium_parser", parser)
+    redis_storage.store[POST_ID] = serializer.dumps(make_rendered_post(fresh_until=time.time() - 1))
+
+    async def main():
+        responses = await asyncio.gather(*(post.render_medium_post_link(POST_ID) for _ in range(3)))
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert len(post.refresh_tasks) == 1
+        await asyncio.gather(*post.refresh_tasks.values())
+
+        # Stale again, but another refresh is locked out until CACHE_REFRESH_LOCK_TIME passes
+        redis_storage.store[POST_ID] = serializer.dumps(make_rendered_post(fresh_until=time.time() - 1))
+        await post.render_medium_post_link(POST_ID)
+        await asyncio.gather(*post.refresh_tasks.values())
+
+    asyncio.run(main())
+
+    assert parser.renders == [(POST_ID, True)]
+    assert post.refresh_tasks == {}
+
+
+def test_refresh_stores_a_fresh_page(redis_storage, monkeypatch):
+    parser = FakeMediumParser()
+    monkeypatch.setattr(post, "medium_parser", parser)
+
+    asyncio.run(post.refresh_rendered_post(POST_ID))
+
+    rendered_post = serializer.loads(redis_storage.store[POST_ID])
+    assert rendered_post.title == "Fresh title"
+    assert not rendered_post.is_stale
+    assert b"Fresh" in rendered_post.page
+
+
+def test_head_for_a_cached_post(redis_storage):
+    rendered_post = make_rendered_post(fresh_until=time.time() + 60)
+    redis_storage.store[POST_ID] = serializer.dumps(rendered_post)
+
+    async def main():
+        plain = await post.head_medium_post_link(f"@author/title-{POST_ID}", {})
+        assert plain.status_code == 200
+        assert plain.body == b""
+        assert plain.headers["content-length"] == str(len(rendered_post.page))
+        assert plain.headers["etag"] == rendered_post.etag(None)
+
+        compressed = await post.head_medium_post_link(POST_ID, {"accept-encoding": "gzip"})
+        assert compressed.headers["content-length"] == str(len(rendered_post.page_gzip))
+
+        not_modified = await post.head_medium_post_link(POST_ID, {"accept-encoding": "gzip", "if-none-match": rendered_post.etag("gzip")})
+        assert not_modified.status_code == 304
+
+    asyncio.run(main())
+
+
+def test_head_for_an_uncached_post(redis_storage, monkeypatch):
+    async def main():
+        response = await post.head_medium_post_link(POST_ID, {})
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "no-cache"
+        assert response.headers["content-type"] == "text/html; charset=utf-8"
+        # The GET sends a page, an empty Content-Length would claim it has none
+        assert "content-length" not in response.headers
+
+        monkeypatch.setattr(post.config, "HEAD_FETCH_UNCACHED", True)
+        assert await post.head_medium_post_link(POST_ID, {}) is None
+
+    asyncio.run(main())
+
+
+def test_head_for_a_failed_post(redis_storage):
+    async def main():
+        await post.negative_cache.add("post:bbbb2222", medium_parser_exceptions.MediumPostQueryError("gone"))
+        response = await post.head_medium_post_link("bbbb2222", {})
+        assert response.status_code == 404
+        assert "content-length" not in response.headers
+
+    asyncio.run(main())
+
+
+def test_head_without_a_post_id(redis_storage):
+    async def main():
+        # Left to the GET handling, which resolves the URL
+        assert await post.head_medium_post_link("not-a-post", {}) is None
+
+        await post.negative_cache.add("url:known-bad-url", medium_parser_exceptions.InvalidURL("Invalid Medium URL"))
+        assert (await post.head_medium_post_link("known-bad-url", {})).status_code == 404
+
+    asyncio.run(main())
+
+
+def test_uncached_post_is_rendered_and_stored_once_for_a_burst(redis_storage, monkeypatch):
+    parser = FakeMediumParser()
+    monkeypatch.setattr(post, "medium_parser", parser)
+    monkeypatch.setattr(post.config, "STREAM_POST_PAGES", False)
+    builds = []
+
+    async def counting_build_rendered_post(rendered_medium_post):
+        builds.append(rendered_medium_post)
+        return await build_rendered_post(rendered_medium_post)
+
+    monkeypatch.setattr(post, "build_rendered_post", counting_build_rendered_post)
+
+    async def main():
+        return await asyncio.gather(*(post.render_medium_post_link(POST_ID) for _ in range(5)))
+
+    responses = asyncio.run(main())
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert parser.renders == [(POST_ID, True)]
+    assert len(builds) == 1
+    assert redis_storage.commands.count("setex") == 1
+    assert len(post.post_flights) == 0
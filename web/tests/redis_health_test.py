@@ -0,0 +1,116 @@
+import asyncio
+
+from server.utils import redis_health
+from server.utils.redis_health import CLOSED, HALF_OPEN, OPEN, RedisCircuitBreaker
+
+
+class Clock:
+    """Stands in for the time module in redis_health"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def make_breaker(redis_storage, monkeypatch) -> tuple[RedisCircuitBreaker, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(redis_health, "time", clock)
+    return RedisCircuitBreaker(redis_storage, failure_threshold=2, reset_timeout=30), clock
+
+
+def test_opens_after_threshold_and_skips_redis(redis_storage, monkeypatch):
+    breaker, _ = make_breaker(redis_storage, monkeypatch)
+    redis_storage.fail = True
+
+    async def main():
+        assert await breaker.get("key") is None
+        assert breaker.state == CLOSED
+        assert await breaker.setex("key", 10, b"value") is False
+        assert breaker.state == OPEN
+        assert not breaker.available
+
+        redis_storage.commands.clear()
+        assert await breaker.call("get", "key", default="default") == "default"
+        assert redis_storage.commands == []
+
+    asyncio.run(main())
+
+
+def test_success_resets_the_failure_count(redis_storage, monkeypatch):
+    breaker, _ = make_breaker(redis_storage, monkeypatch)
+
+    async def main():
+        redis_storage.fail = True
+        await breaker.get("key")
+        redis_storage.fail = False
+        await breaker.get("key")
+        redis_storage.fail = True
+        await breaker.get("key")
+
+    asyncio.run(main())
+
+    assert breaker.state == CLOSED
+    assert breaker.failures == 1
+
+
+def test_half_open_closes_on_success(redis_storage, monkeypatch):
+    breaker, clock = make_breaker(redis_storage, monkeypatch)
+    redis_storage.store["key"] = b"value"
+
+    async def main():
+        redis_storage.fail = True
+        await breaker.get("key")
+        await breaker.get("key")
+        assert breaker.state == OPEN
+
+        clock.now += 29
+        assert not breaker.available
+        clock.now += 1
+        assert breaker.available
+        assert breaker.state == HALF_OPEN
+
+        redis_storage.fail = False
+        assert await breaker.get("key") == b"value"
+        assert breaker.state == CLOSED
+        assert breaker.failures == 0
+
+    asyncio.run(main())
+
+
+def test_half_open_reopens_on_first_failure(redis_storage, monkeypatch):
+    breaker, clock = make_breaker(redis_storage, monkeypatch)
+
+    async def main():
+        redis_storage.fail = True
+        await breaker.get("key")
+        await breaker.get("key")
+        clock.now += 30
+        assert breaker.available
+
+        await breaker.get("key")
+        assert breaker.state == OPEN
+        assert breaker.opened_at == clock.now
+        assert not breaker.available
+
+    asyncio.run(main())
+
+
+def test_monitor_closes_the_breaker_when_redis_is_back(redis_storage):
+    async def main():
+        breaker = RedisCircuitBreaker(redis_storage, failure_threshold=1, reset_timeout=60, check_interval=0.01)
+        redis_storage.fail = True
+        await breaker.get("key")
+        assert breaker.state == OPEN
+
+        redis_storage.fail = False
+        breaker.start()
+        for _ in range(100):
+            if breaker.state == CLOSED:
+                break
+            await asyncio.sleep(0.01)
+        await breaker.stop()
+        assert breaker.state == CLOSED
+
+    asyncio.run(main())
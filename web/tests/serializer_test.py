@@ -0,0 +1,76 @@
+import pickle
+
+import pytest
+
+from server.utils import serializer
+from server.utils.page import RenderedPost, compress_page, hash_page
+
+LONG_TEXT = "Medium post " * 200
+
+
+def make_rendered_post() -> RenderedPost:
+    page = f"<html><body>{LONG_TEXT}</body></html>".encode("utf-8")
+    page_gzip, page_br = compress_page(page)
+    return RenderedPost("Title ✅", "Description", "https://medium.com/p/1234abcd", page_gzip, page_br, 1700000000.5, hash_page(page), 1690000000.25)
+
+
+@pytest.mark.parametrize("value", ["", "short", LONG_TEXT, b"", b"\x00\xff", LONG_TEXT.encode("utf-8")])
+def test_str_and_bytes_round_trip(value):
+    assert serializer.loads(serializer.dumps(value)) == value
+
+
+def test_rendered_post_round_trip():
+    rendered_post = make_rendered_post()
+
+    assert serializer.loads(serializer.dumps(rendered_post)) == rendered_post
+
+
+def test_rendered_post_without_brotli_round_trip():
+    rendered_post = make_rendered_post()
+    rendered_post.page_br = None
+
+    assert serializer.loads(serializer.dumps(rendered_post)) == rendered_post
+
+
+def test_long_values_are_compressed():
+    blob = serializer.dumps(LONG_TEXT)
+
+    assert blob[serializer.HEADER.size - 1] & serializer.FLAG_ZSTD
+    assert len(blob) < len(LONG_TEXT)
+
+
+def test_other_version_is_a_miss():
+    blob = bytearray(serializer.dumps("value"))
+    blob[len(serializer.MAGIC)] = serializer.VERSION + 1
+
+    assert serializer.loads(bytes(blob)) is None
+
+
+def test_legacy_pickle_is_a_miss():
+    assert serializer.loads(pickle.dumps("value")) is None
+    assert serializer.loads(pickle.dumps({"title": "value"})) is None
+
+
+@pytest.mark.parametrize("blob", [None, b"", b"FRC", b"FRC\x03\x09\x00data"])
+def test_empty_short_and_unknown_kind_are_misses(blob):
+    assert serializer.loads(blob) is None
+
+
+def test_truncated_rendered_post_is_a_miss():
+    blob = serializer.dumps(make_rendered_post())
+
+    assert serializer.loads(blob[: serializer.HEADER.size + 20]) is None
+
+
+def test_unsupported_value():
+    with pytest.raises(serializer.UnsupportedValue):
+        serializer.dumps({"title": "value"})
+
+
+def test_without_zstandard(monkeypatch):
+    compressed = serializer.dumps(LONG_TEXT)
+    monkeypatch.setattr(serializer, "zstandard", None)
+
+    # Stored uncompressed, and entries compressed by another worker are a miss
+    assert serializer.loads(serializer.dumps(LONG_TEXT)) == LONG_TEXT
+    assert serializer.loads(compressed) is None